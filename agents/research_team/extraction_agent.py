@@ -2,7 +2,7 @@ from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 
 from tools.handoff_tools import create_research_handoff_tool
-from tools.paper_tools import read_paper_names, read_paper_headers, read_paper_section, write_finding, list_directory, read_whole_paper
+from tools.paper_tools import read_paper_names, read_paper_headers, read_paper_section, write_finding, list_directory, read_whole_paper, search_papers, read_paper_parameters, read_paper_tables
 
 transfer_to_paper_agent = create_research_handoff_tool(
     agent_name="paper_agent",
@@ -21,7 +21,7 @@ def create_extraction_agent(model=None):
     model = model or ChatOpenAI(model="gpt-5-mini")
 
     _extraction_agent = create_react_agent(model, 
-                           tools=[read_paper_names, read_paper_headers, read_paper_section, write_finding, list_directory, read_whole_paper,transfer_to_paper_agent,transfer_to_force_field_agent], 
+                           tools=[read_paper_names, read_paper_parameters, read_paper_tables, search_papers, read_paper_headers, read_paper_section, write_finding, list_directory, read_whole_paper,transfer_to_paper_agent,transfer_to_force_field_agent], 
       prompt = """"
       You are a research assistant extracting simulation parameters from papers in ./papers.
 
@@ -32,9 +32,16 @@ Workflow:
    - Always respond to other agents (e.g. paper or force field agent) with clear answers and continue. 
 
 2. Section reading
-   - For each paper: get headers with read_paper_headers(papers/[paper]).
+   - Force field parameters are usually in tables. First check read_paper_parameters(papers/[paper]), which
+     returns the epsilon, sigma, charge and mass rows found in the paper's tables (with units), and
+     read_paper_tables(papers/[paper]) for tables it did not recognise.
+   - Then use search_papers(query), e.g. "epsilon/k_B sigma Lennard-Jones" or "partial charges TraPPE".
+     It returns the best matching chunks with their section and chunk number; read them with read_paper_section.
+   - Otherwise, for each paper: get headers with read_paper_headers(papers/[paper]).
    - Focus on sections like "Force Field", "Simulation Details", "Computational Methods".
    - Iterate through chunks with read_paper_section(paper, section, chunk_id).
+     When you only need a specific value, pass max_tokens=256 to read_paper_headers and read_paper_section
+     to read smaller chunks.
    - If you cannot find what you are looking for, attempt to read the whole paper with read_whole_paper(paper).
    - If you still cannot find the information, request the relevant paper via transfer_to_paper_agent.
 
@@ -45,10 +52,13 @@ Workflow:
        • If missing, request via transfer_to_paper_agent.
 
 4. Findings format
-   - Write results with write_finding(), e.g.:
-     {"type": "lennard-jones", "atoms": "O-Si", "epsilon": 0.1, "sigma": 3.4}
+   - Write results with write_finding(paper_folder, findings, notes), one finding per atom type or pair, e.g.:
+     {"species": "framework", "atom_type": "O-Si", "interaction": "lennard-jones",
+      "parameters": {"epsilon": 0.1, "sigma": 3.4}, "units": {"epsilon": "K", "sigma": "Angstrom"},
+      "section": "Force Field", "chunk": 0}
    - Add notes for rules:
-     {"note": "Uses Lorentz-Berthelot mixing rules."}
+     notes=["Uses Lorentz-Berthelot mixing rules."]
+   - Findings that are already stored are skipped, so you do not need to check before writing.
 
 5. Completeness check
    - Ensure all force field parameters are covered.
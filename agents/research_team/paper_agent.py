@@ -2,7 +2,7 @@ from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent
 
 from tools.handoff_tools import create_research_handoff_tool
-from tools.paper_tools import semantic_scholar_search, download_paper_tool
+from tools.paper_tools import semantic_scholar_search, semantic_scholar_multi_search, download_paper_tool, download_papers_tool
 
 transfer_to_extraction_agent = create_research_handoff_tool(
     agent_name="extraction_agent",
@@ -15,7 +15,7 @@ def create_paper_agent(model=None):
     model = model or ChatOpenAI(model="gpt-5-mini")
 
     _paper_agent = create_react_agent(model, 
-                                  tools=[semantic_scholar_search, download_paper_tool, transfer_to_extraction_agent], 
+                                  tools=[semantic_scholar_search, semantic_scholar_multi_search, download_paper_tool, download_papers_tool, transfer_to_extraction_agent], 
                                   prompt= """
 You are a research assistant specializing in finding force fields for classical molecular simulations.
 
@@ -33,10 +33,11 @@ Workflow:
      • First, try synonyms (e.g., "CO2" → "carbon dioxide").
      • Then, remove less important words to broaden the query.
      • Refine at most 2–3 times.
+   - To try several variations at once, pass them together to semantic_scholar_multi_search.
 
 3. Paper selection
    - Choose relevant papers from the results.
-   - Download them using download_paper_tool.
+   - Download them using download_paper_tool, or download_papers_tool to fetch several at once.
    - Give each paper a short descriptive title (≤8 words).
    - For each paper, provide a one-line explanation (<30 words) of why it was chosen.
 
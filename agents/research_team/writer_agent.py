@@ -28,7 +28,8 @@ You will receive findings extracted from papers. For each paper, generate a comp
    - Do not copy numerical values from the template.
 
 2. Input
-   - Use read_finding() to load all extracted findings for a paper.
+   - Use read_finding(paper_folder) to load the extracted findings of a paper as a table of parameters
+     (with units and sources) plus notes. Filter with species, atom_type or parameter when you only need part of it.
    - Process papers one by one.
 
 3. Atom naming conventions
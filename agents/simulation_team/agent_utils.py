@@ -1,12 +1,43 @@
+import json
+import os
+import threading
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing_extensions import Annotated, NotRequired, TypedDict
 from langgraph.managed import RemainingSteps
 from langgraph.checkpoint.memory import InMemorySaver
-from typing import Sequence
+from typing import Callable, Dict, Optional, Sequence
 from langgraph.graph import StateGraph, START, MessagesState, END
 from langgraph.types import Command, Send
-from langchain_core.messages import BaseMessage
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langgraph.graph import add_messages
 
+from tools.file_tools import read_plan
+from tools.token_utils import count_tokens, truncate_tokens
+
+
+def keep_last(left, right):
+    """Reducer that keeps the last non-empty write, so parallel handoffs can all set a key.
+
+    Subgraphs sharing this state report the empty default back to the parent, which is ignored.
+    """
+    return right or left
+
+
+def merge_verdicts(left: Dict[str, str] | None, right: Dict[str, str] | None) -> Dict[str, str]:
+    """Keep the latest evaluator verdict of every agent."""
+    return {**(left or {}), **(right or {})}
+
+
+def merge_dispatched(left: Sequence[str] | None, right: Sequence[str] | None) -> list[str]:
+    """Collect the agents dispatched since the last evaluation. Writing None resets it."""
+    if right is None:
+        return []
+    return list(dict.fromkeys(list(left or []) + list(right)))
+
 
 class AgentState(TypedDict):
     """The state of the agent."""
@@ -17,10 +48,17 @@ class AgentState(TypedDict):
 
     instructions: NotRequired[str]
 
-    current_agent: NotRequired[str]
+    current_agent: NotRequired[Annotated[str, keep_last]]
+
+    dispatched_agents: NotRequired[Annotated[list[str], merge_dispatched]]
 
     last_msg: NotRequired[str]
 
+    # latest evaluator verdict per agent node, and the one handed to a sub-agent with its task
+    verdicts: NotRequired[Annotated[Dict[str, str], merge_verdicts]]
+
+    verdict: NotRequired[Annotated[str, keep_last]]
+
 
 def make_agent_subgraph(state_cls, node_name, agent_node):
 
@@ -36,4 +74,95 @@ def make_agent_subgraph(state_cls, node_name, agent_node):
     sg.add_node("emit", emit_node)
     sg.add_edge(node_name, "emit")
     sg.set_entry_point(node_name)
-    return sg.compile(checkpointer=InMemorySaver())
\ No newline at end of file
+    return sg.compile(checkpointer=InMemorySaver())
+
+@dataclass(frozen=True)
+class ContextBudget:
+    """Token budgets of the parts of a sub-agent's input.
+
+    Set with the CONTEXT_PLAN_TOKENS, CONTEXT_VERDICT_TOKENS, CONTEXT_TASK_TOKENS and
+    CONTEXT_HISTORY_TOKENS environment variables.
+    """
+    plan: int = 1500
+    verdict: int = 500
+    task: int = 2000
+    # the agent's own last reply, from its previous run
+    history: int = 300
+
+    @classmethod
+    def from_env(cls) -> "ContextBudget":
+        defaults = cls()
+        return cls(**{name: int(os.environ.get(f"CONTEXT_{name.upper()}_TOKENS", getattr(defaults, name)))
+                      for name in ("plan", "verdict", "task", "history")})
+
+
+def message_tokens(messages: Sequence[BaseMessage]) -> int:
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+        total += count_tokens(content)
+        if isinstance(message, AIMessage) and message.tool_calls:
+            total += count_tokens(json.dumps([call["args"] for call in message.tool_calls]))
+    return total
+
+
+def bounded_messages(state: AgentState, budget: Optional[ContextBudget] = None) -> list[BaseMessage]:
+    """The input of a sub-agent: the plan, the last evaluator verdict on its work, its own previous
+    reply and its task, each cut to its token budget, instead of its whole message history."""
+    budget = budget or ContextBudget.from_env()
+    parts = [f"Current plan:\n{truncate_tokens(read_plan.invoke({}), budget.plan)}"]
+    if state.get("verdict"):
+        parts.append(f"Evaluator verdict on your previous attempt:\n{truncate_tokens(state['verdict'], budget.verdict)}")
+    previous = next((m for m in reversed(state.get("messages", [])) if isinstance(m, AIMessage) and m.content), None)
+    if previous is not None and budget.history > 0:
+        parts.append(f"Your reply after your previous run:\n{truncate_tokens(str(previous.content), budget.history)}")
+    parts.append(f"Your task:\n{truncate_tokens(state['instructions'], budget.task)}")
+    return [HumanMessage(content="\n\n".join(parts), name="supervisor")]
+
+
+# Per-run totals of sub-agent input tokens, like the plan folder it follows the run into LangGraph threads
+_context_stats: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("context_stats", default=None)
+_context_stats_lock = threading.Lock()
+
+
+@contextmanager
+def context_stats_scope():
+    """Collect the measured input tokens of the sub-agent calls in the block, and an estimate of
+    what resending the full history would have cost."""
+    stats = {}
+    token = _context_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _context_stats.reset(token)
+
+
+def invoke_with_bounded_context(invoke: Callable[..., dict], state: AgentState, agent_name: str,
+                                budget: Optional[ContextBudget] = None) -> list[BaseMessage]:
+    """Run a sub-agent on its bounded input and return its messages.
+
+    The input tokens are those the model reported for the agent's calls. The full-history
+    figure is an estimate: every call would have carried the earlier messages instead of the
+    bounded input, counted with message_tokens.
+    """
+    messages = bounded_messages(state, budget)
+    usage = UsageMetadataCallbackHandler()
+    result = invoke({"messages": messages}, {"callbacks": [usage]})
+    stats = _context_stats.get()
+    if stats is not None:
+        calls = sum(isinstance(m, AIMessage) for m in result["messages"][len(messages):])
+        measured = sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values())
+        full = list(state.get("messages", [])) + [HumanMessage(content=state["instructions"], name="supervisor")]
+        extra = calls * max(message_tokens(full) - message_tokens(messages), 0)
+        with _context_stats_lock:
+            entry = stats.setdefault(agent_name, {"calls": 0, "input_tokens": 0, "estimated_full_history_tokens": 0})
+            entry["calls"] += calls
+            entry["input_tokens"] += measured
+            entry["estimated_full_history_tokens"] += measured + extra
+    return result["messages"]
+
+
+def context_savings(stats: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+    sent = sum(entry["input_tokens"] for entry in stats.values())
+    full = sum(entry["estimated_full_history_tokens"] for entry in stats.values())
+    return {"input_tokens": sent, "estimated_full_history_tokens": full, "estimated_saved_tokens": full - sent}
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import dotenv
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from agents.simulation_team.agent_utils import context_savings, context_stats_scope
+from agents.simulation_team.simulation_team import create_simulation_team
+from tools.blob_store import BLOB_DIR
+from tools.file_tools import EXAMPLES_DIR
+from tools.ff_library import FORCEFIELDS_DIR
+from tools.plan_store import plan_scope
+
+
+BATCH_DIR = Path("runs") / "batch"
+# inputs every run reads, linked into its folder; the blob store is shared so runs still deduplicate
+SHARED_INPUTS = (Path("cifs"), FORCEFIELDS_DIR, Path("raspa_examples"), EXAMPLES_DIR, BLOB_DIR)
+
+
+def load_prompts(prompt_file: str) -> Dict[str, str]:
+    """Load prompts from a .json ({name: prompt} or [prompt, ...]), .jsonl ({"name", "prompt"} per line)
+    or plain text file (one prompt per line)."""
+    path = Path(prompt_file)
+    text = path.read_text()
+
+    if path.suffix == ".json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return {str(name): prompt for name, prompt in data.items()}
+        return {f"run_{i}": prompt for i, prompt in enumerate(data)}
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if path.suffix == ".jsonl":
+        prompts = {}
+        for i, line in enumerate(lines):
+            entry = json.loads(line)
+            prompts[entry.get("name", f"run_{i}")] = entry["prompt"]
+        return prompts
+    return {f"run_{i}": line for i, line in enumerate(lines)}
+
+
+def prepare_run_folder(work_dir: Path, root: Path = Path(".")):
+    """Create the folder a run works in, with links to the shared inputs of root."""
+    work_dir.mkdir(parents=True, exist_ok=True)
+    (root / BLOB_DIR).mkdir(exist_ok=True)
+    for name in SHARED_INPUTS:
+        src, dst = (root / name).resolve(), work_dir / name
+        if src.exists() and not (dst.exists() or dst.is_symlink()):
+            dst.symlink_to(src, target_is_directory=True)
+
+
+async def _run_team(name: str, prompt: str, parallel_dispatch: bool, recursion_limit: int) -> Dict:
+    usage = UsageMetadataCallbackHandler()
+    config = {
+        "configurable": {"thread_id": name},
+        "recursion_limit": recursion_limit,
+        "callbacks": [usage],
+    }
+    report = {"name": name, "success": False, "error": None}
+
+    start = time.perf_counter()
+    try:
+        # plan.json of this run lives in its working directory
+        with plan_scope(plan_dir=Path(".")), context_stats_scope() as context_stats:
+            sim_team = create_simulation_team(parallel_dispatch=parallel_dispatch)
+            out = await sim_team.ainvoke({"messages": [{"role": "user", "content": prompt}]}, config)
+        report["success"] = True
+        report["final_message"] = out["messages"][-1].content
+    except Exception as e:
+        report["error"] = repr(e)
+    report["latency_s"] = round(time.perf_counter() - start, 2)
+
+    report["input_tokens"] = sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values())
+    report["output_tokens"] = sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values())
+    report["total_tokens"] = sum(u.get("total_tokens", 0) for u in usage.usage_metadata.values())
+    report["tokens_per_model"] = usage.usage_metadata
+    # measured sub-agent input tokens, against an estimate of resending each agent its full message history
+    report["context_tokens"] = {**context_savings(context_stats), "per_agent": context_stats}
+    return report
+
+
+def _run_in_folder(name: str, prompt: str, work_dir: str, parallel_dispatch: bool, recursion_limit: int) -> Dict:
+    # a process of its own per run: tools, generated code and caches resolve relative paths in work_dir
+    sys.path[:] = [os.path.abspath(p) for p in sys.path]
+    os.chdir(work_dir)
+    return asyncio.run(_run_team(name, prompt, parallel_dispatch, recursion_limit))
+
+
+async def run_experiment(name: str, prompt: str, work_dir: Path, pool: ProcessPoolExecutor,
+                         parallel_dispatch: bool = False, recursion_limit: int = 100) -> Dict:
+    """Run one simulation team graph in its own process, working directory and plan."""
+    prepare_run_folder(work_dir)
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        report = await loop.run_in_executor(pool, _run_in_folder, name, prompt, str(work_dir.resolve()),
+                                            parallel_dispatch, recursion_limit)
+    except Exception as e:
+        # the run process died
+        report = {"name": name, "success": False, "error": repr(e), "latency_s": round(time.perf_counter() - start, 2),
+                  "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "tokens_per_model": {},
+                  "context_tokens": {**context_savings({}), "per_agent": {}}}
+    report["work_dir"] = work_dir.as_posix()
+
+    status = "ok" if report["success"] else f"failed: {report['error']}"
+    print(f"[{name}] {status} ({report['latency_s']} s, {report['total_tokens']} tokens)")
+    return report
+
+
+async def run_batch(prompts: Dict[str, str], batch_name: str = "batch", max_concurrency: int = 4,
+                    parallel_dispatch: bool = False, recursion_limit: int = 100) -> List[Dict]:
+    """Run many experiments concurrently, at most `max_concurrency` at a time.
+
+    Each run works in its own process with BATCH_DIR/<batch_name>/<run name> as working directory,
+    holding its plan, simulation folders and caches; the shared inputs are linked into it
+    (SHARED_INPUTS). A report.json with latency, token counts and success per run is
+    written to the batch folder.
+    """
+    batch_dir = BATCH_DIR / batch_name
+    # a fresh process per run, so no module state (caches, worker pools) leaks between runs
+    with ProcessPoolExecutor(max_workers=max_concurrency, mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as pool:
+        reports = await asyncio.gather(*[
+            run_experiment(name, prompt, batch_dir / name, pool, parallel_dispatch, recursion_limit)
+            for name, prompt in prompts.items()
+        ])
+
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    with open(batch_dir / "report.json", "w") as file:
+        json.dump(reports, file, indent=2, default=str)
+    return reports
+
+
+def print_summary(reports: List[Dict]):
+    print(f"\n{'run':<30} {'success':<8} {'latency [s]':>12} {'tokens':>10} {'context saved (est.)':>21}")
+    for report in reports:
+        print(f"{report['name']:<30} {str(report['success']):<8} {report['latency_s']:>12} {report['total_tokens']:>10} "
+              f"{report['context_tokens']['estimated_saved_tokens']:>21}")
+    n_ok = sum(r["success"] for r in reports)
+    print(f"\n{n_ok}/{len(reports)} runs succeeded, "
+          f"{sum(r['total_tokens'] for r in reports)} tokens in total, "
+          f"an estimated {sum(r['context_tokens']['estimated_saved_tokens'] for r in reports)} sub-agent input tokens saved by bounded context.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Set up many simulations concurrently with the simulation team.")
+    parser.add_argument("prompt_file", help=".json, .jsonl or text file with one prompt per line")
+    parser.add_argument("--batch-name", default=time.strftime("batch_%Y%m%d_%H%M%S"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--parallel-dispatch", action="store_true")
+    parser.add_argument("--recursion-limit", type=int, default=100)
+    args = parser.parse_args()
+
+    # the run processes inherit the environment
+    dotenv.load_dotenv()
+
+    reports = asyncio.run(run_batch(load_prompts(args.prompt_file), args.batch_name, args.concurrency,
+                                    args.parallel_dispatch, args.recursion_limit))
+    print_summary(reports)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,45 @@
-from typing import Any, NotRequired, Tuple
+from typing import Annotated, Any, NotRequired, Tuple
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
-from agents.simulation_team.agent_utils import AgentState, make_agent_subgraph
-from langchain_core.messages import HumanMessage
-import io, contextlib, json, types
+from agents.simulation_team.agent_utils import AgentState, invoke_with_bounded_context, keep_last, make_agent_subgraph
 from langgraph_codeact import create_codeact, CodeActState, create_default_prompt
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 import inspect
 
-import traceback
+from tools.code_vars import drop_deleted
+from tools.code_worker import CPU_SECONDS, MEMORY_MB, current_worker, get_worker_pool, tool_refs
 
 from tools.file_tools import (
     get_helium_void_fraction,
     count_atom_type_in_cif,
     get_unit_cell_size,
+    get_unit_cells_for_cutoff,
+    get_unit_cells_for_folder,
     list_directory,
+    make_editable,
     read_file,
     read_plan,
+    replicate_template,
     write_summary
 )
 
+# characters of output shown to the model per script
+MAX_OUTPUT = 5000
+
+
 class CodeState(CodeActState):
+    # variables the last script deleted are dropped, not merged back from the earlier context
+    context: Annotated[dict[str, Any], drop_deleted]
     instructions: NotRequired[str]
+    # same channel type as AgentState.verdict, both are nodes of the team graph
+    verdict: NotRequired[Annotated[str, keep_last]]
 
 
 def create_code_generator_agent(model, get_only_agent=False):
     # code_model = ChatOpenAI(model="gpt-4o")
     code_model = ChatOpenAI(model="gpt-5")
-    code_tools = [list_directory, read_file, read_plan, write_summary, get_helium_void_fraction, count_atom_type_in_cif,get_unit_cell_size]
+    code_tools = [list_directory, read_file, read_plan, write_summary, get_helium_void_fraction, count_atom_type_in_cif,get_unit_cell_size, get_unit_cells_for_cutoff, get_unit_cells_for_folder, replicate_template, make_editable]
 
     code_prompt = (
     "Role: You are a code generation assistant (code_generator). You do NOT execute tools yourself. "
@@ -36,7 +48,8 @@ def create_code_generator_agent(model, get_only_agent=False):
     "if __name__ == '__main__': blocks, functions, or classes unless explicitly requested. "
     "Always provide runnable code inside a Python code block (surrounded by triple backticks)."
     "Only make ONE code block per message, as all code within a message is executed together."
-    "Note: keep in mind that output (print statements) will be cut off after the first 5000 characters.\n\n"
+    f"Note: keep in mind that output (print statements) longer than {MAX_OUTPUT} characters is shortened to its start and end.\n"
+    f"Each script may use {CPU_SECONDS} s of CPU time and the process {MEMORY_MB} MB of memory.\n\n"
 
     "Important: Never use SystemExit, exit(), quit(), or os._exit() in your code. "
     "If a required file or parameter is missing, handle it gracefully by printing a clear message "
@@ -75,7 +88,13 @@ def {c_tool.name}{str(inspect.signature(c_tool.func))}:
     "   - Use the following tools properly (never invent outputs):\n"
     "       - get_helium_void_fraction: Returns the helium void fraction for a zeolite topology and Al count. Use it when filling simulation.input.\n"
     "       - count_atom_type_in_cif: Returns the number of atoms of a given type in a CIF file. Use it for Al or others.\n"
-    "       - get_unit_cell_size: Returns the unit cell dimensions (a, b, c). Compute required unit cells as: replicas = ceil(2 * CutOff / dim).\n"
+    "       - get_unit_cells_for_cutoff: Returns the required number of unit cells (a, b, c) for a CIF file and cut-off. Do not compute unit cells yourself.\n"
+    "       - get_unit_cells_for_folder: Same as get_unit_cells_for_cutoff, for all CIF files in a folder at once (e.g. 'cifs'). Prefer this when handling many structures.\n"
+    "       - replicate_template: Creates all run folders from the template in one call: fills placeholders from a grid of values "
+    "(mode='product' or 'zip'), takes per-structure values from lookups and CIFs from extra_files, and hard links static files. "
+    "Prefer it over copying and filling files yourself: compute the values it needs (e.g. unit cells per structure), then call it once and print its result.\n"
+    "       - make_editable: The static files made by replicate_template are read-only links shared by all run folders. "
+    "Never open them for writing ('w', 'a', 'r+'); call make_editable(path) first, or write a new file and os.replace it over the old one.\n"
     "   - Ensure the code is safe, idempotent, and handles missing files gracefully.\n"
     "4. If target folders are ambiguous, stop execution and clearly indicate the ambiguity.\n"
     "5. After execution, generate code to validate that files were copied and placeholders filled (check only a few samples).\n"
@@ -87,58 +106,47 @@ def {c_tool.name}{str(inspect.signature(c_tool.func))}:
     "Do not skip or reorder steps. Execute one step per message.\n"
 )
 
-    SAFE_BUILTINS = __builtins__  # or craft a restricted dict if needed
+    refs = tool_refs(code_tools)
+    tool_names = {name for _, name in refs}
+    standalone = []
+
+    def shorten(output: str) -> str:
+        """Keep the start and the end of long output; it was streamed in full while running."""
+        if len(output) <= MAX_OUTPUT:
+            return output
+        head, tail = output[:MAX_OUTPUT * 2 // 3], output[-(MAX_OUTPUT // 3):]
+        return f"{head}\n... [{len(output) - len(head) - len(tail)} characters omitted] ...\n{tail}"
 
-    
     def eval(code: str, context: dict[str, Any]) -> Tuple[str, dict[str, Any]]:
         """
-        Execute code with a unified namespace (globals is locals).
-        `context` should already include your tools and any prior variables.
-        Returns (stdout, persisted_vars) for the next turn.
+        Run code in the worker process of this agent run, whose namespace persists between turns.
+        `context` holds the tools and the variables of earlier turns; the variables restore the
+        namespace if the worker had to be restarted. Returns (output, persisted_vars), where
+        persisted_vars only holds the variables the script changed (large ones as file handles)
+        and the deleted ones as markers.
         """
-        # Build a single namespace so names resolve consistently
-        namespace = {"__builtins__": SAFE_BUILTINS, **context}
-
-        buf = io.StringIO()
+        variables = {k: v for k, v in context.items() if k not in tool_names}
         try:
-            with contextlib.redirect_stdout(buf):
-                exec(code, namespace, namespace)  # <— same dict for globals & locals
-            output = buf.getvalue().strip() or "<code ran, no output printed>"
-        except Exception as e:
-            tb = traceback.format_exc().splitlines()
-            # Keep first 10 lines and last 10 lines
-            head, tail = tb[:10], tb[-10:]
-            trimmed_tb = "\n".join(head + ["... [traceback truncated] ..."] + tail) if len(tb) > 20 else "\n".join(tb)
-            output = f"Error: {repr(e)}\nTraceback:\n{trimmed_tb}"
-    
-        # Persist only safe/serializable user variables (avoid modules/functions/classes)
-        def is_jsonable(x: Any) -> bool:
-            try:
-                json.dumps(x)
-                return True
-            except Exception:
-                return False
-
-        persisted = {}
-        for k, v in namespace.items():
-            if k.startswith("__"):
-                continue
-            if isinstance(v, (types.ModuleType, types.FunctionType, type)):
-                continue
-            # Drop tool bindings if you inject them each turn (recommended)
-            # If you keep tools inside `context`, exclude them here by name.
-            if k in context and context[k] is v and not is_jsonable(v):
-                # skip unserializable carry-overs to avoid msgpack errors
-                continue
-            if is_jsonable(v):
-                persisted[k] = v
-
-        # limit output size
-        MAX_OUTPUT = 5000
-        if len(output) > MAX_OUTPUT:
-            output = output[:MAX_OUTPUT] + "\n... [output truncated]"
-
-        return output, persisted
+            writer = get_stream_writer()
+        except Exception:
+            writer = None
+        on_output = (lambda text: writer({"code_generator_output": text})) if writer is not None else None
+
+        worker = current_worker()
+        if worker is None:
+            # used outside code_generator_node (get_only_agent): one worker for this agent,
+            # with a new session whenever a run starts without variables
+            if not standalone:
+                standalone.append(get_worker_pool().acquire(refs))
+            worker = standalone[0]
+            if not variables:
+                worker.reset()
+        output, error, persisted = worker.run(code, variables, on_output)
+
+        output = output.strip()
+        if error:
+            output = f"{output}\n{error}" if output else error
+        return shorten(output or "<code ran, no output printed>"), persisted
 
 
 
@@ -149,11 +157,11 @@ def {c_tool.name}{str(inspect.signature(c_tool.func))}:
         return code_generator
 
     def code_generator_node(state: CodeState):
-        new_messages = list(state.get("messages", [])) + [HumanMessage(content=state["instructions"], name="supervisor")]
-        result = code_generator.invoke({"messages": new_messages})
-        new_messages.extend(result["messages"])
+        # one warm worker process for the whole run, limited in CPU time and memory
+        with get_worker_pool().session(refs):
+            messages = invoke_with_bounded_context(code_generator.invoke, state, "code_generator_node")
 
-        return {"messages": new_messages, "context":""}
+        return {"messages": messages, "context":""}
     
     agent_subgraph = make_agent_subgraph(CodeState, "run", code_generator_node)
 
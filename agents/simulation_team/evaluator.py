@@ -2,18 +2,21 @@ from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from agents.simulation_team.agent_utils import AgentState, make_agent_subgraph
 from langchain_core.messages import HumanMessage
-import json
 from typing import Literal
 from langgraph.types import Command
 
+from tools.ff_checker import check_force_field, errors, find_force_field_folders, format_report
+from tools.plan_store import load_plan
 from tools.file_tools import (
     list_directory,
     read_file,
     read_plan,
     count_atom_type_in_cif,
     get_unit_cell_size, 
+    get_unit_cells_for_cutoff,
     read_atoms_in_file,
     get_atoms_in_ff_file,
+    check_force_field_files,
     list_example_simulation_inputs
 )
 
@@ -39,7 +42,7 @@ evaluator_message = {
         "Checks:\n"
         "1. simulation.input is in the correct folder.\n"
         "2. Decision made about placeholders (for example, {{pres}}) are sound.\n"
-        "3. Unit cells >= 24 Å in each direction if not replaced by a placeholder (get_unit_cell_size).\n"
+        "3. Unit cells >= 24 Å in each direction if not replaced by a placeholder (get_unit_cells_for_cutoff with a 12 Å cut-off).\n"
         "4. Check that relevant fields are used (for example, for muVT, verify ExternalPressure is a field) \n"
         "5. If applicable, correct number of cations (or placeholder) present based on unit cells and .cif. Use count_atom_type_in_cif to verify.\n"
         "6. Check that adsorbates and cations are named the same in simulation.input and the template folder. (For example, H2O in simulation.input, and H2O.def in the template folder)\n"
@@ -61,11 +64,24 @@ evaluator_message = {
 
 
 def get_current_agent_summary(agent_name):
-    with open("plan.json", "r") as file:
-        plan = json.load(file)
+    plan = load_plan()
     return plan[agent_name].get("summary", "")
 
 
+def force_field_precheck(agent_name):
+    """Run the deterministic force field check on the simulation folders named in the agent's task and summary."""
+    plan = load_plan() or {}
+    entry = plan.get(agent_name[:-5], {})
+    folders = find_force_field_folders([entry.get("task", ""), entry.get("summary", ""), plan.get("simulation_details", "")])
+    return [check_force_field(folder) for folder in folders]
+
+
+# cheap checks that run before the LLM evaluator; if they find errors, the LLM is not needed
+prechecks = {
+    "force_field_agent_node": force_field_precheck,
+}
+
+
 def create_evaluator(model):
     evaluator_model = ChatOpenAI(model="gpt-5")
     evaluator = create_react_agent(
@@ -79,7 +95,8 @@ def create_evaluator(model):
     "3. Otherwise, evaluate the assigned agent’s execution strictly based on facts:\n"
     "   - Compare the agent’s reported actions to the plan.\n"
     "   - Use list_directory to confirm folders exist.\n"
-    "   - Use available tools to check file contents without reading (read_atoms_in_file, count_atom_type_in_cif, get_unit_cell_size, get_atoms_in_ff_file).\n"
+    "   - Use available tools to check file contents without reading (read_atoms_in_file, count_atom_type_in_cif, get_unit_cell_size, get_unit_cells_for_cutoff, get_atoms_in_ff_file, check_force_field_files).\n"
+    "   - If an automated check result is given, do not repeat the checks it covers.\n"
     "   - Only use read_file for 'simulation.input'"
     "   - Do not verify CIFs, adsorbates, or the origin of files.\n"
     "4. Follow the specific checks provided in the accompanying message.\n"
@@ -87,19 +104,53 @@ def create_evaluator(model):
     "   - If correct, reply only: good execution by \"agent_name\".\n"
     "   - If incorrect, state exactly what is wrong or missing.\n"
     ),
-    tools=[list_directory, read_file, read_atoms_in_file, count_atom_type_in_cif,read_plan,get_unit_cell_size,list_example_simulation_inputs, get_atoms_in_ff_file],
+    tools=[list_directory, read_file, read_atoms_in_file, count_atom_type_in_cif,read_plan,get_unit_cell_size,get_unit_cells_for_cutoff,list_example_simulation_inputs, get_atoms_in_ff_file, check_force_field_files],
     state_schema=AgentState
 )
     
-    def evaluator_node(state: AgentState) -> Command[Literal["supervisor"]]:
-        agent_name = state["current_agent"]
-
+    def evaluator_input(agent_name, reports=()):
         summary = get_current_agent_summary(agent_name[:-5])
+        messages = [HumanMessage(content=evaluator_message[agent_name], name="instructions"), HumanMessage(content=summary, name=agent_name[:-5])]
+        if reports:
+            messages.append(HumanMessage(content="Automated check result:\n" + "\n".join(format_report(r) for r in reports), name="checker"))
+        return {"messages": messages}
+
+    def precheck(agent_name):
+        """Returns a verdict if the deterministic checks found errors, else the reports for the LLM evaluator."""
+        if agent_name not in prechecks:
+            return None, []
+        reports = prechecks[agent_name](agent_name)
+        failed = [r for r in reports if errors(r)]
+        if failed:
+            return "\n".join(format_report(r) for r in failed), reports
+        # passed, or no folder found (inconclusive)
+        return None, reports
 
-        messages = {"messages": [HumanMessage(content=evaluator_message[agent_name], name="instructions"), HumanMessage(content=summary, name=agent_name[:-5])]}
+    def evaluator_node(state: AgentState) -> Command[Literal["supervisor"]]:
+        # agents dispatched in parallel are joined here and evaluated together
+        agent_names = state.get("dispatched_agents") or [state["current_agent"]]
+
+        verdicts, inputs = {}, {}
+        for agent_name in agent_names:
+            verdict, reports = precheck(agent_name)
+            if verdict is not None:
+                verdicts[agent_name] = verdict
+            else:
+                inputs[agent_name] = evaluator_input(agent_name, reports)
+
+        if len(inputs) == 1:
+            (agent_name, agent_input), = inputs.items()
+            verdicts[agent_name] = evaluator.invoke(agent_input)["messages"][-1].content
+        elif inputs:
+            results = evaluator.batch(list(inputs.values()))
+            verdicts.update({agent_name: result["messages"][-1].content for agent_name, result in zip(inputs, results)})
+
+        if len(agent_names) == 1:
+            messages = [verdicts[agent_names[0]]]
+        else:
+            messages = [f"{agent_name[:-5]}: {verdicts[agent_name]}" for agent_name in agent_names]
 
-        result = evaluator.invoke(messages)
         return {"messages": [
-            HumanMessage(content=result["messages"][-1].content, name="evaluator")
-        ]}
-    return evaluator_node
\ No newline at end of file
+            HumanMessage(content=verdict, name="evaluator") for verdict in messages
+        ], "dispatched_agents": None, "verdicts": verdicts}
+    return evaluator_node
@@ -1,7 +1,6 @@
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
-from agents.simulation_team.agent_utils import AgentState, make_agent_subgraph
-from langchain_core.messages import HumanMessage
+from agents.simulation_team.agent_utils import AgentState, invoke_with_bounded_context, make_agent_subgraph
 
 from tools.file_tools import (
     
@@ -10,8 +9,11 @@ from tools.file_tools import (
     list_directory,
     copy_file,
     read_atoms_in_file,
-    get_all_force_field_descriptions,
+    find_force_fields,
+    read_force_field_description,
     get_atoms_in_ff_file,
+    merge_force_fields,
+    get_pair_interactions,
     read_plan,
     write_summary,
     delete_file
@@ -32,11 +34,13 @@ def create_force_field_agent(model):
         "- pseudo_atoms.def\n"
         "- force_field.def (interactions between atoms)\n"
         "- force_field_mixing_rules.def (self interactions/mixing rules)\n\n"
-        "Available tools: copy_file, read_file, write_file, get_all_force_field_descriptions, "
-        "list_directory, read_atoms_in_file, read_plan, write_plan, get_atoms_in_ff_file.\n\n"
+        "Available tools: copy_file, read_file, write_file, find_force_fields, read_force_field_description, "
+        "list_directory, read_atoms_in_file, read_plan, write_plan, get_atoms_in_ff_file, merge_force_fields, get_pair_interactions.\n\n"
         "Instructions:\n"
         "1. Read the plan ('read_plan' tool) to understand the simulation context and requirements, before carrying out further steps.\n"
-        "2. Identify appropriate force field(s) from the `forcefields` directory using the 'get_all_force_field_descriptions' tool.\n"
+        "2. Identify appropriate force field(s) from the `forcefields` directory using the 'find_force_fields' tool,\n"
+        "   filtered by the atom types/elements and species you need (e.g. atom_types=['Si', 'O'], species=['CH4']).\n"
+        "   Read the full description of a candidate with 'read_force_field_description' only when the summary is not enough.\n"
         "   - When combining force fields, combine their parameters in ONE file.\n"
         "   - Do not copy/generate multiple force field files, only make the required ones.\n"
         "3. Copy the relevant adsorbate and cation files. Do NOT make these templates, find the appropriate adsorbate in force field folders.\n"
@@ -46,7 +50,13 @@ def create_force_field_agent(model):
         "   - pseudo_atoms.def\n"
         "   - force_field.def\n"
         "   - force_field_mixing_rules.def\n"
-        "   Omit any unused parameters. You can check for which atoms a force field contains parameters using 'get_atoms_in_ff_file'."
+        "   Omit any unused parameters. You can check for which atoms a force field contains parameters using 'get_atoms_in_ff_file'.\n"
+        "   Prefer 'merge_force_fields' over writing these files by hand: after copying the adsorbate/cation files and the .cif,\n"
+        "   call it with the chosen force field folders (the one whose parameters take precedence first) and the simulation folder.\n"
+        "   It writes the three files with only the parameters for the atom types in that folder, and reports conflicts and atom types without parameters."
+        "\n   Do not compute mixed cross terms by hand: 'get_pair_interactions' lists them for a folder, and merge_force_fields\n"
+        "   with expand_pairs=True writes every pair explicitly: when the sources use different mixing rules, each source's pairs keep\n"
+        "   its own rule and pairs across sources use the first source's rule (reported as cross_mixing_rule).\n"
         " Follow the force field structure of example files. Do not leave your own comments (#) in ff files."
         "7. If any required file or parameter is missing, create valid content using write_file. "
         "If you need to remove a file, use delete_file to do so.\n"
@@ -59,16 +69,13 @@ def create_force_field_agent(model):
         "all files copied or created, and any assumptions made. Use 'write_summary' to update the plan with your actions (be concise)."
     ),
     state_schema=AgentState,
-    tools=[copy_file, read_file, write_file, get_all_force_field_descriptions, list_directory, read_atoms_in_file, read_plan, write_summary, get_atoms_in_ff_file, delete_file]
+    tools=[copy_file, read_file, write_file, find_force_fields, read_force_field_description, list_directory, read_atoms_in_file, read_plan, write_summary, get_atoms_in_ff_file, merge_force_fields, get_pair_interactions, delete_file]
     )
 
     def force_field_agent_node(state: AgentState):
-        new_messages = list(state.get("messages", [])) + [HumanMessage(content=state["instructions"], name="supervisor")]
-        result = force_field_agent.invoke({"messages": new_messages})
+        messages = invoke_with_bounded_context(force_field_agent.invoke, state, "force_field_agent_node")
 
-        new_messages.extend(result["messages"])
-
-        return {"messages": new_messages}
+        return {"messages": messages}
 
     agent_subgraph = make_agent_subgraph(AgentState, "run", force_field_agent_node)
 
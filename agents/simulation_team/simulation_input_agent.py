@@ -1,10 +1,10 @@
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
-from agents.simulation_team.agent_utils import AgentState, make_agent_subgraph
-from langchain_core.messages import HumanMessage
+from agents.simulation_team.agent_utils import AgentState, invoke_with_bounded_context, make_agent_subgraph
 
 from tools.file_tools import (
     get_unit_cell_size,
+    get_unit_cells_for_cutoff,
     read_plan,
     write_summary,
     read_file,
@@ -36,7 +36,7 @@ def create_simulation_input_agent(model):
         "3. Adapt the template to the current simulation:\n"
         "   - Verify the structure and adsorbate files in the target folder using list_directory and read_file.\n"
         "   - Adjust units, file references, component names, etc., as needed.\n"
-        "   - Ensure the simulation box is at least 24 Å in each direction, by using 'get_unit_cell_size'.\n"
+        "   - Ensure the simulation box is at least 24 Å in each direction, by using 'get_unit_cells_for_cutoff' (cut-off 12 Å) rather than computing it from 'get_unit_cell_size'.\n"
         "   - Include only placeholders required for this simulation type (e.g., {{pres}} for μVT; omit {{temp}} if not needed).\n"
         "   - The amount of unit cells should be written as UnitCells a b c\n"
         "5. Write the final file using write_file, named `simulation.input` in the correct folder.\n"
@@ -54,6 +54,7 @@ def create_simulation_input_agent(model):
            list_directory, 
            count_atom_type_in_cif, 
            get_unit_cell_size,
+           get_unit_cells_for_cutoff,
            list_example_simulation_inputs, 
            copy_file,  
            read_plan, 
@@ -62,12 +63,9 @@ def create_simulation_input_agent(model):
 
 
     def simulation_input_agent_node(state: AgentState):
-        new_messages = list(state.get("messages", [])) + [HumanMessage(content=state["instructions"], name="supervisor")]
-        result = simulation_input_agent.invoke({"messages": new_messages})
+        messages = invoke_with_bounded_context(simulation_input_agent.invoke, state, "simulation_input_agent_node")
 
-        new_messages.extend(result["messages"])
-
-        return {"messages": new_messages}
+        return {"messages": messages}
 
     agent_subgraph = make_agent_subgraph(AgentState, "run", simulation_input_agent_node)
 
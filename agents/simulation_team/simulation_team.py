@@ -5,7 +5,7 @@ from agents.simulation_team.simulation_input_agent import create_simulation_inpu
 from agents.simulation_team.code_generator import create_code_generator_agent
 from agents.simulation_team.evaluator import create_evaluator
 
-from tools.handoff_tools import create_handoff_tool
+from tools.handoff_tools import create_handoff_tool, create_parallel_handoff_tool, parallel_dispatch_node, PARALLEL_DISPATCH_NODE
 from agents.simulation_team.agent_utils import AgentState
 from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph import StateGraph, START, MessagesState, END
@@ -36,10 +36,25 @@ transfer_to_code_generator = create_handoff_tool(
     "Provide clear instructions for what the code should copy or modify, including the target folder and any specific parameters.\n" \
 )
 
+transfer_to_agents_in_parallel = create_parallel_handoff_tool(
+    agent_names=["structure_agent_node", "force_field_agent_node", "simulation_input_agent_node"],
+    sender_name="supervisor",
+    description="Transfer to several independent agents at once (structure_agent, force_field_agent, simulation_input_agent). "
+    "Each agent gets its own task; all are evaluated together once they finish."
+)
+
 transfer_tools = [transfer_to_structure_agent, transfer_to_force_field_agent, transfer_to_simulation_input_agent, transfer_to_code_generator]
 
-def create_simulation_team():
-    supervisor = create_supervisor_agent(transfer_tools)
+def create_simulation_team(parallel_dispatch=False):
+    """Build the simulation team graph.
+
+    With parallel_dispatch, the supervisor can hand off to several agents in one step;
+    their branches are joined before the evaluator runs.
+    """
+    if parallel_dispatch:
+        supervisor = create_supervisor_agent(transfer_tools + [transfer_to_agents_in_parallel], parallel_dispatch=True)
+    else:
+        supervisor = create_supervisor_agent(transfer_tools)
     structure_graph = create_structure_agent(None)
     ff_graph = create_force_field_agent(None)
     si_graph = create_simulation_input_agent(None)
@@ -48,7 +63,8 @@ def create_simulation_team():
 
     supervisor_memory = InMemorySaver()
     supervisor_graph = (StateGraph(AgentState)
-                    .add_node(supervisor, destinations=("structure_agent_node", "force_field_agent_node", "simulation_input_agent_node", "code_generator_node"))
+                    .add_node(supervisor, destinations=("structure_agent_node", "force_field_agent_node", "simulation_input_agent_node", "code_generator_node")
+                              + ((PARALLEL_DISPATCH_NODE,) if parallel_dispatch else ()))
                     .add_node("structure_agent_node", structure_graph)
                     .add_node("force_field_agent_node", ff_graph)
                     .add_node("simulation_input_agent_node", si_graph)
@@ -59,7 +75,18 @@ def create_simulation_team():
                     .add_edge("simulation_input_agent_node", "evaluator_node")
                     .add_edge("code_generator_node", "evaluator_node")
                     .add_edge("evaluator_node", "supervisor")
-                    .add_edge(START, "supervisor")
-                    .compile(checkpointer=supervisor_memory))
-    
-    return supervisor_graph
\ No newline at end of file
+                    .add_edge(START, "supervisor"))
+
+    if parallel_dispatch:
+        supervisor_graph.add_node(PARALLEL_DISPATCH_NODE, parallel_dispatch_node,
+                                  destinations=("structure_agent_node", "force_field_agent_node", "simulation_input_agent_node"))
+
+    return supervisor_graph.compile(checkpointer=supervisor_memory)
+
+
+if __name__ == "__main__":
+    # smoke check: both variants of the team graph build
+    # python -m agents.simulation_team.simulation_team
+    for parallel in (False, True):
+        graph = create_simulation_team(parallel_dispatch=parallel)
+        print(f"parallel_dispatch={parallel}: {len(graph.get_graph().nodes)} nodes")
@@ -1,7 +1,6 @@
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
-from agents.simulation_team.agent_utils import AgentState, make_agent_subgraph
-from langchain_core.messages import HumanMessage
+from agents.simulation_team.agent_utils import AgentState, invoke_with_bounded_context, make_agent_subgraph
 
 from tools.file_tools import (
     read_plan,
@@ -37,12 +36,9 @@ def create_structure_agent(model):
     tools=[copy_file, read_file, write_file, list_example_runs, list_directory, read_plan, write_summary, delete_file]
 )
     def structure_agent_node(state: AgentState):
-        new_messages = list(state.get("messages", [])) + [HumanMessage(content=state["instructions"], name="supervisor")]
-        result = structure_agent.invoke({"messages": new_messages})
+        messages = invoke_with_bounded_context(structure_agent.invoke, state, "structure_agent_node")
 
-        new_messages.extend(result["messages"])
-
-        return {"messages": new_messages}
+        return {"messages": messages}
 
     agent_subgraph = make_agent_subgraph(AgentState, "run", structure_agent_node)
 
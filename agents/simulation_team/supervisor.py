@@ -7,16 +7,28 @@ from langchain_core.messages import HumanMessage
 
 
 from tools.file_tools import (
-    get_all_force_field_descriptions,
+    find_force_fields,
+    read_force_field_description,
     make_plan,
     edit_plan,
     create_folder,
     list_directory,
     read_plan,
     edit_simulation_details,
+    replicate_template,
 )
 
-def create_supervisor_agent(transfer_tools):
+PARALLEL_DISPATCH_PROMPT = """
+Parallel Dispatch:
+- structure_agent and force_field_agent are independent: dispatch them together with transfer_to_agents_in_parallel.
+- Never call several transfer tools in one message; use transfer_to_agents_in_parallel instead.
+- Give force_field_agent the path of the source .cif (e.g. in 'cifs/'), as the template copy may not exist yet.
+- simulation_input_agent may join the same dispatch when the structure, adsorbate and cation names are fixed in the plan.
+- code_generator always runs alone, after the template is complete.
+- The evaluator reports on every dispatched agent; re-dispatch only the failing ones.
+"""
+
+def create_supervisor_agent(transfer_tools, parallel_dispatch=False):
     supervisor_model = ChatOpenAI(model="gpt-5")
 
 
@@ -38,9 +50,10 @@ Core Principles:
 - Keep instructions concise; agents know implementation.
 
 Available Tools:
-- get_all_force_field_descriptions
+- find_force_fields, read_force_field_description
 - make_plan, edit_plan
 - create_folder
+- replicate_template
 - transfer_to_structure_agent
 - transfer_to_force_field_agent
 - transfer_to_simulation_input_agent
@@ -57,14 +70,16 @@ Planning:
 
 
 Workflow Guidelines:
-1. Understand simulation requirements, and inspect which forcefields are available using 'get_all_force_field_descriptions'.
+1. Understand simulation requirements, and find forcefields that cover the framework atoms and species using 'find_force_fields' (filter by atom_types/species; read a full description only if needed).
 2. Build or update the plan based on requirements.
 3. Create ONE flat template folder (create_folder).
 4. Delegate tasks to agents following the plan:
    - structure_agent → place framework or placeholder
    - force_field_agent → select and combine FF parameters from existing files in 'forcefields/'; indicate which sources to use
    - simulation_input_agent → specify which simulation parameters could be templated in natural language. The agent will figure out the specifics.
-   - code_generator → replicate template for all structures/conditions
+   - Replicate the template for all structures/conditions: when every placeholder value is known, call 'replicate_template' yourself
+     (parameter grid, CIFs via extra_files, per-structure values via lookups). Otherwise code_generator → replicate template
+     for all structures/conditions (it computes values such as unit cells or void fractions and uses replicate_template as well).
   - Keep guidance short; do not specify file formats or extra metadata.
 
 5. After each agent call:
@@ -90,20 +105,22 @@ Force Field Guidance:
 Goal:
 Complete setup with ONE flat reusable template, replicated across all requested conditions.
 Return final plan version, folder structure, key files, and updates.
-"""
+""" + (PARALLEL_DISPATCH_PROMPT if parallel_dispatch else "")
 
 
 
 
 ),
     tools=[
-           get_all_force_field_descriptions,
+           find_force_fields,
+           read_force_field_description,
            list_directory,
            read_plan,
            make_plan,
            edit_simulation_details,
            edit_plan,
            create_folder,
+           replicate_template,
 ] + transfer_tools,
     state_schema=AgentState,
     version="v2"
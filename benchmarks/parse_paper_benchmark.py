@@ -0,0 +1,83 @@
+"""Benchmark PDF parsing throughput (pages/second) on local PDFs.
+
+Usage:
+    python -m benchmarks.parse_paper_benchmark [pdf or folder ...] [--repeat 3]
+
+Without arguments, all PDFs in ./papers are used.
+"""
+import argparse
+import time
+
+from pathlib import Path
+
+import pymupdf
+
+from tools.paper_tools import parse_paper
+from tools.pdf_extract import MAX_WORKERS, iter_paper_blocks
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in map(Path, paths or ["papers"]):
+        if path.is_dir():
+            pdfs.extend(sorted(path.rglob("*.pdf")))
+        elif path.suffix.lower() == ".pdf":
+            pdfs.append(path)
+    # the same PDF can be hard linked into several paper folders
+    unique = {}
+    for pdf in pdfs:
+        st = pdf.stat()
+        unique.setdefault((st.st_dev, st.st_ino), pdf)
+    return list(unique.values())
+
+
+def time_it(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        print("No PDFs found.")
+        return
+
+    # start the worker pool outside the timings
+    list(iter_paper_blocks(str(pdfs[0]), parallel=True))
+
+    print(f"{len(pdfs)} PDFs, {MAX_WORKERS} workers, best of {args.repeat}\n")
+    print(f"{'file':<40} {'pages':>6} {'extract seq':>12} {'extract par':>12} {'parse seq':>10} {'parse par':>10}  [pages/s]")
+    totals = {"pages": 0, "extract_seq": 0.0, "extract_par": 0.0, "parse_seq": 0.0, "parse_par": 0.0}
+    for pdf in pdfs:
+        with pymupdf.open(pdf) as doc:
+            n_pages = doc.page_count
+        timings = {
+            "extract_seq": time_it(lambda: list(iter_paper_blocks(str(pdf), parallel=False)), args.repeat),
+            "extract_par": time_it(lambda: list(iter_paper_blocks(str(pdf), parallel=True)), args.repeat),
+            # the full classification, not the per-PDF header cache
+            "parse_seq": time_it(lambda: parse_paper(str(pdf), parallel=False, use_cache=False), args.repeat),
+            "parse_par": time_it(lambda: parse_paper(str(pdf), parallel=True, use_cache=False), args.repeat),
+        }
+        totals["pages"] += n_pages
+        for key, seconds in timings.items():
+            totals[key] += seconds
+        rates = " ".join(f"{n_pages / timings[k]:>{w}.1f}" for k, w in
+                         [("extract_seq", 12), ("extract_par", 12), ("parse_seq", 10), ("parse_par", 10)])
+        print(f"{pdf.name[:40]:<40} {n_pages:>6} {rates}")
+
+    rates = " ".join(f"{totals['pages'] / totals[k]:>{w}.1f}" for k, w in
+                     [("extract_seq", 12), ("extract_par", 12), ("parse_seq", 10), ("parse_par", 10)])
+    print(f"{'total':<40} {totals['pages']:>6} {rates}")
+
+
+if __name__ == "__main__":
+    main()
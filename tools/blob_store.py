@@ -0,0 +1,238 @@
+"""Content-addressed store for the static files of run folders.
+
+Files are stored once under .blobs/<sha256[:2]>/<sha256> and read-only; run folders made by
+tools.sweep.replicate get hard links (or reflinks, or copies across file systems) to them. Such
+files must not be opened for writing: replace them (atomic_write_text) or call make_editable first.
+
+    python -m tools.blob_store verify runs/
+    python -m tools.blob_store dedup runs/
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import stat
+import threading
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+BLOB_DIR = Path(".blobs")
+# linux/fs.h, clones a file on copy-on-write file systems (btrfs, xfs)
+FICLONE = 0x40049409
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def atomic_write_text(path, text: str):
+    """Write a file by replacing it, so a hard link to a blob is broken instead of modifying the blob."""
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def private_copy(src, dst) -> str:
+    """Copy src to dst as a writable file of its own (a reflink where supported); returns "reflinked" or
+    "copied". An existing dst, e.g. a link to a blob, is replaced rather than written through."""
+    src, dst = Path(src), Path(dst)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    mode = "reflinked" if _reflink(src, tmp) else "copied"
+    if mode == "copied":
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return mode
+
+
+def is_shared(path) -> bool:
+    st = Path(path).stat()
+    return st.st_nlink > 1 or not st.st_mode & stat.S_IWUSR
+
+
+def make_editable(path) -> bool:
+    """Replace a shared (linked or read-only) file by a private writable copy; True if it was shared."""
+    if not is_shared(path):
+        return False
+    private_copy(path, path)
+    return True
+
+
+def _remove(path: Path):
+    if path.exists() or path.is_symlink():
+        path.unlink()
+
+
+class BlobStore:
+    """Immutable blobs addressed by their sha256, shared by hard links."""
+
+    def __init__(self, root=BLOB_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        # (path, inode, size, mtime) -> digest, so unchanged sources are hashed once
+        self._digests: Dict[Tuple[str, int, int, int], str] = {}
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _digest(self, path: Path) -> str:
+        st = path.stat()
+        key = (str(path.resolve()), st.st_ino, st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def put(self, path) -> str:
+        """Store a file, returns its digest. Storing the same content again is a no-op."""
+        path = Path(path)
+        digest = self._digest(path)
+        blob = self.blob_path(digest)
+        if not blob.exists():
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            tmp = blob.with_name(f".{digest}.{threading.get_ident()}.tmp")
+            shutil.copyfile(path, tmp)
+            os.chmod(tmp, READ_ONLY)
+            # link rather than replace: when two threads store the same file, the first blob stays
+            # and the links already made to it stay valid
+            try:
+                os.link(tmp, blob)
+            except FileExistsError:
+                pass
+            finally:
+                tmp.unlink()
+        return digest
+
+    def materialize(self, digest: str, dst) -> str:
+        """Place a blob at dst as a hard link, a reflink or a copy; returns which one was made."""
+        blob, dst = self.blob_path(digest), Path(dst)
+        if dst.exists() and os.path.samefile(blob, dst):
+            return "linked"
+        _remove(dst)
+        try:
+            os.link(blob, dst)
+            return "linked"
+        except OSError:
+            pass
+        if _reflink(blob, dst):
+            return "reflinked"
+        shutil.copyfile(blob, dst)
+        return "copied"
+
+    def link(self, src, dst) -> str:
+        """Store src and place it at dst; returns "linked", "reflinked" or "copied"."""
+        return self.materialize(self.put(src), dst)
+
+    def verify(self, folder=None) -> Dict:
+        """Check every blob against its digest, and report how much space the links under folder save."""
+        blobs, corrupted, blob_bytes = {}, [], 0
+        for blob in self.root.glob("??/*"):
+            if blob.name.startswith("."):
+                continue
+            st = blob.stat()
+            blobs[st.st_ino] = blob
+            blob_bytes += st.st_size
+            if file_digest(blob) != blob.name:
+                corrupted.append(str(blob))
+
+        report = {"blobs": len(blobs), "blob_bytes": blob_bytes, "corrupted_blobs": corrupted}
+        if folder is not None:
+            linked, logical, inodes = 0, 0, set()
+            for path in Path(folder).rglob("*"):
+                if path.is_symlink() or not path.is_file():
+                    continue
+                st = path.stat()
+                if st.st_ino in blobs:
+                    linked += 1
+                    logical += st.st_size
+                    inodes.add(st.st_ino)
+            physical = sum(blobs[ino].stat().st_size for ino in inodes)
+            report.update({"folder": str(folder), "linked_files": linked, "linked_bytes": logical,
+                           "stored_bytes": physical, "saved_bytes": logical - physical})
+        return report
+
+    def dedup(self, folder, min_size: int = 0) -> Dict[str, int]:
+        """Replace the files under folder that are not blob links yet by links to blobs."""
+        blob_inodes = {blob.stat().st_ino for blob in self.root.glob("??/*")} if self.root.exists() else set()
+        counts = {"linked": 0, "reflinked": 0, "copied": 0, "skipped": 0}
+        for path in sorted(Path(folder).rglob("*")):
+            if path.is_symlink() or not path.is_file() or path.name.startswith("."):
+                continue
+            st = path.stat()
+            if st.st_ino in blob_inodes or st.st_size < min_size:
+                counts["skipped"] += 1
+                continue
+            digest = self.put(path)
+            mode = self.materialize(digest, path)
+            counts[mode] += 1
+            blob_inodes.add(self.blob_path(digest).stat().st_ino)
+        return counts
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["verify", "dedup"])
+    parser.add_argument("folder", nargs="?", default="runs")
+    parser.add_argument("--blob-dir", default=str(BLOB_DIR))
+    parser.add_argument("--min-size", type=int, default=0, help="dedup: leave files smaller than this (bytes)")
+    args = parser.parse_args()
+
+    store = BlobStore(args.blob_dir)
+    if args.command == "dedup":
+        print(store.dedup(args.folder, args.min_size))
+    report = store.verify(args.folder)
+    print(f"{report['blobs']} blobs, {format_bytes(report['blob_bytes'])}")
+    print(f"{report['linked_files']} linked files in {report['folder']}: {format_bytes(report['linked_bytes'])}, "
+          f"stored once as {format_bytes(report['stored_bytes'])}, saved {format_bytes(report['saved_bytes'])}")
+    if report["corrupted_blobs"]:
+        print("Corrupted blobs (modified in place through a link):")
+        for blob in report["corrupted_blobs"]:
+            print(f"  {blob}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import re
+
+from typing import Dict, List, Tuple
+
+from tools.token_utils import TOKEN_MODEL, count_tokens
+
+
+# Chunk sizes in tokens. Every paper is stored at each size, so agents can read a view
+# that fits their budget; DEFAULT_VIEW is used when they do not ask for one.
+CHUNK_SIZES = {"small": 256, "medium": 1024, "large": 2048}
+DEFAULT_VIEW = "medium"
+# share of a chunk repeated at the start of the next one
+OVERLAP = 0.1
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def split_units(text: str) -> List[str]:
+    """Paragraphs of a section. Text blocks from the PDF, such as table rows, are never split across them."""
+    return [unit.strip() for unit in PARAGRAPH_BREAK.split(text) if unit.strip()]
+
+
+def _pack(pieces: List[Tuple[str, int]], max_tokens: int, sep: str, overlap_tokens: int = 0) -> List[str]:
+    """Greedily join (text, tokens) pieces into chunks of at most max_tokens."""
+    chunks, current, size = [], [], 0
+    for piece, n in pieces:
+        if current and size + n > max_tokens:
+            chunks.append(sep.join(p for p, _ in current))
+            # carry trailing pieces over as context, as long as the new piece still fits
+            carried, carried_size = [], 0
+            for p, m in reversed(current):
+                if carried_size + m > overlap_tokens or carried_size + m + n > max_tokens:
+                    break
+                carried.insert(0, (p, m))
+                carried_size += m
+            current, size = carried, carried_size
+        current.append((piece, n))
+        size += n
+    if current:
+        chunks.append(sep.join(p for p, _ in current))
+    return chunks
+
+
+def _split_unit(unit: str, max_tokens: int, model: str) -> List[Tuple[str, int]]:
+    """Split a paragraph that is larger than a chunk at line breaks, and over-long lines at spaces."""
+    lines = []
+    for line in unit.split("\n"):
+        n = count_tokens(line, model) + 1
+        if n <= max_tokens:
+            lines.append((line, n))
+            continue
+        words = [(word, count_tokens(word, model) + 1) for word in line.split()]
+        lines.extend((part, count_tokens(part, model) + 1) for part in _pack(words, max_tokens, " "))
+    return [(part, count_tokens(part, model) + 1) for part in _pack(lines, max_tokens, "\n")]
+
+
+def measure_units(text: str, model: str = TOKEN_MODEL) -> List[Tuple[str, int]]:
+    # + 1 for the paragraph break that joins units
+    return [(unit, count_tokens(unit, model) + 1) for unit in split_units(text)]
+
+
+def chunk_units(units: List[Tuple[str, int]], max_tokens: int, model: str = TOKEN_MODEL) -> List[str]:
+    pieces = []
+    for unit, n in units:
+        pieces.extend(_split_unit(unit, max_tokens, model) if n > max_tokens else [(unit, n)])
+    return _pack(pieces, max_tokens, "\n\n", int(max_tokens * OVERLAP))
+
+
+def chunk_text(text: str, max_tokens: int, model: str = TOKEN_MODEL) -> List[str]:
+    """Split text into chunks of at most max_tokens tokens at paragraph boundaries."""
+    return chunk_units(measure_units(text, model), max_tokens, model)
+
+
+def chunk_sections(sections: Dict[str, str], sizes: Dict[str, int] = CHUNK_SIZES,
+                   model: str = TOKEN_MODEL) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """Chunk every section at every size: {view: {section: {"chunk_0": text, ...}}}.
+
+    Paragraphs are measured once and shared between the views.
+    """
+    measured = {section: measure_units(text, model) for section, text in sections.items()}
+    views = {}
+    for view, max_tokens in sizes.items():
+        views[view] = {
+            section: {f"chunk_{i}": chunk for i, chunk in enumerate(chunk_units(units, max_tokens, model))}
+            for section, units in measured.items()
+        }
+    return views
@@ -0,0 +1,165 @@
+import re
+
+from typing import Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+
+class Token(NamedTuple):
+    text: str
+    quoted: bool
+
+
+class AtomSite(NamedTuple):
+    label: str
+    type_symbol: str
+    fract_x: float
+    fract_y: float
+    fract_z: float
+
+
+_ELEMENT = re.compile(r"[A-Z][a-z]?")
+
+
+def iter_tokens(lines: Iterable[str]) -> Iterator[Token]:
+    """Split CIF text into tokens, one line at a time.
+
+    Handles comments, single/double quoted values and semicolon text fields.
+    """
+    text_field = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if text_field is not None:
+            if line.startswith(";"):
+                yield Token("\n".join(text_field), True)
+                text_field = None
+                line = line[1:]
+            else:
+                text_field.append(line)
+                continue
+        elif line.startswith(";"):
+            text_field = [line[1:]]
+            continue
+
+        i, n = 0, len(line)
+        while i < n:
+            ch = line[i]
+            if ch.isspace():
+                i += 1
+            elif ch == "#":
+                break
+            elif ch in "'\"":
+                # a quote only closes when followed by whitespace or end of line
+                j = i + 1
+                while j < n and not (line[j] == ch and (j + 1 == n or line[j + 1].isspace())):
+                    j += 1
+                yield Token(line[i + 1:j], True)
+                i = j + 1
+            else:
+                j = i
+                while j < n and not line[j].isspace():
+                    j += 1
+                yield Token(line[i:j], False)
+                i = j
+
+    if text_field is not None:
+        yield Token("\n".join(text_field), True)
+
+
+def iter_cif(lines: Iterable[str]) -> Iterator[Tuple]:
+    """Stream a CIF file as events.
+
+    Yields ("data", name), ("item", tag, value) and ("loop", tags, row) tuples,
+    where `tags` are the loop column headers and `row` the matching values.
+    """
+    tags = None         # headers of the loop being read
+    row = []
+    reading_tags = False
+    pending_tag = None
+
+    for token in iter_tokens(lines):
+        text, quoted = token
+        lower = text.lower()
+        keyword = not quoted and (text.startswith("_") or lower == "loop_"
+                                  or lower.startswith("data_") or lower.startswith("save_"))
+
+        if tags is not None:
+            if reading_tags and not quoted and text.startswith("_"):
+                tags.append(text.lower())
+                continue
+            if not keyword:
+                reading_tags = False
+                row.append(text)
+                if len(row) == len(tags):
+                    yield ("loop", tags, row)
+                    row = []
+                continue
+            tags, row, reading_tags = None, [], False
+
+        if pending_tag is not None and not keyword:
+            yield ("item", pending_tag, text)
+            pending_tag = None
+            continue
+        pending_tag = None
+
+        if lower == "loop_":
+            tags, row, reading_tags = [], [], True
+        elif lower.startswith("data_"):
+            yield ("data", text[5:])
+        elif text.startswith("_"):
+            pending_tag = text.lower()
+
+
+def to_float(value: str) -> float:
+    """Convert a CIF number to float, ignoring standard uncertainties like 18.256(3)."""
+    value = value.split("(")[0]
+    if value in ("", ".", "?"):
+        return float("nan")
+    return float(value)
+
+
+def type_from_label(label: str) -> str:
+    """Guess the element from an atom site label (e.g. Al12 -> Al)."""
+    match = _ELEMENT.match(label)
+    return match.group(0) if match else label
+
+
+class AtomSiteColumns(NamedTuple):
+    label: Optional[int]
+    type_symbol: Optional[int]
+    fract: Optional[Tuple[int, int, int]]
+
+
+def atom_site_columns(tags: Sequence[str]) -> Optional[AtomSiteColumns]:
+    """Map the headers of an _atom_site loop to column indices (None if it is another loop)."""
+    index = {tag: i for i, tag in enumerate(tags)}
+    label = index.get("_atom_site_label")
+    type_symbol = index.get("_atom_site_type_symbol")
+    if label is None and type_symbol is None:
+        return None
+    fract_keys = ("_atom_site_fract_x", "_atom_site_fract_y", "_atom_site_fract_z")
+    fract = tuple(index[k] for k in fract_keys) if all(k in index for k in fract_keys) else None
+    return AtomSiteColumns(label, type_symbol, fract)
+
+
+def make_atom_site(columns: AtomSiteColumns, row: Sequence[str]) -> AtomSite:
+    label = row[columns.label] if columns.label is not None else row[columns.type_symbol]
+    type_symbol = row[columns.type_symbol] if columns.type_symbol is not None else type_from_label(label)
+    if columns.fract is not None:
+        x, y, z = (to_float(row[i]) for i in columns.fract)
+    else:
+        x = y = z = float("nan")
+    return AtomSite(label, type_symbol, x, y, z)
+
+
+def iter_atom_sites(path) -> Iterator[AtomSite]:
+    """Yield the atom sites of a CIF file without loading the whole file."""
+    columns, columns_for = None, None
+    with open(path, "r") as file:
+        for event in iter_cif(file):
+            if event[0] != "loop":
+                continue
+            tags, row = event[1], event[2]
+            if tags is not columns_for:
+                columns, columns_for = atom_site_columns(tags), tags
+            if columns is not None:
+                yield make_atom_site(columns, row)
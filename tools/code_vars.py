@@ -0,0 +1,180 @@
+"""Carrying variables of generated code from one turn to the next.
+
+Only variables the last script could have changed are looked at. Whether a value can be
+stored as JSON is decided from the types of its elements, without encoding it, and values
+that are large (or NumPy arrays) are written to disk and kept in the agent state as a handle.
+A spilled value that is only read is not written again; deleted variables are sent back as
+markers, which drop_deleted removes from the agent state.
+"""
+import os
+import pickle
+import types
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+
+SPILL_DIR = Path(".cache") / "code_vars"
+# values estimated larger than this (as JSON) are spilled to disk
+SPILL_BYTES = int(os.environ.get("CODE_SPILL_BYTES", 64 * 1024))
+# key of a handle to a spilled value
+SPILLED = "$spilled"
+# key of the marker sent back for a variable the script deleted
+DELETED = "$deleted"
+
+SKIPPED_TYPES = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)
+
+
+def json_size(value: Any, _active: Optional[Set[int]] = None) -> Optional[int]:
+    """Rough size of `value` as JSON from the types of its elements, or None if json.dumps would fail."""
+    if value is None or isinstance(value, bool):
+        return 5
+    if isinstance(value, str):
+        return len(value) + 2
+    if isinstance(value, (int, float)):
+        return 12
+    if not isinstance(value, (list, tuple, dict)):
+        return None
+    active = _active if _active is not None else set()
+    if id(value) in active:
+        # a circular reference
+        return None
+    active.add(id(value))
+    size = 2
+    if isinstance(value, dict):
+        items = value.items()
+        for key, _ in items:
+            if not (key is None or isinstance(key, (str, int, float, bool))):
+                active.discard(id(value))
+                return None
+    else:
+        items = ((None, v) for v in value)
+    for key, item in items:
+        n = json_size(item, active)
+        if n is None:
+            active.discard(id(value))
+            return None
+        size += n + (len(str(key)) + 4 if key is not None else 2)
+    active.discard(id(value))
+    return size
+
+
+def code_names(code: types.CodeType) -> Set[str]:
+    """Every name a compiled script (including its functions and comprehensions) refers to."""
+    names = set(code.co_names) | set(code.co_varnames)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+def snapshot(namespace: Dict[str, Any]) -> Dict[str, int]:
+    return {name: id(value) for name, value in namespace.items()}
+
+
+def changed_names(before: Dict[str, int], namespace: Dict[str, Any], names: Iterable[str]) -> Set[str]:
+    """Variables that are new or rebound since `before`, or that the script refers to and so may have mutated."""
+    changed = {name for name, value in namespace.items() if before.get(name) != id(value)}
+    return changed | {name for name in names if name in namespace}
+
+
+def deleted_names(before: Dict[str, int], namespace: Dict[str, Any]) -> Set[str]:
+    return {name for name in before if name not in namespace and not name.startswith("__")}
+
+
+def is_deleted(value: Any) -> bool:
+    return isinstance(value, dict) and value.get(DELETED) is True
+
+
+def drop_deleted(left: Any, right: Any) -> Any:
+    """Reducer of the code agent's context: the new context without the variables marked deleted."""
+    if not isinstance(right, dict):
+        return right
+    return {name: value for name, value in right.items() if not is_deleted(value)}
+
+
+def size_signature(value: Any, size: Optional[int] = None) -> Tuple:
+    """What must stay the same for a spilled value to count as unchanged: its shape, or its JSON size."""
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, value.dtype.str)
+    return (type(value).__name__, json_size(value) if size is None else size)
+
+
+class VariableStore:
+    """Persisted variables of one session; spilled values live in their own folder."""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.turn = 0
+        # name -> (id, size signature) of the value behind each handle in the agent state
+        self._spilled: Dict[str, Tuple[int, Tuple]] = {}
+
+    def _unchanged(self, name: str, value: Any, signature: Tuple) -> bool:
+        # mutations that keep the size (e.g. an array edited in place) are not seen
+        return self._spilled.get(name) == (id(value), signature)
+
+    def spill(self, name: str, value: Any) -> Dict[str, Any]:
+        self.folder.mkdir(parents=True, exist_ok=True)
+        # a restarted worker starts counting again, the pid keeps the names apart
+        path = self.folder / f"{name}.{os.getpid()}.{self.turn}.pkl"
+        with open(path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        handle = {SPILLED: str(path), "type": type(value).__name__}
+        if isinstance(value, np.ndarray):
+            handle["shape"] = list(value.shape)
+        elif hasattr(value, "__len__"):
+            handle["len"] = len(value)
+        return handle
+
+    def persist(self, namespace: Dict[str, Any], names: Iterable[str], skip: Iterable[str] = (),
+                deleted: Iterable[str] = ()) -> Dict[str, Any]:
+        """Values to store for the given variables: JSON values, or handles for large values and arrays.
+        Variables that cannot be stored (modules, functions, open files, ...) are left out, as are
+        spilled values whose identity and size did not change; deleted variables are marked {DELETED: True}."""
+        self.turn += 1
+        skip = set(skip)
+        persisted = {}
+        for name in deleted:
+            if name not in skip:
+                self._spilled.pop(name, None)
+                persisted[name] = {DELETED: True}
+        for name in names:
+            if name.startswith("__") or name in skip or name not in namespace:
+                continue
+            value = namespace[name]
+            if isinstance(value, SKIPPED_TYPES):
+                continue
+            if isinstance(value, np.ndarray):
+                size = None
+            else:
+                size = json_size(value)
+                if size is None:
+                    continue
+                if size <= SPILL_BYTES:
+                    self._spilled.pop(name, None)
+                    persisted[name] = value
+                    continue
+            signature = size_signature(value, size)
+            if self._unchanged(name, value, signature):
+                continue
+            persisted[name] = self.spill(name, value)
+            self._spilled[name] = (id(value), signature)
+        return persisted
+
+    def restore(self, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Variables with their spilled values loaded back; handles whose file is gone are dropped."""
+        restored = {}
+        for name, value in variables.items():
+            if is_deleted(value):
+                continue
+            if isinstance(value, dict) and SPILLED in value:
+                try:
+                    with open(value[SPILLED], "rb") as f:
+                        value = pickle.load(f)
+                except OSError:
+                    continue
+                self._spilled[name] = (id(value), size_signature(value))
+            restored[name] = value
+        return restored
@@ -0,0 +1,299 @@
+"""Long-lived worker processes that run generated code.
+
+Each worker keeps its namespace between turns, so imports and variables stay warm, and runs
+under CPU time and memory limits. Output is sent back as it is printed. A worker that hangs,
+runs out of memory or crashes is killed and replaced without taking the agent process down;
+its variables are restored from the previous turn (see tools.code_vars).
+"""
+import builtins
+import contextlib
+import importlib
+import multiprocessing
+import os
+import pickle
+import shutil
+import signal
+import threading
+import time
+import traceback
+import uuid
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from tools.code_vars import SPILL_DIR, VariableStore, changed_names, code_names, deleted_names, snapshot
+from tools.plan_store import current_plan_path, set_plan_dir
+
+
+# CPU seconds per turn, memory per worker and wall clock seconds per turn
+CPU_SECONDS = int(os.environ.get("CODE_CPU_SECONDS", 300))
+MEMORY_MB = int(os.environ.get("CODE_MEMORY_MB", 4096))
+WALL_SECONDS = int(os.environ.get("CODE_WALL_SECONDS", 600))
+POOL_SIZE = int(os.environ.get("CODE_WORKERS", 4))
+
+
+class CPUTimeExceeded(TimeoutError):
+    pass
+
+
+# CPU seconds allowed for the running turn, set in the worker process
+_cpu_seconds = CPU_SECONDS
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPUTimeExceeded(f"CPU time limit of {_cpu_seconds} s exceeded")
+
+
+def _set_cpu_limit(seconds: Optional[int]):
+    global _cpu_seconds
+    if resource is None:
+        return
+    _cpu_seconds = seconds or _cpu_seconds
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    # the limit counts the whole life of the process, so it is moved along every turn
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+class _PipeWriter:
+    """File-like object that sends every completed line to the parent process."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.buffer = ""
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        if "\n" in self.buffer:
+            lines, _, self.buffer = self.buffer.rpartition("\n")
+            self.conn.send(("out", lines + "\n"))
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            self.conn.send(("out", self.buffer))
+            self.buffer = ""
+
+
+def format_exception(e: BaseException) -> str:
+    tb = traceback.format_exc().splitlines()
+    # Keep first 10 lines and last 10 lines
+    head, tail = tb[:10], tb[-10:]
+    trimmed_tb = "\n".join(head + ["... [traceback truncated] ..."] + tail) if len(tb) > 20 else "\n".join(tb)
+    return f"Error: {repr(e)}\nTraceback:\n{trimmed_tb}"
+
+
+def _load_tools(refs: Iterable[Tuple[str, str]]) -> Dict[str, Callable]:
+    tools = {}
+    for module, name in refs:
+        obj = getattr(importlib.import_module(module), name)
+        tools[name] = getattr(obj, "func", obj)
+    return tools
+
+
+def _serve(conn, tool_refs: List[Tuple[str, str]], memory_mb: int):
+    """Worker loop: ("reset", variables, spill_dir) starts a new namespace, ("run", code, plan_dir, cpu_seconds) runs code."""
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    tools = _load_tools(tool_refs)
+    namespace = {"__builtins__": builtins, **tools}
+    store = VariableStore(SPILL_DIR / "default")
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message[0] == "reset":
+            _, variables, spill_dir = message
+            store = VariableStore(spill_dir)
+            namespace = {"__builtins__": builtins, **tools, **store.restore(variables)}
+            continue
+
+        _, code, plan_dir, cpu_seconds = message
+        set_plan_dir(plan_dir)
+        writer = _PipeWriter(conn)
+        error = None
+        before, names = snapshot(namespace), set()
+        try:
+            _set_cpu_limit(cpu_seconds)
+            compiled = compile(code, "<string>", "exec")
+            names = code_names(compiled)
+            with contextlib.redirect_stdout(writer), contextlib.redirect_stderr(writer):
+                exec(compiled, namespace, namespace)  # <— same dict for globals & locals
+        except (Exception, SystemExit) as e:
+            error = format_exception(e)
+        finally:
+            _set_cpu_limit(None)
+        writer.flush()
+        # only what this script could have changed, the earlier values are already in the agent state
+        try:
+            persisted = store.persist(namespace, changed_names(before, namespace, names), skip=tools,
+                                      deleted=deleted_names(before, namespace))
+        except (MemoryError, RecursionError, OSError, pickle.PicklingError) as e:
+            persisted, error = {}, (error or "") + f"\nVariables could not be saved: {e!r}"
+        conn.send(("done", error, persisted))
+
+
+class CodeWorker:
+    """A worker process with a persistent namespace. Restarted on demand after a crash or timeout."""
+
+    def __init__(self, tool_refs: List[Tuple[str, str]], memory_mb: int = MEMORY_MB):
+        self.tool_refs = tool_refs
+        self.memory_mb = memory_mb
+        self.process = None
+        self.conn = None
+        self.spill_dir = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child_conn, self.tool_refs, self.memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+        self.process, self.conn = None, None
+
+    def _send_reset(self, variables: Dict[str, Any]):
+        if not self.alive:
+            self.start()
+        self.conn.send(("reset", variables, str(self.spill_dir)))
+
+    def reset(self):
+        """Start a new session: an empty namespace and a new folder for spilled variables."""
+        self.clear()
+        self.spill_dir = SPILL_DIR / uuid.uuid4().hex
+        self._send_reset({})
+
+    def clear(self):
+        """Remove the spilled variables of the current session."""
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    def run(self, code: str, variables: Optional[Dict[str, Any]] = None,
+            on_output: Optional[Callable[[str], None]] = None,
+            cpu_seconds: int = CPU_SECONDS, wall_seconds: int = WALL_SECONDS) -> Tuple[str, Optional[str], Dict[str, Any]]:
+        """Run code; returns (output, error, persisted variables).
+
+        `variables` restore the namespace when the worker had to be restarted.
+        """
+        if self.spill_dir is None:
+            self.reset()
+        if not self.alive:
+            self._send_reset(variables or {})
+        plan_dir = str(current_plan_path().parent)
+        self.conn.send(("run", code, plan_dir, cpu_seconds))
+
+        output = []
+        deadline = time.monotonic() + wall_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                ready = remaining > 0 and self.conn.poll(remaining)
+                message = self.conn.recv() if ready else None
+            except (EOFError, OSError):
+                message = ("crashed",)
+            if message is None:
+                self.kill()
+                return "".join(output), f"Error: the code ran longer than {wall_seconds} s and was stopped.", {}
+            if message[0] == "crashed":
+                self.process.join(timeout=5)
+                exitcode = self.process.exitcode
+                self.kill()
+                return "".join(output), (f"Error: the worker process died (exit code {exitcode}), e.g. by exiting or by "
+                                         f"running out of memory ({self.memory_mb} MB). It is restarted for the next script."), {}
+            if message[0] == "out":
+                output.append(message[1])
+                if on_output is not None:
+                    on_output(message[1])
+            else:
+                return "".join(output), message[1], message[2]
+
+
+class WorkerPool:
+    """Idle workers are reused by later sessions, so each session starts warm."""
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = size
+        self._idle: Dict[Tuple, List[CodeWorker]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, tool_refs: List[Tuple[str, str]]) -> CodeWorker:
+        key = tuple(tool_refs)
+        with self._lock:
+            idle = self._idle.get(key, [])
+            worker = idle.pop() if idle else CodeWorker(list(tool_refs))
+        worker.reset()
+        return worker
+
+    def release(self, worker: CodeWorker):
+        worker.clear()
+        with self._lock:
+            idle = self._idle.setdefault(tuple(worker.tool_refs), [])
+            if worker.alive and len(idle) < self.size:
+                idle.append(worker)
+                return
+        worker.kill()
+
+    @contextmanager
+    def session(self, tool_refs: List[Tuple[str, str]]):
+        worker = self.acquire(tool_refs)
+        token = _current_worker.set(worker)
+        try:
+            yield worker
+        finally:
+            _current_worker.reset(token)
+            self.release(worker)
+
+
+# The worker of the current agent run; like the plan folder, it follows the run into LangGraph threads
+_current_worker: ContextVar[Optional[CodeWorker]] = ContextVar("code_worker", default=None)
+
+_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool()
+    return _pool
+
+
+def current_worker() -> Optional[CodeWorker]:
+    return _current_worker.get()
+
+
+def tool_refs(tools) -> List[Tuple[str, str]]:
+    """(module, name) of tools defined at module level, so a worker can import them."""
+    refs = []
+    for t in tools:
+        func = getattr(t, "func", t)
+        refs.append((func.__module__, getattr(t, "name", func.__name__)))
+    return refs
@@ -0,0 +1,165 @@
+import re
+
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from tools.raspa_ff import (
+    FF_FILES, FORCE_FIELD_FILE, MIXING_RULES_FILE, PSEUDO_ATOMS_FILE,
+    ForceFieldOverrides, MixingRules, Molecule, PseudoAtoms, _data_lines, pair_key,
+)
+from tools.ff_library import FORCEFIELDS_DIR
+from tools.structure_index import load_structure
+
+
+PATH_TOKEN = re.compile(r"[\w\-./]+")
+# folders the agents copy from; their files are inputs, not a simulation set up by an agent
+SOURCE_DIRS = (Path("cifs"), FORCEFIELDS_DIR)
+
+
+def folder_atom_types(folder) -> List[str]:
+    """Atom types of the structures (.cif) and molecules (adsorbate/cation .def) in a folder."""
+    types = {}
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix == ".cif":
+            types.update(dict.fromkeys(load_structure(path).unique_types))
+        elif path.suffix == ".def" and path.name not in FF_FILES:
+            types.update(dict.fromkeys(Molecule.parse(path.read_text()).atom_types))
+    return list(types)
+
+
+def _issue(severity: str, file: str, message: str) -> Dict[str, str]:
+    return {"severity": severity, "file": file, "message": message}
+
+
+def _count_issues(file: str, lines: List[str]) -> List[Dict[str, str]]:
+    """Compare the counts declared in a file with the entries that follow them."""
+    issues = []
+    if file == PSEUDO_ATOMS_FILE:
+        declared, actual = int(lines[0]), len(lines) - 1
+        if declared != actual:
+            issues.append(_issue("error", file, f"declares {declared} pseudo atoms but lists {actual}"))
+    elif file == MIXING_RULES_FILE:
+        declared = int(lines[2])
+        actual = sum(1 for line in lines[3:] if len(line.split()) >= 2)
+        if declared != actual:
+            issues.append(_issue("error", file, f"declares {declared} interactions but lists {actual}"))
+        if len(lines[-1].split()) != 1:
+            issues.append(_issue("error", file, "the general mixing rule is missing at the end of the file"))
+    elif file == FORCE_FIELD_FILE:
+        i, blocks = 0, []
+        while i < len(lines) and lines[i].isdigit():
+            n = int(lines[i])
+            blocks.append(lines[i + 1:i + 1 + n])
+            if len(blocks[-1]) < n:
+                issues.append(_issue("error", file, f"declares {n} entries but lists {len(blocks[-1])}"))
+            i += 1 + n
+        if len(blocks) > 1:
+            pairs = [pair_key(*line.split()[:2]) for line in blocks[1] if len(line.split()) >= 2]
+            if len(pairs) > len(set(pairs)):
+                issues.append(_issue("warning", file, f"{len(pairs) - len(set(pairs))} duplicate pair interactions"))
+        if len(blocks) != 3:
+            issues.append(_issue("error", file, f"expected 3 counted blocks (rules, interactions, mixing rules), found {len(blocks)}"))
+        if i < len(lines):
+            issues.append(_issue("error", file, f"{len(lines) - i} lines after the last counted block, "
+                                                "the declared number of interactions is probably too low"))
+    return issues
+
+
+def check_force_field(folder) -> Dict:
+    """Check the force field files of a simulation folder against its structures and molecules.
+
+    Returns the atom types in use and a list of issues ({"severity", "file", "message"}). Errors
+    make the simulation fail or use wrong parameters; warnings are unused or duplicate entries.
+    """
+    folder = Path(folder)
+    issues = []
+    parsed = {}
+    for file, cls in ((PSEUDO_ATOMS_FILE, PseudoAtoms), (MIXING_RULES_FILE, MixingRules), (FORCE_FIELD_FILE, ForceFieldOverrides)):
+        path = folder / file
+        if not path.exists():
+            issues.append(_issue("error", file, "missing"))
+            continue
+        text = path.read_text()
+        try:
+            issues += _count_issues(file, _data_lines(text))
+            parsed[file] = cls.parse(text)
+        except (ValueError, IndexError) as e:
+            issues.append(_issue("error", file, f"cannot be parsed: {e}"))
+
+    for path in sorted(folder.glob("*.def")):
+        if path.name in FF_FILES:
+            continue
+        try:
+            molecule = Molecule.parse(path.read_text())
+        except (ValueError, IndexError) as e:
+            issues.append(_issue("error", path.name, f"cannot be parsed: {e}"))
+            continue
+        for group in molecule.groups:
+            if group.declared_atoms != len(group.atoms):
+                issues.append(_issue("error", path.name, f"group '{group.label}' declares {group.declared_atoms} atoms "
+                                                         f"but lists {len(group.atoms)} positions"))
+        if molecule.declared_atoms != molecule.n_atoms:
+            issues.append(_issue("error", path.name, f"declares {molecule.declared_atoms} atoms in total "
+                                                     f"but its groups hold {molecule.n_atoms}"))
+
+    try:
+        needed = folder_atom_types(folder)
+    except (ValueError, IndexError):
+        # unreadable molecules are reported above
+        needed = []
+    needed_set = set(needed)
+    pseudo = set(parsed[PSEUDO_ATOMS_FILE].atoms) if PSEUDO_ATOMS_FILE in parsed else None
+    mixing = set(parsed[MIXING_RULES_FILE].interactions) if MIXING_RULES_FILE in parsed else None
+
+    if pseudo is not None:
+        for atom_type in needed:
+            if atom_type not in pseudo:
+                issues.append(_issue("error", PSEUDO_ATOMS_FILE, f"no pseudo atom for {atom_type}"))
+        for atom_type in sorted(pseudo - needed_set) if needed else []:
+            issues.append(_issue("warning", PSEUDO_ATOMS_FILE, f"{atom_type} is not used by any structure or molecule"))
+    if mixing is not None:
+        for atom_type in needed:
+            if atom_type not in mixing:
+                issues.append(_issue("error", MIXING_RULES_FILE, f"no self interaction for {atom_type}"))
+        if pseudo is not None:
+            for atom_type in sorted(mixing - pseudo):
+                issues.append(_issue("error", MIXING_RULES_FILE, f"{atom_type} is not defined in {PSEUDO_ATOMS_FILE}"))
+    if FORCE_FIELD_FILE in parsed:
+        for type1, type2 in parsed[FORCE_FIELD_FILE].interactions:
+            for atom_type in (type1, type2):
+                if pseudo is not None and atom_type not in pseudo:
+                    issues.append(_issue("error", FORCE_FIELD_FILE, f"{type1}-{type2} uses {atom_type}, "
+                                                                    f"which is not defined in {PSEUDO_ATOMS_FILE}"))
+            if needed and not {type1, type2} <= needed_set:
+                issues.append(_issue("warning", FORCE_FIELD_FILE, f"{type1}-{type2} involves an unused atom type"))
+
+    return {"folder": str(folder), "atom_types": needed, "issues": issues}
+
+
+def errors(report: Dict) -> List[Dict[str, str]]:
+    return [issue for issue in report["issues"] if issue["severity"] == "error"]
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"- [{issue['severity']}] {issue['file']}: {issue['message']}" for issue in report["issues"]]
+    return f"Force field check of {report['folder']}:\n" + ("\n".join(lines) if lines else "no issues found")
+
+
+def _is_source(path: Path) -> bool:
+    resolved = path.resolve()
+    return any(resolved == d.resolve() or d.resolve() in resolved.parents for d in SOURCE_DIRS)
+
+
+def find_force_field_folders(texts: Iterable[str]) -> List[Path]:
+    """Simulation folders mentioned in free text (a task or summary): existing folders outside
+    cifs/ and forcefields/ that hold a force field file. A folder without one is left out, as
+    there is nothing to check yet."""
+    folders = {}
+    for text in texts:
+        for token in PATH_TOKEN.findall(text or ""):
+            path = Path(token.rstrip("./"))
+            if not token.strip("./") or path in folders or not path.is_dir() or _is_source(path):
+                continue
+            if any((path / name).is_file() for name in FF_FILES):
+                folders[path] = None
+    return list(folders)
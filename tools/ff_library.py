@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import threading
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from tools.raspa_ff import (
+    FF_FILES, FORCE_FIELD_FILE, MIXING_RULES_FILE, PSEUDO_ATOMS_FILE,
+    ForceFieldOverrides, MixingRules, Molecule, PseudoAtoms,
+)
+
+
+FORCEFIELDS_DIR = Path("forcefields")
+DESCRIPTION_FILE = "description.md"
+# bump when the catalog entries change, so stale indexes are rebuilt
+INDEX_VERSION = 1
+# characters of the description kept in query results, the full text is read on request
+SUMMARY_CHARS = 300
+
+
+def _signature(folder: Path) -> Dict[str, List[int]]:
+    signature = {}
+    for path in sorted(folder.iterdir()):
+        if path.is_file():
+            stat = path.stat()
+            signature[path.name] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+
+def _summary(description: str) -> str:
+    lines = [line.strip().lstrip("#").strip() for line in description.splitlines()]
+    text = " ".join(line for line in lines if line)
+    return text if len(text) <= SUMMARY_CHARS else text[:SUMMARY_CHARS].rsplit(" ", 1)[0] + " ..."
+
+
+def catalog_force_field(folder) -> Dict:
+    """Catalog entry of a force field folder: atom types, species and interaction counts."""
+    folder = Path(folder)
+    description_path = folder / DESCRIPTION_FILE
+    description = description_path.read_text() if description_path.exists() else ""
+    entry = {
+        "name": folder.name, "summary": _summary(description), "atom_types": {}, "species": {},
+        "self_interactions": 0, "pair_interactions": 0, "mixing_rule": None, "errors": [],
+    }
+
+    files = {name: folder / name for name in FF_FILES}
+    try:
+        if files[PSEUDO_ATOMS_FILE].exists():
+            atoms = PseudoAtoms.parse(files[PSEUDO_ATOMS_FILE].read_text()).atoms
+            entry["atom_types"] = {name: atom.chem for name, atom in atoms.items()}
+        if files[MIXING_RULES_FILE].exists():
+            mixing = MixingRules.parse(files[MIXING_RULES_FILE].read_text())
+            entry["self_interactions"] = len(mixing.interactions)
+            entry["mixing_rule"] = mixing.mixing_rule
+        if files[FORCE_FIELD_FILE].exists():
+            entry["pair_interactions"] = len(ForceFieldOverrides.parse(files[FORCE_FIELD_FILE].read_text()).interactions)
+    except (ValueError, IndexError) as e:
+        entry["errors"].append(str(e))
+
+    for path in sorted(folder.glob("*.def")):
+        if path.name in FF_FILES:
+            continue
+        try:
+            entry["species"][path.stem] = Molecule.parse(path.read_text()).atom_types
+        except (ValueError, IndexError) as e:
+            entry["errors"].append(f"{path.name}: {e}")
+    return entry
+
+
+def _covering_types(entry: Dict, atom_type: str) -> List[str]:
+    """Atom types of a force field that match a requested type by name or element."""
+    wanted = atom_type.strip().lower()
+    return [name for name, chem in entry["atom_types"].items() if wanted in (name.lower(), chem.lower())]
+
+
+def _mentions(text: str, word: str) -> bool:
+    return re.search(rf"(?<![\w-]){re.escape(word)}(?![\w-])", text, re.IGNORECASE) is not None
+
+
+class ForceFieldLibrary:
+    """Catalog of the force fields in `forcefields/`, kept in a JSON index next to them.
+
+    Folders are re-cataloged when any of their files change (by mtime and size), so queries
+    only pay for a stat of each file.
+    """
+
+    def __init__(self, root=FORCEFIELDS_DIR):
+        self.root = Path(root)
+        self.index_path = self.root / ".library_index.json"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._signatures: Dict[str, Dict] = {}
+        self._descriptions: Dict[str, str] = {}
+        if self.index_path.exists():
+            try:
+                data = json.loads(self.index_path.read_text())
+            except ValueError:
+                data = {}
+            if data.get("version") == INDEX_VERSION:
+                self._entries = data["entries"]
+                self._signatures = data["signatures"]
+
+    def sync(self) -> List[str]:
+        """Re-catalog changed force fields and drop removed ones; returns the names that changed."""
+        with self._lock:
+            folders = {path.name: path for path in sorted(self.root.iterdir()) if path.is_dir()}
+            changed = [name for name in self._entries if name not in folders]
+            for name in changed:
+                del self._entries[name], self._signatures[name]
+            for name, folder in folders.items():
+                signature = _signature(folder)
+                if self._signatures.get(name) != signature:
+                    self._entries[name] = catalog_force_field(folder)
+                    self._signatures[name] = signature
+                    self._descriptions.pop(name, None)
+                    changed.append(name)
+            if changed:
+                self._save()
+            return changed
+
+    def _save(self):
+        data = {"version": INDEX_VERSION, "entries": self._entries, "signatures": self._signatures}
+        # batch runs in other processes share the library folder
+        tmp = self.index_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.index_path)
+
+    def description(self, name: str) -> str:
+        if name not in self._descriptions:
+            path = self.root / name / DESCRIPTION_FILE
+            self._descriptions[name] = path.read_text() if path.exists() else ""
+        return self._descriptions[name]
+
+    def query(self, atom_types: Optional[Iterable[str]] = None, species: Optional[Iterable[str]] = None,
+              keyword: Optional[str] = None) -> List[Dict]:
+        """Force fields that cover all `atom_types` (by type name or element), all `species`
+        (by molecule file or a mention in the description) and mention `keyword`.
+
+        Each result lists which of its atom types cover each requested type.
+        """
+        self.sync()
+        atom_types, species = list(atom_types or []), list(species or [])
+        results = []
+        for name, entry in sorted(self._entries.items()):
+            coverage = {atom_type: _covering_types(entry, atom_type) for atom_type in atom_types}
+            if not all(coverage.values()):
+                continue
+            molecules = {s.lower(): s for s in entry["species"]}
+            if not all(s.lower() in molecules or _mentions(self.description(name), s) for s in species):
+                continue
+            if keyword and keyword.lower() not in self.description(name).lower():
+                continue
+            result = {k: v for k, v in entry.items() if v not in ([], {}, None)}
+            if coverage:
+                result["coverage"] = coverage
+            results.append(result)
+        return results
+
+
+_library: Optional[ForceFieldLibrary] = None
+
+
+def get_library() -> ForceFieldLibrary:
+    global _library
+    if _library is None:
+        _library = ForceFieldLibrary()
+    return _library
@@ -1,12 +1,21 @@
-import json
 import os
 import shutil
 
 from pathlib import Path
-from typing import Annotated, List, Dict
+from typing import Annotated, Any, List, Dict, Optional
 
+import numpy as np
 from langchain.agents import tool
 
+from tools.blob_store import atomic_write_text, make_editable as make_editable_file, private_copy
+from tools.ff_checker import check_force_field, folder_atom_types, format_report
+from tools.ff_library import FORCEFIELDS_DIR, get_library
+from tools.mixing import merge_expanded, mix_force_field
+from tools.plan_store import load_plan, save_plan, update_plan
+from tools.raspa_ff import FF_FILES, RaspaForceField, atom_types_in_file, merge, molecule_atom_types
+from tools.structure_index import load_structure, perpendicular_widths, unit_cells_for_cutoff, valid_cells
+from tools.sweep import replicate
+
 
 # Define root folders
 EXAMPLES_DIR = Path("example_runs")
@@ -19,7 +28,7 @@ def list_example_runs_func() -> List[str]:
 
 def list_force_fields_func() -> List[str]:
     """List all available force field definition files."""
-    return sorted([f.name for f in Path("forcefields").iterdir() if f.is_dir()])
+    return sorted([f.name for f in FORCEFIELDS_DIR.iterdir() if f.is_dir()])
 
 @tool
 def list_example_runs() -> List[str]:
@@ -83,37 +92,9 @@ def read_atoms_in_file(folder_path: str, filename: str) -> List[str]:
     path = Path(folder_path) / filename
     
     if filename.endswith('.cif'):
-        with open(path, 'r') as file:
-            lines = file.readlines()
-        atoms = set()
-        structure_started = False
-        for line in lines:
-            if line.startswith("_atom_site"):
-                structure_started = True
-                continue
-            elif structure_started and line.startswith("loop_"):
-                structure_started = False
-                continue
-            elif structure_started:
-                parts = line.split()
-                if len(parts) > 2:
-                    atoms.add(parts[1])
+        atoms = set(load_structure(path).unique_types)
     elif filename.endswith('.def'):
-        with open(path, 'r') as file:
-            lines = file.readlines()
-        atoms = set()
-        atoms_started = False
-        for line in lines:
-            if line.startswith("# atomic positions"):
-                atoms_started = True
-                continue
-            elif atoms_started and line.startswith("#"):
-                atoms_started = False
-                break
-            elif atoms_started:
-                parts = line.split()
-                if len(parts) > 1:
-                    atoms.add(parts[1])
+        atoms = set(molecule_atom_types(path))
 
     return atoms
 
@@ -132,7 +113,8 @@ def write_file(folder_path: str, filename: str, content: str) -> str:
     folder = Path(folder_path)
     folder.mkdir(parents=True, exist_ok=True)
     path = folder / filename
-    path.write_text(content)
+    # replace rather than overwrite, a copied file may be a hard link shared with other run folders
+    atomic_write_text(path, content)
     return f"File {filename} written to {folder_path}."
 
 @tool
@@ -161,16 +143,27 @@ def get_all_example_metadata() -> List[Dict]:
     return all_data
 
 @tool
-def get_all_force_field_descriptions() -> List[Dict]:
-    """Return metadata from all force field description files."""
-    all_data = []
-    for force_field_name in list_force_fields_func():
-        desc = (Path("forcefields") / force_field_name / "description.md").read_text()
-        all_data.append({
-            "name": force_field_name,
-            "description": desc
-        })
-    return all_data
+def find_force_fields(atom_types: Optional[List[str]] = None, species: Optional[List[str]] = None,
+                      keyword: Optional[str] = None) -> List[Dict]:
+    """Find force fields in the library that cover the given atom types and species.
+
+    Args:
+        atom_types: atom types or elements that must all have parameters, e.g. ["Si", "Al", "O"]
+        species: adsorbates or cations that must all be included, e.g. ["CH4"]
+        keyword: text that must appear in the force field description
+
+    Without filters all force fields are listed. Each entry has a short summary, its atom types
+    (type -> element), species, interaction counts and which types cover each requested atom type.
+    Use read_force_field_description for the full description of one force field.
+    """
+    return get_library().query(atom_types, species, keyword)
+
+@tool
+def read_force_field_description(name: str) -> str:
+    """Return the full description of a force field in the library."""
+    if name not in list_force_fields_func():
+        return f"Unknown force field: {name}. Available: {', '.join(list_force_fields_func())}"
+    return get_library().description(name)
 
 @tool
 def copy_file(src: str, dst_folder: str, dst_name: str = None) -> str:
@@ -179,7 +172,8 @@ def copy_file(src: str, dst_folder: str, dst_name: str = None) -> str:
     dst_folder = Path(dst_folder)
     dst_folder.mkdir(parents=True, exist_ok=True)
     dst_path = dst_folder / (dst_name or src.name)
-    shutil.copy(src, dst_path)
+    # a private copy, it may be edited in place; only replicate_template shares files
+    private_copy(src, dst_path)
     return f"Copied {src} to {dst_path}"
 
 @tool
@@ -214,22 +208,7 @@ def count_atom_type_in_cif(cif_path: str, atom_type: str) -> int:
     path = Path(cif_path)
     if not path.exists():
         return 0
-    with open(path, 'r') as file:
-        lines = file.readlines()
-    
-    cnt = 0
-    structure_started = False
-    for line in lines:
-        if line.startswith("_atom_site"):
-            structure_started = True
-            continue
-        elif structure_started and line.startswith("loop_"):
-            structure_started = False
-            continue
-        elif structure_started and line.startswith(atom_type):
-            cnt += 1
-
-    return cnt
+    return load_structure(path).count_type(atom_type)
 
 
 @tool
@@ -239,8 +218,7 @@ def make_plan(simulation_details: Annotated[str, "Details about the simulation."
     """Create a plan for the agents to follow."""
     plan = {agent: {"task": task, "summary": ""} for agent, task in zip(agent_list, task_list)}
     plan["simulation_details"] = simulation_details
-    with open("plan.json", "w") as file:
-        json.dump(plan, file, indent=2)
+    save_plan(plan)
 
     #plan_string = [f"{agent}: {info['task']}" for agent, info in plan.items()]
     #return "\n\n".join(plan_string)
@@ -275,11 +253,10 @@ def get_helium_void_fraction(zeolite_code: str, n_al: Annotated[int, "Number of
 def read_plan() -> str:
     """Read the current plan."""
 
-    if not Path("plan.json").exists():
+    plan_dict = load_plan()
+    if plan_dict is None:
         return "No plan found."
 
-    with open("plan.json", "r") as file:
-        plan_dict = json.load(file)
     agent_string = [f"{agent}:\n Task description: {info['task']} \n Summary: {info['summary']}" for agent, info in plan_dict.items() if agent!= "simulation_details"]
     plan_string = f"Simulation Details: {plan_dict.get('simulation_details', 'No details provided')}\n\n"
     plan_string += "\n\n".join(agent_string)
@@ -288,17 +265,13 @@ def read_plan() -> str:
 @tool
 def write_summary(agent_name: str, task_summary: str):
     """Write a summary of the task carried out by a specific agent."""
-    with open("plan.json", "r") as file:
-        plan_dict = json.load(file)
-    
-    if agent_name in plan_dict:
-        plan_dict[agent_name]["summary"] = task_summary
-    else:
-        raise ValueError(f"Agent {agent_name} not found in the plan.")
-    
-    with open("plan.json", "w") as file:
-        json.dump(plan_dict, file, indent=2)
-    
+    def update(plan_dict):
+        if agent_name in plan_dict:
+            plan_dict[agent_name]["summary"] = task_summary
+        else:
+            raise ValueError(f"Agent {agent_name} not found in the plan.")
+
+    update_plan(update)
     return f"Summary updated."
 
 @tool
@@ -307,103 +280,159 @@ def get_unit_cell_size(cif_path: str):
     path = Path(cif_path)
     if not path.exists():
         return None
-    with open(path, 'r') as file:
-        lines = file.readlines()
-    for line in lines:
-        if line.startswith("_cell_length_a"):
-            a = float(line.split()[1])
-        elif line.startswith("_cell_length_b"):
-            b = float(line.split()[1])
-        elif line.startswith("_cell_length_c"):
-            c = float(line.split()[1])
+    cell = load_structure(path).cell
+    if not valid_cells(cell)[0]:
+        return {"error": f"{cif_path} has no valid cell (a, b, c, alpha, beta, gamma = {cell.tolist()})"}
+    a, b, c = cell[:3].tolist()
     return (a, b, c)
 
 @tool
-def edit_plan(agent_name: str, new_task: str):
-    """Edit the task description for a specific agent."""
-    with open("plan.json", "r") as file:
-        plan_dict = json.load(file)
+def get_unit_cells_for_cutoff(cif_path: str, cutoff: Annotated[float, "Cut-off radius in Angstrom"] = 12.0):
+    """Get the minimum number of unit cells (a, b, c) for a CIF file so that the box is at least twice the cut-off in every direction. Accounts for non-orthogonal cells."""
+    path = Path(cif_path)
+    if not path.exists():
+        return None
+    cell = load_structure(path).cell
+    if not valid_cells(cell)[0]:
+        return {"error": f"{cif_path} has no valid cell (a, b, c, alpha, beta, gamma = {cell.tolist()})"}
+    return {
+        "cell": [round(x, 4) for x in cell.tolist()],
+        "perpendicular_widths": [round(x, 4) for x in perpendicular_widths(cell)[0].tolist()],
+        "unit_cells": unit_cells_for_cutoff(cell, cutoff)[0].tolist(),
+    }
 
-    if agent_name in plan_dict:
-        plan_dict[agent_name]["task"] = new_task
-        plan_dict[agent_name]["summary"] = ""
-    else:
-        raise ValueError(f"Agent {agent_name} not found in the plan.")
+@tool
+def get_unit_cells_for_folder(cif_folder: str = "cifs", cutoff: Annotated[float, "Cut-off radius in Angstrom"] = 12.0) -> Dict[str, Any]:
+    """Get the minimum number of unit cells (a, b, c) for every CIF file in a folder, given a cut-off. Returns a mapping of structure name (without extension) to unit cells, or to an error for a CIF without a valid cell."""
+    paths = sorted(Path(cif_folder).glob("*.cif"))
+    if not paths:
+        return {}
+    cells = np.stack([load_structure(p).cell for p in paths])
+    valid = valid_cells(cells)
+    unit_cells = iter(unit_cells_for_cutoff(cells[valid], cutoff) if valid.any() else [])
+    return {p.stem: next(unit_cells).tolist() if ok else "error: no valid cell (missing lengths or impossible angles)"
+            for p, ok in zip(paths, valid)}
 
-    with open("plan.json", "w") as file:
-        json.dump(plan_dict, file, indent=2)
+@tool
+def edit_plan(agent_name: str, new_task: str):
+    """Edit the task description for a specific agent."""
+    def update(plan_dict):
+        if agent_name in plan_dict:
+            plan_dict[agent_name]["task"] = new_task
+            plan_dict[agent_name]["summary"] = ""
+        else:
+            raise ValueError(f"Agent {agent_name} not found in the plan.")
 
+    update_plan(update)
     return f"Task for {agent_name} updated."
 
 @tool
 def edit_simulation_details(new_details):
     """Edit the simulation details in the plan."""
-    with open("plan.json", "r") as file:
-        plan_dict = json.load(file)
-
-    plan_dict["simulation_details"] = new_details
-
-    with open("plan.json", "w") as file:
-        json.dump(plan_dict, file, indent=2)
+    def update(plan_dict):
+        plan_dict["simulation_details"] = new_details
 
+    update_plan(update)
     return "Simulation details updated."
 
-def get_force_field_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("# type"):
-            started = True
-            continue
-        if started and line.startswith("#"):
-            break
-        if started:
-            interactions.extend(line.split()[:2])
-    return list(set(interactions))
-
-def get_force_field_mixing_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("# type"):
-            started = True
-            continue
-        if started and line.startswith("#"):
-            break
-        if started:
-            interactions.append(line.split()[0])
-    return interactions
-
-def get_pseudo_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("#type"):
-            started = True
-            continue
-        if started and len(line) < 2:
-            break
-        if started:
-            interactions.append(line.split()[0])
-    return interactions
-
 @tool
 def get_atoms_in_ff_file(folder_path: str, file_name: str) -> List[str]:
     """Gets the atoms defined in a force field file (force_field.def, pseudo_atoms.def, force_field_mixing_rules.def)."""
-    assert file_name in ["force_field.def", "pseudo_atoms.def", "force_field_mixing_rules.def"]
-    if file_name == "force_field.def":
-        return get_force_field_atoms(f"{folder_path}/{file_name}")
-    elif file_name == "pseudo_atoms.def":
-        return get_pseudo_atoms(f"{folder_path}/{file_name}")
-    elif file_name == "force_field_mixing_rules.def":
-        return get_force_field_mixing_atoms(f"{folder_path}/{file_name}")
+    assert file_name in FF_FILES
+    return atom_types_in_file(Path(folder_path) / file_name)
 
+@tool
+def check_force_field_files(folder_path: str) -> str:
+    """
+    Check the force field files in a simulation folder: every atom type of the .cif and adsorbate/cation .def files
+    has a pseudo atom and a self interaction, force_field.def only uses defined atoms, and the declared counts
+    (interactions, pseudo atoms, molecule atoms) match the listed entries.
+    """
+    return format_report(check_force_field(folder_path))
+
+@tool
+def merge_force_fields(source_folders: List[str], target_folder: str, atom_types: Optional[List[str]] = None,
+                       expand_pairs: bool = False) -> Dict:
+    """
+    Merge the force fields of several folders (e.g. a framework and an adsorbate force field) into one
+    pseudo_atoms.def, force_field.def and force_field_mixing_rules.def in target_folder.
+
+    Parameters defined in more than one folder are taken from the first folder listed. Only parameters of
+    `atom_types` are kept; by default the atom types of the .cif and adsorbate/cation .def files already in
+    target_folder. Adsorbate and cation files are not copied.
+
+    With expand_pairs, force_field.def lists every pair interaction explicitly instead of only the overrides.
+    If the sources use different general mixing rules, each source's pairs are mixed with its own rule and
+    pairs of types from different sources with the first source's rule, reported as cross_mixing_rule.
+    Without expand_pairs, differing mixing rules are only reported as a conflict.
+    """
+    sources = [RaspaForceField.load(folder) for folder in source_folders]
+    if atom_types is None:
+        atom_types = folder_atom_types(target_folder)
+    if atom_types:
+        sources = [ff.subset(atom_types) for ff in sources]
+    cross_rule = None
+    if expand_pairs:
+        merged, conflicts, cross_rule = merge_expanded(sources)
     else:
-        raise ValueError(f"Unknown file name: {file_name}")
+        merged, conflicts = merge(sources)
+    files = merged.write(target_folder, molecules=False)
+    result = {
+        "files": files,
+        "atom_types": sorted(merged.atom_types),
+        "missing_atom_types": sorted(set(atom_types) - set(merged.pseudo_atoms.atoms)),
+        "conflicts": conflicts,
+    }
+    if cross_rule is not None:
+        result["cross_mixing_rule"] = cross_rule
+    return result
 
+@tool
+def get_pair_interactions(folder_path: str, atom_types: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Table of the pair interactions RASPA uses for the force field in folder_path: the self interactions of
+    force_field_mixing_rules.def mixed with its general mixing rule, with the explicit pairs of force_field.def
+    applied. Each row has the pair, potential, epsilon/sigma and whether it is "mixed" or from force_field.def.
+    Restrict it to atom_types to keep the table short. Use this instead of computing cross terms by hand.
+    """
+    ff = RaspaForceField.load(folder_path)
+    try:
+        return mix_force_field(ff, atom_types).table()
+    except ValueError as e:
+        return [{"error": str(e)}]
+
+@tool
+def make_editable(path: str) -> str:
+    """Turn a file shared with other run folders (made by replicate_template) into a private writable copy,
+    so it can be opened for writing without changing the other folders."""
+    if not Path(path).is_file():
+        return f"No such file: {path}"
+    return f"{path} is now a private copy" if make_editable_file(path) else f"{path} is not shared, it can be edited"
+
+@tool
+def replicate_template(template_folder: str, output_folder: str, parameters: Dict[str, List[Any]],
+                       mode: str = "product", folder_pattern: Optional[str] = None,
+                       lookups: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+                       extra_files: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Create one run folder per parameter combination from a flat template folder, without writing code.
+
+    Args:
+        template_folder: folder whose files contain placeholders like {pressure} or {{structure}}
+        output_folder: where the run folders are created
+        parameters: values per placeholder, e.g. {"structure": ["MFI", "FAU"], "pressure": [1e4, 1e5]}
+        mode: "product" for every combination, "zip" to pair the i-th values of every parameter
+        folder_pattern: run folder path relative to output_folder, e.g. "{structure}/{pressure}"
+            (default: the values joined with "_")
+        lookups: values that depend on another parameter, e.g.
+            {"structure": {"MFI": {"unit_cells": "2 2 2", "void_fraction": 0.29}}}
+        extra_files: files taken from elsewhere per run, e.g. {"{structure}.cif": "cifs/{structure}.cif"}
+
+    Files without placeholders are hard linked instead of copied and are read-only: call make_editable
+    on a file before changing it in place. Nothing is written if a placeholder has no value or a
+    source file is missing, or a parameter fills no placeholder; the error says which.
+    """
+    try:
+        return replicate(template_folder, output_folder, parameters, mode, folder_pattern, lookups, extra_files)
+    except (ValueError, FileNotFoundError) as e:
+        return {"error": str(e)}
@@ -0,0 +1,206 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from typing_extensions import NotRequired, TypedDict
+
+from tools.paper_downloader import PAPERS_DIR
+
+
+FINDINGS_PATH = PAPERS_DIR / ".findings.sqlite"
+# written by earlier versions, imported on first access to a paper
+LEGACY_NAME = "findings.txt"
+
+PARAMETER_ALIASES = {"eps": "epsilon", "ε": "epsilon", "ϵ": "epsilon", "σ": "sigma", "q": "charge", "m": "mass"}
+
+
+class Finding(TypedDict):
+    """One extracted set of parameters, e.g. the Lennard-Jones epsilon and sigma of O-Si."""
+    atom_type: str
+    parameters: Dict[str, Any]
+    species: NotRequired[str]
+    interaction: NotRequired[str]
+    units: NotRequired[Dict[str, str]]
+    section: NotRequired[str]
+    chunk: NotRequired[int]
+
+
+def normalize_parameter(name: str) -> str:
+    name = name.strip().lower()
+    return PARAMETER_ALIASES.get(name, name)
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-9)
+    return a == b
+
+
+def _value(value):
+    """Numbers as floats, everything else (e.g. a mixing rule) as text."""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class FindingsStore:
+    """SQLite store of extracted parameters, one row per (paper, species, atom type, parameter).
+
+    Writing a finding that is already stored is a no-op, a different value replaces the old
+    one. Each row keeps the section and chunk it was read from.
+    """
+
+    def __init__(self, path=FINDINGS_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS findings ("
+            " paper TEXT NOT NULL, species TEXT NOT NULL COLLATE NOCASE, atom_type TEXT NOT NULL,"
+            " parameter TEXT NOT NULL COLLATE NOCASE, value, unit TEXT NOT NULL, interaction TEXT NOT NULL,"
+            " section TEXT, chunk INTEGER, updated REAL NOT NULL,"
+            " PRIMARY KEY (paper, species, atom_type, parameter))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes (paper TEXT NOT NULL, note TEXT NOT NULL, PRIMARY KEY (paper, note))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS imported (paper TEXT PRIMARY KEY)")
+        self._conn.commit()
+
+    def add(self, paper: str, findings: Iterable[Finding], notes: Iterable[str] = ()) -> Dict[str, Any]:
+        """Store findings; returns counts of added, updated and duplicate values, and what changed."""
+        counts = {"added": 0, "updated": 0, "duplicates": 0}
+        changes = []
+        now = time.time()
+        with self._lock:
+            for finding in findings:
+                species = (finding.get("species") or "").strip()
+                atom_type = finding["atom_type"].strip()
+                units = {normalize_parameter(k): v for k, v in (finding.get("units") or {}).items()}
+                for parameter, value in finding["parameters"].items():
+                    parameter, value = normalize_parameter(parameter), _value(value)
+                    key = (paper, species, atom_type, parameter)
+                    row = self._conn.execute(
+                        "SELECT value FROM findings WHERE paper = ? AND species = ? AND atom_type = ? AND parameter = ?",
+                        key,
+                    ).fetchone()
+                    if row is not None and _same(row[0], value):
+                        counts["duplicates"] += 1
+                        continue
+                    if row is None:
+                        counts["added"] += 1
+                    else:
+                        counts["updated"] += 1
+                        changes.append(f"{species + ' ' if species else ''}{atom_type} {parameter}: {row[0]} -> {value}")
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        key + (value, units.get(parameter, ""), finding.get("interaction") or "",
+                               finding.get("section"), finding.get("chunk"), now),
+                    )
+            for note in notes:
+                cur = self._conn.execute("INSERT OR IGNORE INTO notes VALUES (?, ?)", (paper, note.strip()))
+                counts["added" if cur.rowcount else "duplicates"] += 1
+            self._conn.commit()
+        return {**counts, "changes": changes}
+
+    def query(self, paper: Optional[str] = None, species: Optional[str] = None, atom_type: Optional[str] = None,
+              parameter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Findings as a compact table: one row per (paper, species, atom type, interaction) with its parameters."""
+        sql = "SELECT paper, species, atom_type, interaction, parameter, value, unit, section, chunk FROM findings"
+        filters, params = [], []
+        for column, value in (("paper", paper), ("species", species), ("atom_type", atom_type),
+                              ("parameter", normalize_parameter(parameter) if parameter else None)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value.strip())
+        if filters:
+            sql += " WHERE " + " AND ".join(filters)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY paper, species, atom_type, rowid", params).fetchall()
+
+        table = {}
+        for paper_name, species_name, atom, interaction, name, value, unit, section, chunk in rows:
+            entry = table.setdefault((paper_name, species_name, atom, interaction), {
+                "paper": paper_name, "species": species_name, "atom_type": atom, "interaction": interaction,
+                "units": {}, "sources": [],
+            })
+            entry[name] = value
+            if unit:
+                entry["units"][name] = unit
+            if section is not None:
+                source = f"{section}/chunk_{chunk}" if chunk is not None else section
+                if source not in entry["sources"]:
+                    entry["sources"].append(source)
+        # leave out empty fields, and the paper when only one was asked for, to keep the table compact
+        omit = {"paper"} if paper is not None else set()
+        return [{k: v for k, v in entry.items() if v not in ("", {}, []) and k not in omit} for entry in table.values()]
+
+    def notes(self, paper: Optional[str] = None) -> List[str]:
+        sql, params = "SELECT note FROM notes", ()
+        if paper is not None:
+            sql, params = sql + " WHERE paper = ?", (paper,)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql + " ORDER BY rowid", params)]
+
+    def import_legacy(self, paper: str, paper_folder):
+        """Import the findings.txt of a paper once. JSON lines become findings, other lines notes."""
+        path = Path(paper_folder) / LEGACY_NAME
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM imported WHERE paper = ?", (paper,)).fetchone():
+                return
+        findings, notes = [], []
+        if path.exists():
+            with open(path, "r") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        finding = _legacy_finding(line)
+                        if finding is not None:
+                            findings.append(finding)
+                        else:
+                            notes.append(line)
+        self.add(paper, findings, notes)
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO imported VALUES (?)", (paper,))
+            self._conn.commit()
+
+
+def _legacy_finding(line: str) -> Optional[Finding]:
+    """Read a line like {"type": "lennard-jones", "atoms": "O-Si", "epsilon": 0.1, "sigma": 3.4}."""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    atom_type = data.pop("atom_type", None) or data.pop("atoms", None) or data.pop("atom", None)
+    interaction = data.pop("type", None) or data.pop("interaction", "")
+    species = data.pop("species", "")
+    parameters = {k: v for k, v in data.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+    if atom_type is None or not parameters:
+        return None
+    return {"atom_type": str(atom_type), "interaction": str(interaction), "species": str(species),
+            "parameters": parameters}
+
+
+_store: Optional[FindingsStore] = None
+
+
+def get_findings_store() -> FindingsStore:
+    global _store
+    if _store is None:
+        _store = FindingsStore()
+    return _store
@@ -1,4 +1,4 @@
-from typing import List, Annotated
+from typing import Dict, List, Annotated
 
 from langchain_core.tools import tool, InjectedToolCallId
 from langchain_core.messages import HumanMessage, ToolMessage
@@ -37,12 +37,71 @@ def create_handoff_tool(
         handoff_messages = state["messages"] + [tool_message]
 
         # agent_input = {"messages": [task_description_message]}
-        agent_input = {"instructions": task_description}
+        # the agent sees its task and the last verdict on its work, not the supervisor's history
+        agent_input = {"instructions": task_description, "verdict": state.get("verdicts", {}).get(agent_name, "")}
         return Command(
             goto=Send(agent_name, agent_input),
             graph=Command.PARENT,
-                update={**state, "messages": handoff_messages, "current_agent": agent_name},
+            update={"messages": handoff_messages, "current_agent": agent_name, "dispatched_agents": [agent_name]},
+        )
+    return handoff_tool
+
+
+PARALLEL_DISPATCH_NODE = "parallel_dispatch"
+
+
+def parallel_dispatch_node(dispatch: dict) -> Command:
+    """Fan out the tasks of a parallel handoff, one Send per agent.
+
+    Tools cannot return several Sends without losing their state update, so the
+    parallel handoff tool routes through this node of the parent graph.
+    """
+    verdicts = dispatch.get("verdicts", {})
+    return Command(goto=[Send(node, {"instructions": task, "verdict": verdicts.get(node, "")})
+                         for node, task in dispatch["tasks"].items()])
 
+
+def create_parallel_handoff_tool(
+    *, agent_names: List[str], sender_name: str, description: str | None = None
+):
+    """Handoff tool that dispatches several agents at once, each with its own task.
+
+    Requires a PARALLEL_DISPATCH_NODE (parallel_dispatch_node) in the parent graph.
+    All agents run in the same step and are evaluated together.
+    """
+    name = "transfer_to_agents_in_parallel"
+    short_names = [agent.removesuffix("_node") for agent in agent_names]
+    description = description or f"Dispatch several independent agents at once ({', '.join(short_names)})."
+
+    @tool(name, description=description)
+    def handoff_tool(
+        tasks: Annotated[
+            Dict[str, str],
+            f"Mapping of agent name ({', '.join(short_names)}) to a description of what that agent should do, including all of the relevant context.",
+        ],
+        state: Annotated[MessagesState, InjectedState],
+        tool_call_id: Annotated[str, InjectedToolCallId],
+    ):
+        targets = {}
+        for agent, task in tasks.items():
+            node = agent if agent.endswith("_node") else f"{agent}_node"
+            if node not in agent_names:
+                return f"Unknown agent '{agent}'. Choose from: {', '.join(short_names)}."
+            targets[node] = task
+        if not targets:
+            return "No tasks given."
+
+        tool_message = ToolMessage(
+            content=f"Successfully transferred to {', '.join(targets)}",
+            name=name,
+            tool_call_id=tool_call_id,)
+
+        handoff_messages = state["messages"] + [tool_message]
+
+        return Command(
+            goto=Send(PARALLEL_DISPATCH_NODE, {"tasks": targets, "verdicts": state.get("verdicts", {})}),
+            graph=Command.PARENT,
+            update={"messages": handoff_messages, "current_agent": list(targets)[-1], "dispatched_agents": list(targets)},
         )
     return handoff_tool
 
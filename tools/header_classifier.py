@@ -0,0 +1,114 @@
+import hashlib
+import json
+import re
+
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from tools.pdf_extract import TextBlock
+
+
+COMMON_HEADERS = ["Introduction", "Methodology", "Methods", "Results", "Experiments",
+                  "Discussion", "Conclusion", "Abstract", "References", "Supplementary"]
+COMMON_HEADERS_LOWER = [h.lower() for h in COMMON_HEADERS]
+
+# numbered section titles, e.g. "2. Methods" or "3.1 Force field"
+NUMBERED_HEADER = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.)\s+[A-Z]")
+
+HEADER_CACHE_DIR = Path(".cache/headers")
+# bump when the classification rules change, so cached results are not reused
+CLASSIFIER_VERSION = 1
+
+
+def alphabetic_ratio(text):
+    letters = sum(c.isalpha() for c in text)
+    return letters / max(len(text), 1)
+
+
+def is_candidate(text: str, max_length=50) -> bool:
+    """Short, mostly alphabetic blocks can be headers."""
+    text = text.strip()
+    return 0 < len(text) <= max_length and alphabetic_ratio(text) >= 0.75
+
+
+def match_common_headers(texts: Sequence[str], similarity_threshold=80) -> np.ndarray:
+    """Whether each text matches a canonical header, scored in one batch."""
+    if not texts:
+        return np.zeros(0, dtype=bool)
+    scores = process.cdist([t.strip().lower() for t in texts], COMMON_HEADERS_LOWER, scorer=fuzz.partial_ratio)
+    return scores.max(axis=1) >= similarity_threshold
+
+
+class HeaderClassifier:
+    """Classifies text blocks as section headers from text and layout.
+
+    A short, mostly alphabetic block is a header if it matches a canonical header,
+    is numbered like a section, or is set larger or bolder than the body text. The
+    body font size is the size carrying most characters among the blocks seen so
+    far, so batches can be classified as they stream in.
+    """
+
+    def __init__(self, max_length=50, similarity_threshold=80, size_margin=0.5):
+        self.max_length = max_length
+        self.similarity_threshold = similarity_threshold
+        self.size_margin = size_margin
+        self._chars_per_size = Counter()
+
+    def body_size(self) -> float:
+        if not self._chars_per_size:
+            return 0.0
+        return self._chars_per_size.most_common(1)[0][0]
+
+    def classify(self, blocks: Sequence[TextBlock]) -> List[bool]:
+        for block in blocks:
+            self._chars_per_size[block.size] += len(block.text)
+        body_size = self.body_size()
+
+        candidates = [i for i, b in enumerate(blocks) if is_candidate(b.text, self.max_length)]
+        known = match_common_headers([blocks[i].text for i in candidates], self.similarity_threshold)
+
+        headers = [False] * len(blocks)
+        for i, is_known in zip(candidates, known):
+            block = blocks[i]
+            headers[i] = bool(
+                is_known
+                or NUMBERED_HEADER.match(block.text.strip())
+                or block.size >= body_size + self.size_margin
+                or block.bold
+            )
+        return headers
+
+
+def file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_path(digest: str) -> Path:
+    return HEADER_CACHE_DIR / f"{digest}.v{CLASSIFIER_VERSION}.json"
+
+
+def load_cached_headers(digest: str) -> Optional[List[bool]]:
+    path = _cache_path(digest)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_headers(digest: str, headers: List[bool]):
+    try:
+        HEADER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _cache_path(digest).write_text(json.dumps(headers))
+    except OSError:
+        # the cache is an optimisation only
+        pass
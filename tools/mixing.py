@@ -0,0 +1,154 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools.raspa_ff import ForceFieldOverrides, MixingRules, PairInteraction, RaspaForceField, merge, pair_key
+
+
+LENNARD_JONES = "lennard-jones"
+NONE = "none"
+
+
+def lorentz_berthelot(eps: np.ndarray, sigma: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.sqrt(np.outer(eps, eps)), (sigma[:, None] + sigma[None, :]) / 2
+
+
+def jorgensen(eps: np.ndarray, sigma: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return np.sqrt(np.outer(eps, eps)), np.sqrt(np.outer(sigma, sigma))
+
+
+# general mixing rules of force_field_mixing_rules.def, by lower case name
+MIXING_FUNCTIONS = {"lorentz-berthelot": lorentz_berthelot, "jorgensen": jorgensen}
+
+
+@dataclass
+class InteractionMatrix:
+    """Lennard-Jones parameters of every pair of atom types.
+
+    `epsilon` and `sigma` are (N, N) and symmetric. Pairs that are not Lennard-Jones have
+    NaN parameters; `potential` holds their potential ("none" for a type without interactions)
+    and `overrides` the explicit force_field.def entries that replaced the mixed values.
+    """
+    types: List[str]
+    epsilon: np.ndarray
+    sigma: np.ndarray
+    lennard_jones: np.ndarray
+    overrides: Dict[Tuple[str, str], PairInteraction] = field(default_factory=dict)
+
+    def index(self, atom_type: str) -> int:
+        return self.types.index(atom_type)
+
+    def potential(self, type1: str, type2: str) -> str:
+        key = pair_key(type1, type2)
+        if key in self.overrides:
+            return self.overrides[key].potential
+        return LENNARD_JONES if self.lennard_jones[self.index(type1), self.index(type2)] else NONE
+
+    def pair(self, type1: str, type2: str) -> PairInteraction:
+        """The interaction between two types, explicit if overridden, otherwise mixed."""
+        key = pair_key(type1, type2)
+        if key in self.overrides:
+            return self.overrides[key]
+        i, j = self.index(key[0]), self.index(key[1])
+        if not self.lennard_jones[i, j]:
+            return PairInteraction(key[0], key[1], NONE)
+        return PairInteraction(key[0], key[1], LENNARD_JONES, [float(self.epsilon[i, j]), float(self.sigma[i, j])])
+
+    def pairs(self, include_self: bool = False) -> List[PairInteraction]:
+        """All pairs (i <= j in type order), the self pairs only when asked for."""
+        n = len(self.types)
+        return [self.pair(self.types[i], self.types[j]) for i in range(n) for j in range(i if include_self else i + 1, n)]
+
+    def table(self, include_self: bool = True) -> List[Dict]:
+        rows = []
+        for interaction in self.pairs(include_self):
+            row = {"pair": f"{interaction.type1}-{interaction.type2}", "potential": interaction.potential,
+                   "source": "force_field.def" if interaction.key in self.overrides else "mixed"}
+            if interaction.potential == LENNARD_JONES and len(interaction.params) == 2:
+                row["epsilon"], row["sigma"] = interaction.params
+            elif interaction.params:
+                row["params"] = interaction.params
+            rows.append(row)
+        return rows
+
+
+def mix(mixing: MixingRules, overrides: Optional[ForceFieldOverrides] = None,
+        types: Optional[Iterable[str]] = None) -> InteractionMatrix:
+    """Mix the self interactions of `types` (default: all) with the declared rule, then apply the
+    explicit pair interactions of force_field.def.
+
+    Only Lennard-Jones types are mixed; a pair with any other potential (including "none")
+    is "none" unless force_field.def defines it.
+    """
+    rule = MIXING_FUNCTIONS.get(mixing.mixing_rule.strip().lower())
+    if rule is None:
+        raise ValueError(f"Unknown mixing rule: {mixing.mixing_rule}. Known: {', '.join(MIXING_FUNCTIONS)}")
+    types = list(mixing.interactions) if types is None else list(types)
+    missing = [t for t in types if t not in mixing.interactions]
+    if missing:
+        raise ValueError(f"No self interaction for {', '.join(missing)}")
+
+    self_interactions = [mixing.interactions[t] for t in types]
+    is_lj = np.array([i.potential.lower() == LENNARD_JONES and len(i.params) >= 2 for i in self_interactions], dtype=bool)
+    params = np.array([i.params[:2] if lj else (np.nan, np.nan) for i, lj in zip(self_interactions, is_lj)],
+                      dtype=np.float64).reshape(-1, 2)
+    epsilon, sigma = rule(params[:, 0], params[:, 1])
+    lennard_jones = is_lj[:, None] & is_lj[None, :]
+    epsilon[~lennard_jones] = np.nan
+    sigma[~lennard_jones] = np.nan
+
+    applied = {}
+    if overrides is not None:
+        position = {t: i for i, t in enumerate(types)}
+        selected = [o for k, o in overrides.interactions.items() if k[0] in position and k[1] in position]
+        if selected:
+            rows = np.array([position[o.type1] for o in selected])
+            cols = np.array([position[o.type2] for o in selected])
+            lj = np.array([o.potential.lower() == LENNARD_JONES and len(o.params) >= 2 for o in selected], dtype=bool)
+            values = np.array([o.params[:2] if ok else (np.nan, np.nan) for o, ok in zip(selected, lj)],
+                              dtype=np.float64).reshape(-1, 2)
+            for r, c in ((rows, cols), (cols, rows)):
+                epsilon[r, c], sigma[r, c], lennard_jones[r, c] = values[:, 0], values[:, 1], lj
+            applied = {o.key: o for o in selected}
+
+    return InteractionMatrix(types, epsilon, sigma, lennard_jones, applied)
+
+
+def mix_force_field(ff: RaspaForceField, types: Optional[Iterable[str]] = None) -> InteractionMatrix:
+    return mix(ff.mixing, ff.overrides, types)
+
+
+def expand(ff: RaspaForceField) -> RaspaForceField:
+    """A copy of `ff` whose force_field.def lists every pair of its self interaction types
+    explicitly, so the result no longer depends on how RASPA mixes them.
+
+    Explicit pairs with types that have no self interaction are kept as they are.
+    """
+    matrix = mix_force_field(ff)
+    interactions = {interaction.key: interaction for interaction in matrix.pairs()}
+    for key, interaction in ff.overrides.interactions.items():
+        interactions.setdefault(key, interaction)
+    return RaspaForceField(
+        ff.mixing,
+        ForceFieldOverrides(interactions, list(ff.overrides.rules), list(ff.overrides.mixing_overrides)),
+        ff.pseudo_atoms,
+        dict(ff.molecules),
+    )
+
+
+def merge_expanded(force_fields: List[RaspaForceField]) -> Tuple[RaspaForceField, List[str], Optional[str]]:
+    """Merge force fields and list every pair explicitly.
+
+    When the sources declare different general mixing rules, each source is expanded with its own
+    rule first, so only the pairs of types from different sources are mixed with the rule of the
+    merged force field (the first source's). Returns the merged force field, the conflicts and that
+    cross rule (None if all rules agree).
+    """
+    rules = {ff.mixing.mixing_rule.strip().lower() for ff in force_fields}
+    cross_rule = None
+    if len(rules) > 1:
+        force_fields = [expand(ff) for ff in force_fields]
+        cross_rule = force_fields[0].mixing.mixing_rule
+    merged, conflicts = merge(force_fields)
+    return expand(merged), conflicts, cross_rule
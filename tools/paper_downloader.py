@@ -0,0 +1,183 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from tools.scholar_client import get_client, run_sync
+
+
+PAPERS_DIR = Path("papers")
+# downloaded PDFs, addressed by DOI, shared by all paper folders
+PDF_STORE = PAPERS_DIR / ".pdfs"
+
+USER_AGENT = "Mozilla/5.0 (compatible; sim-agent paper downloader)"
+# a resolver or url that fails with one of these is skipped: network errors, bad urls, and
+# responses that are not JSON or not shaped as expected
+RESOLVER_ERRORS = (httpx.HTTPError, httpx.InvalidURL, ValueError, KeyError, TypeError, AttributeError)
+
+
+def normalize_doi(doi: str) -> str:
+    doi = doi.strip()
+    for prefix in ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "doi:"):
+        if doi.lower().startswith(prefix):
+            doi = doi[len(prefix):]
+    return doi.lower()
+
+
+def doi_key(doi: str) -> str:
+    return hashlib.sha256(normalize_doi(doi).encode()).hexdigest()[:32]
+
+
+class PDFResolver(ABC):
+    """Resolves a DOI to candidate PDF urls. Subclass and add to a PaperDownloader to extend."""
+
+    @abstractmethod
+    def resolve(self, doi: str, http: httpx.Client) -> List[str]:
+        ...
+
+
+class UnpaywallResolver(PDFResolver):
+    """Open access locations from Unpaywall (requires UNPAYWALL_EMAIL)."""
+
+    def __init__(self, email: Optional[str] = None):
+        self.email = email or os.environ.get("UNPAYWALL_EMAIL")
+
+    def resolve(self, doi, http):
+        if not self.email:
+            return []
+        response = http.get(f"https://api.unpaywall.org/v2/{doi}", params={"email": self.email})
+        if response.status_code != 200:
+            return []
+        data = response.json()
+        locations = [data.get("best_oa_location") or {}] + (data.get("oa_locations") or [])
+        return [loc["url_for_pdf"] for loc in locations if loc.get("url_for_pdf")]
+
+
+class SemanticScholarResolver(PDFResolver):
+    """Open access PDF listed by Semantic Scholar, via the shared rate-limited client."""
+
+    def resolve(self, doi, http):
+        try:
+            data = run_sync(get_client().get(f"/paper/DOI:{doi}", {"fields": "openAccessPdf"}))
+        except Exception:
+            return []
+        pdf = data.get("openAccessPdf") or {}
+        return [pdf["url"]] if pdf.get("url") else []
+
+
+class DOIResolver(PDFResolver):
+    """The publisher landing page, for publishers that serve the PDF directly."""
+
+    def resolve(self, doi, http):
+        return [f"https://doi.org/{doi}"]
+
+
+DEFAULT_RESOLVERS = [UnpaywallResolver(), SemanticScholarResolver(), DOIResolver()]
+
+
+class PaperDownloader:
+    """Downloads PDFs in-process into a store addressed by DOI.
+
+    A DOI is downloaded at most once; paper folders get a hard link (or copy) of the stored PDF.
+    """
+
+    def __init__(self, resolvers: Optional[List[PDFResolver]] = None, store: Path = PDF_STORE,
+                 max_workers: int = 4, chunk_size: int = 1 << 16, timeout: float = 60.0):
+        self.resolvers = resolvers if resolvers is not None else DEFAULT_RESOLVERS
+        self.store = Path(store)
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.http = httpx.Client(follow_redirects=True, timeout=timeout, headers={"User-Agent": USER_AGENT})
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def stored_path(self, doi: str) -> Path:
+        return self.store / f"{doi_key(doi)}.pdf"
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _stream_pdf(self, url: str, target: Path) -> bool:
+        """Stream `url` to `target` in chunks; only keep it if it is a PDF."""
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as file, self.http.stream("GET", url, headers={"Accept": "application/pdf"}) as response:
+                if response.status_code != 200:
+                    return False
+                first = True
+                for chunk in response.iter_bytes(self.chunk_size):
+                    if first:
+                        if not chunk.lstrip().startswith(b"%PDF"):
+                            return False
+                        first = False
+                    file.write(chunk)
+                if first:
+                    return False
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, target)
+            return True
+        except RESOLVER_ERRORS as e:
+            print(f"Download from {url} failed: {e!r}")
+            return False
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def fetch(self, doi: str) -> Optional[Path]:
+        """Return the stored PDF for a DOI, downloading it if needed."""
+        doi = normalize_doi(doi)
+        target = self.stored_path(doi)
+        with self._lock_for(target.name):
+            if target.exists():
+                return target
+            target.parent.mkdir(parents=True, exist_ok=True)
+            for resolver in self.resolvers:
+                try:
+                    urls = resolver.resolve(doi, self.http)
+                except RESOLVER_ERRORS as e:
+                    print(f"{type(resolver).__name__} failed for {doi}: {e!r}")
+                    continue
+                for url in urls:
+                    if self._stream_pdf(url, target):
+                        return target
+        return None
+
+    def download(self, doi: str, paper_name: str) -> Optional[Path]:
+        """Place the PDF for a DOI in papers/<paper_name>/."""
+        stored = self.fetch(doi)
+        if stored is None:
+            return None
+        download_dir = PAPERS_DIR / paper_name
+        download_dir.mkdir(parents=True, exist_ok=True)
+        target = download_dir / f"{paper_name}.pdf"
+        if not target.exists():
+            try:
+                os.link(stored, target)
+            except OSError:
+                shutil.copyfile(stored, target)
+        return target
+
+    def download_many(self, papers: Dict[str, str]) -> Dict[str, Optional[Path]]:
+        """Download several DOIs ({doi: paper_name}) concurrently."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {doi: pool.submit(self.download, doi, name) for doi, name in papers.items()}
+        return {doi: future.result() for doi, future in futures.items()}
+
+
+_downloader: Optional[PaperDownloader] = None
+
+
+def get_downloader() -> PaperDownloader:
+    global _downloader
+    if _downloader is None:
+        _downloader = PaperDownloader()
+    return _downloader
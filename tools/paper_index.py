@@ -0,0 +1,124 @@
+import os
+import re
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tools.paper_downloader import PAPERS_DIR
+from tools.paper_store import LEGACY_NAME, STORE_NAME, iter_chunks
+
+
+INDEX_PATH = PAPERS_DIR / ".search_index.sqlite"
+
+
+def fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query that ranks chunks matching any of its words.
+
+    Each word is quoted, so symbols like "epsilon/k_B" or "O-Si" are matched as phrases
+    instead of being read as query syntax.
+    """
+    words = [w for w in query.split() if re.search(r"\w", w)]
+    return " OR ".join('"' + w.replace('"', '""') + '"' for w in words)
+
+
+def _store_mtime(folder: Path) -> Optional[float]:
+    for name in (STORE_NAME, LEGACY_NAME):
+        path = folder / name
+        if path.exists():
+            return path.stat().st_mtime
+    return None
+
+
+class PaperIndex:
+    """BM25 full-text index over the chunks of all parsed papers (SQLite FTS5).
+
+    Papers are added with index_paper as they are downloaded; sync picks up papers that
+    were added, re-parsed or removed by other means.
+    """
+
+    def __init__(self, path=INDEX_PATH, papers_dir=PAPERS_DIR):
+        self.path = Path(path)
+        self.papers_dir = Path(papers_dir)
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS papers (name TEXT PRIMARY KEY, mtime REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            " paper UNINDEXED, chunk UNINDEXED, section, text, tokenize='porter unicode61')"
+        )
+        self._conn.commit()
+
+    def _folder(self, paper: str) -> Path:
+        return self.papers_dir / paper
+
+    def index_paper(self, paper: str):
+        """(Re)index papers/<paper>."""
+        folder = self._folder(paper)
+        mtime = _store_mtime(folder)
+        if mtime is None:
+            self.remove_paper(paper)
+            return
+        rows = [(paper, int(chunk.rsplit("_", 1)[1]), section, text) for section, chunk, text in iter_chunks(folder)]
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE paper = ?", (paper,))
+            self._conn.executemany("INSERT INTO chunks (paper, chunk, section, text) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("INSERT OR REPLACE INTO papers VALUES (?, ?)", (paper, mtime))
+            self._conn.commit()
+
+    def remove_paper(self, paper: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE paper = ?", (paper,))
+            self._conn.execute("DELETE FROM papers WHERE name = ?", (paper,))
+            self._conn.commit()
+
+    def sync(self):
+        """Index new or changed papers and drop removed ones."""
+        with self._lock:
+            indexed = dict(self._conn.execute("SELECT name, mtime FROM papers").fetchall())
+        present = set()
+        if self.papers_dir.is_dir():
+            for entry in os.scandir(self.papers_dir):
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                mtime = _store_mtime(Path(entry.path))
+                if mtime is None:
+                    continue
+                present.add(entry.name)
+                if indexed.get(entry.name) != mtime:
+                    self.index_paper(entry.name)
+        for paper in indexed.keys() - present:
+            self.remove_paper(paper)
+
+    def search(self, query: str, k: int = 5, paper: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The k best matching chunks, with their paper, section, chunk id and a snippet."""
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = ("SELECT paper, section, chunk, bm25(chunks, 0, 0, 2.0, 1.0) AS score,"
+               " snippet(chunks, 3, '[', ']', '...', 40) FROM chunks WHERE chunks MATCH ?")
+        params = [match]
+        if paper is not None:
+            sql += " AND paper = ?"
+            params.append(paper)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(k)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        # FTS5 scores are negative, lower is better
+        return [{"paper": p, "section": s, "chunk": c, "score": round(-score, 3), "snippet": snip}
+                for p, s, c, score, snip in rows]
+
+
+_index: Optional[PaperIndex] = None
+
+
+def get_index() -> PaperIndex:
+    global _index
+    if _index is None:
+        _index = PaperIndex()
+    return _index
@@ -0,0 +1,220 @@
+import json
+import os
+import sqlite3
+import tempfile
+
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tools.chunking import CHUNK_SIZES, DEFAULT_VIEW
+from tools.token_utils import count_tokens
+
+
+# Parsed papers live next to their PDF in papers/<paper_name>/. Section names and chunk
+# counts form a small index table, chunk bodies are stored separately and read one by one.
+# Chunks are stored at several sizes ("views", see tools.chunking), and readers pick the
+# view that fits their token budget.
+# Tables found in the PDF are stored as rows of cells, and the ones holding force field
+# parameters also as typed rows that can be queried by atom type.
+STORE_NAME = "parsed_paper.sqlite"
+# written by earlier versions, migrated on first read
+LEGACY_NAME = "parsed_paper.json"
+# the view holding chunks of stores written before there were several views
+LEGACY_VIEW = "legacy"
+
+SECTIONS_SCHEMA = "CREATE TABLE sections (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+VIEWS_SCHEMA = "CREATE TABLE views (name TEXT PRIMARY KEY, max_tokens INTEGER NOT NULL)"
+CHUNKS_SCHEMA = ("CREATE TABLE chunks (view TEXT NOT NULL, section_id INTEGER NOT NULL, idx INTEGER NOT NULL,"
+                 " text TEXT NOT NULL, PRIMARY KEY (view, section_id, idx))")
+TABLES_SCHEMA = [
+    "CREATE TABLE tables (id INTEGER PRIMARY KEY, page INTEGER NOT NULL, header TEXT NOT NULL, rows TEXT NOT NULL,"
+    " units TEXT NOT NULL)",
+    "CREATE TABLE parameters (table_id INTEGER NOT NULL, atom_type TEXT NOT NULL COLLATE NOCASE,"
+    " epsilon REAL, sigma REAL, charge REAL, mass REAL)",
+    "CREATE INDEX parameters_atom_type ON parameters(atom_type)",
+]
+
+
+def store_path(paper_folder) -> Path:
+    return Path(paper_folder) / STORE_NAME
+
+
+def has_paper(paper_folder) -> bool:
+    folder = Path(paper_folder)
+    return (folder / STORE_NAME).exists() or (folder / LEGACY_NAME).exists()
+
+
+def write_paper(paper_folder, views: Dict[str, Dict[str, Dict[str, str]]], tables: Iterable[dict] = (),
+                view_sizes: Optional[Dict[str, int]] = None):
+    """Store a parsed paper, replacing any previous version.
+
+    `views` maps a view name to the chunked sections ({section: {"chunk_0": text, ...}}), see
+    tools.chunking.chunk_sections; `view_sizes` gives the chunk size of each view in tokens.
+    `tables` are {"page", "header", "rows", "units", "parameters"} dicts, see paper_tools.parse_paper_tables.
+    """
+    view_sizes = view_sizes or CHUNK_SIZES
+    folder = Path(paper_folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix=".sqlite.tmp")
+    os.close(fd)
+    try:
+        with closing(sqlite3.connect(tmp)) as conn:
+            for statement in [SECTIONS_SCHEMA, VIEWS_SCHEMA, CHUNKS_SCHEMA] + TABLES_SCHEMA:
+                conn.execute(statement)
+            section_ids = {}
+            for view, sections in views.items():
+                conn.execute("INSERT INTO views VALUES (?, ?)", (view, view_sizes[view]))
+                for section, chunks in sections.items():
+                    if section not in section_ids:
+                        section_ids[section] = len(section_ids)
+                        conn.execute("INSERT INTO sections VALUES (?, ?)", (section_ids[section], section))
+                    conn.executemany(
+                        "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                        ((view, section_ids[section], idx, chunks[f"chunk_{idx}"]) for idx in range(len(chunks))),
+                    )
+            for table_id, table in enumerate(tables):
+                conn.execute(
+                    "INSERT INTO tables VALUES (?, ?, ?, ?, ?)",
+                    (table_id, table["page"], json.dumps(table["header"]), json.dumps(table["rows"]),
+                     json.dumps(table["units"])),
+                )
+                conn.executemany(
+                    "INSERT INTO parameters VALUES (?, ?, ?, ?, ?, ?)",
+                    ((table_id, row["atom_type"], row.get("epsilon"), row.get("sigma"), row.get("charge"), row.get("mass"))
+                     for row in table["parameters"]),
+                )
+            conn.commit()
+        # readers see either the old or the new store, never a partial one
+        os.replace(tmp, folder / STORE_NAME)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _upgrade(path: Path):
+    """Move the chunks of a store written before views into a single legacy view."""
+    with closing(sqlite3.connect(path, timeout=30)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if _has_table(conn, "views"):
+            # upgraded by another reader in the meantime
+            conn.rollback()
+            return
+        longest = conn.execute("SELECT text FROM chunks ORDER BY length(text) DESC LIMIT 1").fetchone()
+        conn.execute("ALTER TABLE chunks RENAME TO chunks_v1")
+        conn.execute(CHUNKS_SCHEMA)
+        conn.execute("INSERT INTO chunks SELECT ?, section_id, idx, text FROM chunks_v1", (LEGACY_VIEW,))
+        conn.execute("DROP TABLE chunks_v1")
+        conn.execute(VIEWS_SCHEMA)
+        conn.execute("INSERT INTO views VALUES (?, ?)", (LEGACY_VIEW, count_tokens(longest[0]) if longest else 0))
+        if not _has_table(conn, "tables"):
+            for statement in TABLES_SCHEMA:
+                conn.execute(statement)
+        conn.commit()
+
+
+def _connect(paper_folder) -> sqlite3.Connection:
+    folder = Path(paper_folder)
+    path = folder / STORE_NAME
+    if not path.exists():
+        legacy = folder / LEGACY_NAME
+        if not legacy.exists():
+            raise FileNotFoundError(f"No parsed paper in {paper_folder}")
+        with open(legacy, "r") as f:
+            sections = json.load(f)
+        longest = max((c for chunks in sections.values() for c in chunks.values()), key=len, default="")
+        write_paper(folder, {LEGACY_VIEW: sections}, view_sizes={LEGACY_VIEW: count_tokens(longest)})
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    if not _has_table(conn, "views"):
+        conn.close()
+        _upgrade(path)
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return conn
+
+
+def _select_view(conn: sqlite3.Connection, max_tokens: Optional[int] = None) -> str:
+    """The view with the largest chunks that fit in max_tokens (the smallest view if none fit).
+
+    Without a budget, the default view is used, or the only view of a legacy store.
+    """
+    views = conn.execute("SELECT name, max_tokens FROM views ORDER BY max_tokens").fetchall()
+    if max_tokens is None:
+        names = [name for name, _ in views]
+        return DEFAULT_VIEW if DEFAULT_VIEW in names else names[-1]
+    fitting = [name for name, size in views if size <= max_tokens]
+    return fitting[-1] if fitting else views[0][0]
+
+
+def list_views(paper_folder) -> Dict[str, int]:
+    """Chunk size in tokens of each stored view."""
+    with closing(_connect(paper_folder)) as conn:
+        return dict(conn.execute("SELECT name, max_tokens FROM views ORDER BY max_tokens").fetchall())
+
+
+def read_headers(paper_folder, max_tokens: Optional[int] = None) -> Dict[str, List[str]]:
+    """Section names mapped to their chunk ids in the view for max_tokens, without reading any chunk text."""
+    with closing(_connect(paper_folder)) as conn:
+        view = _select_view(conn, max_tokens)
+        # answered from the primary key index of chunks
+        rows = conn.execute(
+            "SELECT s.name, COUNT(*) FROM chunks c JOIN sections s ON s.id = c.section_id"
+            " WHERE c.view = ? GROUP BY c.section_id ORDER BY c.section_id", (view,)
+        ).fetchall()
+    return {name: [f"chunk_{i}" for i in range(n_chunks)] for name, n_chunks in rows}
+
+
+def read_chunk(paper_folder, section: str, chunk: int, max_tokens: Optional[int] = None) -> Tuple[bool, Optional[str]]:
+    """Return (section exists, chunk text or None)."""
+    with closing(_connect(paper_folder)) as conn:
+        row = conn.execute("SELECT id FROM sections WHERE name = ?", (section,)).fetchone()
+        if row is None:
+            return False, None
+        text = conn.execute("SELECT text FROM chunks WHERE view = ? AND section_id = ? AND idx = ?",
+                            (_select_view(conn, max_tokens), row[0], chunk)).fetchone()
+    return True, text[0] if text is not None else None
+
+
+def iter_chunks(paper_folder, max_tokens: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+    """Yield (section, chunk id, text) in document order."""
+    with closing(_connect(paper_folder)) as conn:
+        rows = conn.execute(
+            "SELECT s.name, c.idx, c.text FROM chunks c JOIN sections s ON s.id = c.section_id"
+            " WHERE c.view = ? ORDER BY c.section_id, c.idx", (_select_view(conn, max_tokens),)
+        )
+        for name, idx, text in rows:
+            yield name, f"chunk_{idx}", text
+
+
+def read_tables(paper_folder, page: Optional[int] = None) -> List[dict]:
+    sql, params = "SELECT id, page, header, rows FROM tables", ()
+    if page is not None:
+        sql, params = sql + " WHERE page = ?", (page,)
+    with closing(_connect(paper_folder)) as conn:
+        rows = conn.execute(sql + " ORDER BY id", params).fetchall()
+    return [{"table": table_id, "page": page, "header": json.loads(header), "rows": json.loads(table_rows)}
+            for table_id, page, header, table_rows in rows]
+
+
+def query_parameters(paper_folder, atom_type: Optional[str] = None) -> List[dict]:
+    """Force field parameter rows, optionally for one atom type (case-insensitive).
+
+    `units` gives the header of each column, e.g. {"epsilon": "ε/kB (K)"}.
+    """
+    sql = ("SELECT p.atom_type, p.epsilon, p.sigma, p.charge, p.mass, t.id, t.page, t.units"
+           " FROM parameters p JOIN tables t ON t.id = p.table_id")
+    params = ()
+    if atom_type is not None:
+        sql += " WHERE p.atom_type = ?"
+        params = (atom_type.strip(),)
+    with closing(_connect(paper_folder)) as conn:
+        rows = conn.execute(sql + " ORDER BY t.id, p.rowid", params).fetchall()
+    results = []
+    for atom, epsilon, sigma, charge, mass, table_id, page, units in rows:
+        values = {"epsilon": epsilon, "sigma": sigma, "charge": charge, "mass": mass}
+        results.append({"atom_type": atom, **{k: v for k, v in values.items() if v is not None},
+                        "table": table_id, "page": page, "units": json.loads(units)})
+    return results
@@ -1,163 +1,184 @@
-import requests
-import time
-import subprocess
+import httpx
 from pathlib import Path
 import os
 import shutil
-import pymupdf
+import sqlite3
 
-import json
-from rapidfuzz import fuzz
+from typing import Dict, List, Optional
 
 from langchain.agents import tool
+from langchain_core.tools import StructuredTool
+
+from tools.paper_downloader import get_downloader
+from tools.chunking import chunk_sections
+from tools.file_tools import get_atoms_in_ff_file  # noqa: F401, shared with the simulation tools
+from tools.findings_store import Finding, get_findings_store
+from tools.header_classifier import HeaderClassifier, file_digest, is_candidate, load_cached_headers, save_cached_headers
+from tools.paper_index import get_index
+from tools.paper_store import iter_chunks, query_parameters, read_chunk, read_headers, read_tables, write_paper
+from tools.parameter_tables import column_units, parameter_rows
+from tools.pdf_extract import iter_block_batches, iter_paper_tables
+from tools.scholar_client import DEFAULT_FIELDS, SearchUnavailable, get_client, run_async, run_sync
+
+
+def _search(query: str, limit: int = 5, fields: str = DEFAULT_FIELDS):
+    try:
+        return run_sync(get_client().search(query, limit, fields))
+    except SearchUnavailable:
+        return "Search timed out, please try again later."
+    except httpx.HTTPStatusError as e:
+        return f"Search failed: {e}"
 
-@tool
-def semantic_scholar_search(query, limit=5, fields="title,authors,url,abstract,year,externalIds"):
-    """Perform a semantic search using the Semantic Scholar API."""
-    url = "https://api.semanticscholar.org/graph/v1/paper/search"
-    params = {
-        "query": query,
-        "limit": limit,
-        "fields": fields
-    }
-
-    tries = 0
-    while tries < 10:
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            break
-        except Exception as e:
-            tries += 1
-            print("sleeping for 1 second before retrying due to:", e)
-            time.sleep(1)  # Wait for a second before retrying
-    if tries == 10:
+
+async def _asearch(query: str, limit: int = 5, fields: str = DEFAULT_FIELDS):
+    try:
+        return await run_async(get_client().search(query, limit, fields))
+    except SearchUnavailable:
         return "Search timed out, please try again later."
+    except httpx.HTTPStatusError as e:
+        return f"Search failed: {e}"
+
+
+semantic_scholar_search = StructuredTool.from_function(
+    func=_search,
+    coroutine=_asearch,
+    name="semantic_scholar_search",
+    description="Perform a semantic search using the Semantic Scholar API.",
+)
+
+
+@tool
+def semantic_scholar_multi_search(queries: List[str], limit: int = 5, fields: str = DEFAULT_FIELDS):
+    """Run several Semantic Scholar searches concurrently (e.g. query variations). Returns a mapping of query to results."""
+    return run_sync(get_client().search_many(queries, limit, fields))
 
-    
-    data = response.json()
-    return data.get("data", [])
+
+def search_cache_stats():
+    """Hit/miss counters of the literature search cache."""
+    cache = get_client().cache
+    return cache.stats() if cache is not None else {}
 
 
 
 def download_paper(doi: str, paper_name: str):
     """
-    Uses PyPaperBot to download a paper by DOI.
+    Download a paper by DOI into ./papers/<paper_name>.
 
     Parameters:
         doi (str): DOI of the paper to download.
-        download_dir (str): Directory where PDF will be saved.
+        paper_name (str): Name of the paper folder.
+
+    Returns:
+        Path of the PDF, or None if no resolver found it.
     """
-    download_dir = f"./papers/{paper_name}"
-    # Ensure download directory exists
-    Path(download_dir).mkdir(parents=True, exist_ok=True)
-
-    # Build the command as a list
-    cmd = [
-        "python",
-        "-m", "PyPaperBot",
-        f"--doi={doi}",
-        f"--dwn-dir={download_dir}"
-    ]
-
-    # Run the command
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print("Error running PyPaperBot:", result.stderr)
-    else:
-        print("PyPaperBot output:", result.stdout)
-        print(f"Paper downloaded to {download_dir}")
+    pdf_path = get_downloader().download(doi, paper_name)
 
+    if pdf_path is None:
+        print(f"No PDF found for {doi}")
+    else:
+        print(f"Paper downloaded to {pdf_path}")
+    return pdf_path
 
 
-def alphabetic_ratio(text):
-    letters = sum(c.isalpha() for c in text)
-    return letters / max(len(text), 1)
 
-def is_header(block_text: str, max_length=50, similarity_threshold=80):
+def is_header(block_text: str, max_length=50):
     """
-    Determine if a text block is a section header.
-    
+    Determine if a text block is a section header, from its text alone.
+
+    Without layout information, every short, mostly alphabetic block is treated as a
+    potential header. parse_paper uses HeaderClassifier, which also looks at known
+    header names, numbering, font size and weight.
+
     Args:
         block_text (str): The text block to check.
-        common_headers (list): List of canonical headers (e.g., Introduction, Methods).
         max_length (int): Maximum number of characters for a block to be considered a header.
-        similarity_threshold (int): Minimum similarity % to match a known header.
-    
+
     Returns:
         bool: True if block is likely a header, False otherwise.
     """
-    block_text = block_text.strip()
-    
-    # Skip long blocks
-    if len(block_text) > max_length:
-        return False
-    
-    if alphabetic_ratio(block_text) < 0.75:
-        return False
-    
-    common_headers = ["Introduction", "Methodology", "Methods", "Results", "Experiments",
-                      "Discussion", "Conclusion", "Abstract", "References", "Supplementary"]
-    # Check similarity against common headers
-    if common_headers:
-        for header in common_headers:
-            score = fuzz.partial_ratio(block_text.lower(), header.lower())
-            if score >= similarity_threshold:
-                return True
-    
-    
-    # Otherwise, treat short block as potential header
-    return True
-
+    return is_candidate(block_text, max_length)
 
-def filter_headers(text):
-
-    content_dict = {}
 
+def iter_sections(labelled_blocks):
+    """Group a stream of (text, is_header) pairs into (header, content) pairs as the headers appear."""
     curr_hdr = None
+    content = []
 
-    for block in text:
-        if is_header(block):
+    for block, header in labelled_blocks:
+        if header:
+            if curr_hdr is not None:
+                yield curr_hdr, "\n".join(content)
             curr_hdr = block.strip()
-            content_dict[curr_hdr] = ""
+            content = []
         elif curr_hdr is not None:
-            content_dict[curr_hdr] += block
+            content.append(block)
+
+    if curr_hdr is not None:
+        yield curr_hdr, "\n".join(content)
+
+
+def sections_to_dict(labelled_blocks):
+    content_dict = {}
+    for header, content in iter_sections(labelled_blocks):
+        content_dict[header] = content
 
     # remove entries with no content
     content_dict = {k: v for k, v in content_dict.items() if len(v.strip()) > 0}
     return content_dict
 
 
+def filter_headers(text):
+    return sections_to_dict((block, is_header(block)) for block in text)
 
-def chunk_paper_sections(paper_dict, max_words=2000, overlap=100):
-    chunks = {}
-    for section, content in paper_dict.items():
-        chunks[section] = {}
-        words = content.split()
-        for idx, i in enumerate(range(0, len(words), max_words - overlap)):
-            chunk = ' '.join(words[i:i + max_words])
-            chunks[section][f"chunk_{idx}"] = chunk
-
-    return chunks
 
-def parse_paper(paper_path: str):
-    text = []
 
-    doc = pymupdf.open(paper_path)
-    for page in doc:
-        blocks = page.get_text("blocks")
-        blocks = [i[4] for i in blocks if i[6] == 0]  # Extract text from blocks
-        text.extend(blocks)
+def parse_paper(paper_path: str, parallel=None, use_cache=True):
+    """Sections of a PDF, chunked at every size in CHUNK_SIZES: {view: {section: {"chunk_0": text, ...}}}.
 
-    text_dict = filter_headers(text)
-    return chunk_paper_sections(text_dict)
+    With use_cache, the header flags of a PDF are read from and saved to the header cache.
+    """
+    digest = file_digest(paper_path) if use_cache else None
+    cached_headers = load_cached_headers(digest) if use_cache else None
+    classifier = HeaderClassifier()
+    headers = []
+
+    def labelled_blocks():
+        # blocks stream in page order from the extraction workers, one batch per page range
+        for batch in iter_block_batches(paper_path, parallel=parallel):
+            n = len(headers)
+            if cached_headers is not None and len(cached_headers) >= n + len(batch):
+                flags = cached_headers[n:n + len(batch)]
+            else:
+                flags = classifier.classify(batch)
+            headers.extend(flags)
+            for block, flag in zip(batch, flags):
+                yield block.text, flag
+
+    text_dict = sections_to_dict(labelled_blocks())
+    if use_cache and cached_headers is None:
+        save_cached_headers(digest, headers)
+    return chunk_sections(text_dict)
+
+
+def parse_paper_tables(paper_path: str, parallel=None):
+    """Tables of a PDF, with the rows that hold force field parameters parsed into numbers."""
+    tables = []
+    for table in iter_paper_tables(paper_path, parallel=parallel):
+        try:
+            table["units"] = column_units(table)
+            table["parameters"] = parameter_rows(table)
+        except Exception as e:
+            # keep the table text, without parsed parameters
+            print(f"Failed to read parameters of a table on page {table.get('page')} of {paper_path}: {e!r}")
+            table["units"], table["parameters"] = {}, []
+        tables.append(table)
+    return tables
 
 
 @tool
 def download_paper_tool(doi: str, paper_name: str, paper_year: int):
     """
-    Download a paper using PyPaperBot.
+    Download a paper by DOI.
 
     Parameters:
         doi (str): DOI of the paper to download.
@@ -167,21 +188,44 @@ def download_paper_tool(doi: str, paper_name: str, paper_year: int):
     if os.path.exists(f"./papers/{paper_name}"):
         return f"Paper already downloaded to ./papers/{paper_name}"
 
-    download_paper(doi, paper_name)
+    pdf_path = download_paper(doi, paper_name)
+    return _parse_downloaded_paper(pdf_path, f"./papers/{paper_name}")
 
-    # check if the paper was downloaded successfully
-    download_dir = f"./papers/{paper_name}"
-    for file in os.listdir(download_dir):
-        if file.endswith(".pdf"):
-            try:
-                # Try to parse the PDF to ensure it's valid
-                parsed_paper = parse_paper(os.path.join(download_dir, file))
-                with open(os.path.join(download_dir, "parsed_paper.json"), "w") as f:
-                    json.dump(parsed_paper, f)
 
-                return f"Paper downloaded and parsed successfully to {download_dir}/{file}"
+@tool
+def download_papers_tool(papers: Dict[str, str]):
+    """
+    Download several papers at once.
+
+    Parameters:
+        papers (Dict[str, str]): Mapping of DOI to paper name.
+    """
+    todo = {doi: name for doi, name in papers.items() if not os.path.exists(f"./papers/{name}")}
+    results = {name: f"Paper already downloaded to ./papers/{name}" for doi, name in papers.items() if doi not in todo}
+
+    pdf_paths = get_downloader().download_many(todo)
+    for doi, name in todo.items():
+        results[name] = _parse_downloaded_paper(pdf_paths[doi], f"./papers/{name}")
+    return results
+
+
+def _parse_downloaded_paper(pdf_path, download_dir: str):
+    if pdf_path is not None:
+        try:
+            # Try to parse the PDF to ensure it's valid
+            parsed_paper = parse_paper(str(pdf_path))
+            try:
+                tables = parse_paper_tables(str(pdf_path))
             except Exception as e:
-                print(f"Failed to parse {file}: {e}")
+                # the text is still useful without the tables
+                print(f"Failed to extract tables from {pdf_path}: {e!r}")
+                tables = []
+            write_paper(download_dir, parsed_paper, tables)
+            _index_paper(download_dir)
+
+            return f"Paper downloaded and parsed successfully to {download_dir}/{Path(pdf_path).name}"
+        except Exception as e:
+            print(f"Failed to parse {pdf_path}: {e}")
 
     # delete the directory if download failed
     if os.path.exists(download_dir):
@@ -189,124 +233,170 @@ def download_paper_tool(doi: str, paper_name: str, paper_year: int):
 
     return "Paper unavailable, download failed"
 
+def _index_paper(download_dir: str):
+    try:
+        get_index().index_paper(Path(download_dir).name)
+    except sqlite3.Error as e:
+        # search_papers re-indexes missing papers on its next call
+        print(f"Failed to index {download_dir}: {e}")
+
+@tool
+def search_papers(query: str, k: int = 5, paper_name: Optional[str] = None):
+    """
+    Full-text search (BM25) over all downloaded papers.
+
+    Args:
+        query (str): Search terms, e.g. "epsilon/k_B Lennard-Jones TraPPE".
+        k (int): Number of chunks to return.
+        paper_name (str, optional): Only search this paper.
+
+    Returns:
+        list: The best matching chunks with their paper, section, chunk number and a snippet.
+        Read a full chunk with read_paper_section(papers/<paper>, section, chunk).
+    """
+    index = get_index()
+    index.sync()
+    return index.search(query, k, paper_name)
+
 @tool
 def read_paper_names():
     """Read the names of all downloaded papers, located in the ./papers directory."""
     download_dir = "./papers"
     paper_names = []
     for folder in os.listdir(download_dir):
-        if os.path.isdir(os.path.join(download_dir, folder)):
+        if os.path.isdir(os.path.join(download_dir, folder)) and not folder.startswith("."):
             paper_names.append(folder)
     return paper_names
 
 @tool
-def read_paper_headers(paper_folder: str):
+def read_paper_headers(paper_folder: str, max_tokens: Optional[int] = None):
     """
-    Read the headers from a parsed paper JSON file.
+    Read the headers of a parsed paper.
 
     Args:
         paper_folder (str): The path to the paper folder. NOT the pdf file.
+        max_tokens (int, optional): Size of the chunks you want to read (e.g. 256, 1024 or 2048 tokens).
+            Use the same value with read_paper_section.
 
     Returns:
         list: A dictionary mapping headers to the amount of chunks they contain
     """
-    with open(os.path.join(paper_folder, "parsed_paper.json"), "r") as f:
-        parsed_paper = json.load(f)
-
-    # headers = []
-    # for section in parsed_paper:
-    #     chunks = []
-    #     for chunk in parsed_paper[section]:
-    #         chunks.append(chunk)
-    #     headers.append(f"{section}: {', '.join(chunks)}")
-    headers = {}
-    for section in parsed_paper:
-        chunks = []
-        for chunk in parsed_paper[section]:
-            chunks.append(chunk)
-        headers[section] = chunks
-
-    return headers
+    return read_headers(paper_folder, max_tokens)
 
 @tool
 def read_whole_paper(paper_folder: str):
     """
-    Read the entire content of a parsed paper JSON file.
+    Read the entire content of a parsed paper.
     """
-    with open(os.path.join(paper_folder, "parsed_paper.json"), "r") as f:
-        parsed_paper = json.load(f)
-
-    # Combine all sections and chunks into a single string
-    full_text = ""
-    for section in parsed_paper:
-        full_text += f"=== {section} ===\n"
-        for chunk in parsed_paper[section]:
-            full_text += parsed_paper[section][chunk] + "\n"
-
     MAX_CHARS = 50_000
 
-    return full_text[:MAX_CHARS]
+    # Combine all sections and chunks into a single string, stopping once the limit is reached
+    parts, n_chars, curr_section = [], 0, None
+    for section, _, text in iter_chunks(paper_folder):
+        if section != curr_section:
+            parts.append(f"=== {section} ===\n")
+            n_chars += len(parts[-1])
+            curr_section = section
+        parts.append(text + "\n")
+        n_chars += len(parts[-1])
+        if n_chars >= MAX_CHARS:
+            break
+
+    return "".join(parts)[:MAX_CHARS]
 
 @tool
-def read_paper_section(paper_folder: str, section: str, chunk: int=0):
+def read_paper_section(paper_folder: str, section: str, chunk: int=0, max_tokens: Optional[int] = None):
     """
-    Read a specific section from a parsed paper JSON file.
+    Read a specific section from a parsed paper.
 
     Args:
         paper_folder (str): The path to the paper folder. NOT the pdf file.
         section (str): The section to read.
         chunk (int): The chunk number to read.
+        max_tokens (int, optional): Size of the chunks, as passed to read_paper_headers. Smaller chunks
+            cost fewer tokens per call.
 
     Returns:
         str: The content of the specified section and chunk.
     """
-    with open(os.path.join(paper_folder, "parsed_paper.json"), "r") as f:
-        parsed_paper = json.load(f)
-
-    if section in parsed_paper:
-        if chunk < len(parsed_paper[section]):
-            return parsed_paper[section][f"chunk_{chunk}"]
-        else:
-            return "Chunk not found"
-    else:
+    found, text = read_chunk(paper_folder, section, chunk, max_tokens)
+    if not found:
         return "Section not found"
+    if text is None:
+        return "Chunk not found"
+    return text
 
 @tool
-def read_finding(paper_folder: str):
+def read_paper_parameters(paper_folder: str, atom_type: Optional[str] = None):
     """
-    Read force field parameters from a text file in the specified paper folder.
+    Read force field parameters (epsilon, sigma, charge, mass) extracted from the tables of a paper.
 
     Args:
-        paper_folder (str): The path to the paper folder.  NOT the finding file.
+        paper_folder (str): The path to the paper folder. NOT the pdf file.
+        atom_type (str, optional): Only return rows for this atom type or pair, e.g. "O" or "O-Si".
 
     Returns:
-        list: A list of force field parameters found in the file.
+        list: Parameter rows with the table and page they come from. `units` holds the column
+        headers, which state the units (e.g. "ε/kB (K)").
+    """
+    return query_parameters(paper_folder, atom_type)
+
+@tool
+def read_paper_tables(paper_folder: str, page: Optional[int] = None):
     """
-    finding_file = os.path.join(paper_folder, "findings.txt")
-    if not os.path.exists(finding_file):
-        return []
+    Read the tables of a paper as rows of cells, e.g. when read_paper_parameters misses a table.
 
-    with open(finding_file, "r") as f:
-        findings = f.readlines()
+    Args:
+        paper_folder (str): The path to the paper folder. NOT the pdf file.
+        page (int, optional): Only return tables on this page.
+    """
+    return read_tables(paper_folder, page)
 
-    return [finding.strip() for finding in findings]
+@tool
+def read_finding(paper_folder: str, species: Optional[str] = None, atom_type: Optional[str] = None,
+                 parameter: Optional[str] = None):
+    """
+    Read the force field parameters extracted from a paper, as a compact table.
 
-from typing import List
+    Args:
+        paper_folder (str): The path to the paper folder.  NOT the finding file.
+        species (str, optional): Only return findings for this species (e.g. "framework", "CO2", "Na").
+        atom_type (str, optional): Only return findings for this atom type or pair (e.g. "O", "O-Si").
+        parameter (str, optional): Only return this parameter (e.g. "epsilon", "charge").
+
+    Returns:
+        dict: "parameters": one row per species, atom type and interaction with its values, units and
+        the sections they were read from; "notes": general notes such as mixing rules.
+    """
+    store = get_findings_store()
+    paper = Path(paper_folder).name
+    store.import_legacy(paper, paper_folder)
+    result = {"parameters": store.query(paper, species, atom_type, parameter)}
+    if species is None and atom_type is None and parameter is None:
+        result["notes"] = store.notes(paper)
+    return result
 
 @tool
-def write_finding(paper_folder: str, findings: List[str]):
+def write_finding(paper_folder: str, findings: List[Finding], notes: Optional[List[str]] = None):
     """
-    Write force field parameters to a text file in the specified paper folder.
+    Store force field parameters extracted from a paper. Findings that are already stored are skipped.
 
     Args:
         paper_folder (str): The path to the paper folder.
-        findings (List[str]): The findings to write.
+        findings (List[Finding]): e.g. {"species": "framework", "atom_type": "O-Si", "interaction": "lennard-jones",
+            "parameters": {"epsilon": 0.1, "sigma": 3.4}, "units": {"epsilon": "K", "sigma": "Angstrom"},
+            "section": "Force field", "chunk": 0}
+        notes (List[str], optional): General notes, e.g. "Uses Lorentz-Berthelot mixing rules."
     """
-    finding_file = os.path.join(paper_folder, "findings.txt")
-    with open(finding_file, "a") as f:
-        for finding in findings:
-            f.write(finding + "\n")
-    return f"Successfully written to {finding_file}"
+    store = get_findings_store()
+    paper = Path(paper_folder).name
+    store.import_legacy(paper, paper_folder)
+    result = store.add(paper, findings, notes or [])
+    message = (f"Stored findings for {paper}: {result['added']} added, {result['updated']} updated, "
+               f"{result['duplicates']} already known.")
+    if result["changes"]:
+        message += " Changed: " + "; ".join(result["changes"])
+    return message
 
 @tool
 def write_file(folder: str, filename: str, content: str):
@@ -361,63 +451,3 @@ def list_directory(folder: str):
         for f in files:
             output.append(f'{subindent}{f}')
     return '\n'.join(output)
-
-
-def get_force_field_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("# type"):
-            started = True
-            continue
-        if started and line.startswith("#"):
-            break
-        if started:
-            interactions.extend(line.split()[:2])
-    return list(set(interactions))
-
-def get_force_field_mixing_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("# type"):
-            started = True
-            continue
-        if started and line.startswith("#"):
-            break
-        if started:
-            interactions.append(line.split()[0])
-    return interactions
-
-def get_pseudo_atoms(file):
-    with open(file, 'r') as f:
-        lines = f.readlines()
-    interactions = []
-    started = False
-    for line in lines:
-        if line.startswith("#type"):
-            started = True
-            continue
-        if started and len(line) < 2:
-            break
-        if started:
-            interactions.append(line.split()[0])
-    return interactions
-
-@tool
-def get_atoms_in_ff_file(folder_path: str, file_name: str) -> List[str]:
-    """Gets the atoms defined in a force field file (force_field.def, pseudo_atoms.def, force_field_mixing_rules.def)."""
-    assert file_name in ["force_field.def", "pseudo_atoms.def", "force_field_mixing_rules.def"]
-    if file_name == "force_field.def":
-        return get_force_field_atoms(f"{folder_path}/{file_name}")
-    elif file_name == "pseudo_atoms.def":
-        return get_pseudo_atoms(f"{folder_path}/{file_name}")
-    elif file_name == "force_field_mixing_rules.def":
-        return get_force_field_mixing_atoms(f"{folder_path}/{file_name}")
-
-    else:
-        raise ValueError(f"Unknown file name: {file_name}")
\ No newline at end of file
@@ -0,0 +1,68 @@
+import re
+
+from typing import Dict, List, Optional
+
+
+PARAMETER_FIELDS = ["atom_type", "epsilon", "sigma", "charge", "mass"]
+
+# matched against lower-cased header cells, first matching field wins
+FIELD_PATTERNS = [
+    ("epsilon", re.compile(r"ε|ϵ|epsilon|\beps\b|well depth|^e\s*/\s*k")),
+    ("sigma", re.compile(r"σ|sigma|diameter")),
+    ("charge", re.compile(r"charge|^q\b|^q\s*[(/\[]|\(e\)")),
+    ("mass", re.compile(r"mass|g/mol|amu")),
+    ("atom_type", re.compile(r"atom|type|site|label|pseudo|bead|group|species|element|interaction|pair")),
+]
+
+NUMBER = re.compile(r"[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?")
+
+
+def parse_number(cell: str) -> Optional[float]:
+    """Leading number of a table cell, e.g. "3.73(2)" -> 3.73, "−0.41" -> -0.41."""
+    cell = cell.replace("−", "-").replace("–", "-").replace(" ", "")
+    match = NUMBER.match(cell)
+    return float(match.group()) if match else None
+
+
+def column_fields(header: List[str]) -> Dict[str, int]:
+    """Map parameter fields to the column index that holds them."""
+    columns = {}
+    for i, name in enumerate(header):
+        name = name.lower()
+        for field, pattern in FIELD_PATTERNS:
+            if field not in columns and pattern.search(name):
+                columns[field] = i
+                break
+    return columns
+
+
+def parameter_rows(table: dict) -> List[dict]:
+    """Rows of a force field table as {atom_type, epsilon, sigma, charge, mass}.
+
+    Tables without an epsilon, sigma, charge or mass column give no rows. If no column
+    is recognised as the atom type, the first column is used.
+    """
+    header = table["header"]
+    columns = column_fields(header)
+    numeric = [f for f in PARAMETER_FIELDS[1:] if f in columns]
+    if not numeric:
+        return []
+    type_col = columns.get("atom_type", 0)
+    if type_col in columns.values() and "atom_type" not in columns:
+        return []
+
+    rows = []
+    for row in table["rows"]:
+        if type_col >= len(row) or not row[type_col]:
+            continue
+        values = {f: parse_number(row[columns[f]]) if columns[f] < len(row) else None for f in numeric}
+        if all(v is None for v in values.values()):
+            continue
+        rows.append({"atom_type": row[type_col], **values})
+    return rows
+
+
+def column_units(table: dict) -> Dict[str, str]:
+    """The header text of each recognised column, which carries the units (e.g. "ε/kB (K)")."""
+    header = table["header"]
+    return {field: header[i] for field, i in column_fields(header).items()}
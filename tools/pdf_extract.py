@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+import pymupdf
+
+
+# Documents shorter than this are parsed in-process; a pool only pays off for long PDFs
+MIN_PAGES_PARALLEL = 16
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # kept alive between papers, so worker start-up is paid once per process; spawned, since forking
+    # a process with running threads (the scholar client's event loop, tool threads) can deadlock
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+class TextBlock(NamedTuple):
+    text: str
+    size: float     # largest font size in the block
+    bold: bool      # all text in the block is bold
+
+
+def _block_from_dict(block: dict) -> TextBlock:
+    lines, size, bold = [], 0.0, True
+    for line in block["lines"]:
+        spans = [span for span in line["spans"] if span["text"].strip()]
+        lines.append("".join(span["text"] for span in line["spans"]))
+        for span in spans:
+            size = max(size, span["size"])
+            bold = bold and bool(span["flags"] & pymupdf.TEXT_FONT_BOLD)
+    text = "\n".join(lines) + "\n"
+    return TextBlock(text, round(size, 1), bold and bool(text.strip()))
+
+
+def extract_page_range(paper_path: str, start: int, stop: int) -> List[TextBlock]:
+    """Text blocks of pages [start, stop) in reading order, with their font size and weight."""
+    text = []
+    with pymupdf.open(paper_path) as doc:
+        for page_no in range(start, min(stop, doc.page_count)):
+            blocks = doc[page_no].get_text("dict", flags=pymupdf.TEXTFLAGS_TEXT)["blocks"]
+            text.extend(_block_from_dict(b) for b in blocks if b["type"] == 0)  # Extract text from blocks
+    return text
+
+
+def page_ranges(n_pages: int, n_parts: int) -> List[Tuple[int, int]]:
+    """Split n_pages into at most n_parts contiguous ranges."""
+    n_parts = max(1, min(n_parts, n_pages))
+    size, extra = divmod(n_pages, n_parts)
+    ranges, start = [], 0
+    for i in range(n_parts):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_tables_range(paper_path: str, start: int, stop: int) -> List[dict]:
+    """Tables on pages [start, stop), as {"page", "header", "rows"} with cells as strings."""
+    tables = []
+    with pymupdf.open(paper_path) as doc:
+        for page_no in range(start, min(stop, doc.page_count)):
+            try:
+                found = doc[page_no].find_tables().tables
+            except Exception as e:
+                # table detection is best effort, the text of the page is still parsed
+                print(f"Table detection failed on page {page_no + 1} of {paper_path}: {e}")
+                continue
+            for table in found:
+                rows = [[_clean_cell(cell) for cell in row] for row in table.extract()]
+                if not table.header.external and rows:
+                    rows = rows[1:]
+                header = [_clean_cell(name) for name in table.header.names]
+                tables.append({"page": page_no + 1, "header": header, "rows": rows})
+    return tables
+
+
+def _clean_cell(cell: Optional[str]) -> str:
+    return " ".join((cell or "").split())
+
+
+def _iter_page_ranges(extract, paper_path: str, parallel: Optional[bool], pages_per_task: int) -> Iterator[list]:
+    """Apply `extract(paper_path, start, stop)` to consecutive page ranges, yielding results in page order.
+
+    Long documents (or all, with parallel=True) are extracted in a process pool;
+    a result is yielded as soon as the next range in order is done.
+    """
+    with pymupdf.open(paper_path) as doc:
+        n_pages = doc.page_count
+    ranges = page_ranges(n_pages, -(-n_pages // pages_per_task))
+
+    if parallel is None:
+        parallel = MAX_WORKERS > 1 and n_pages >= MIN_PAGES_PARALLEL
+    if not parallel:
+        for start, stop in ranges:
+            yield extract(paper_path, start, stop)
+        return
+
+    pool = _get_pool()
+    futures = [pool.submit(extract, paper_path, start, stop) for start, stop in ranges]
+    for future in futures:
+        yield future.result()
+
+
+def iter_block_batches(paper_path: str, parallel: Optional[bool] = None,
+                       pages_per_task: int = 8) -> Iterator[List[TextBlock]]:
+    """Yield the text blocks of a PDF in page order, one list per range of `pages_per_task` pages."""
+    return _iter_page_ranges(extract_page_range, paper_path, parallel, pages_per_task)
+
+
+def iter_paper_blocks(paper_path: str, parallel: Optional[bool] = None,
+                      pages_per_task: int = 8) -> Iterator[TextBlock]:
+    """Yield the text blocks of a PDF in page order (see iter_block_batches)."""
+    for batch in iter_block_batches(paper_path, parallel, pages_per_task):
+        yield from batch
+
+
+def iter_paper_tables(paper_path: str, parallel: Optional[bool] = None,
+                      pages_per_task: int = 4) -> Iterator[dict]:
+    """Yield the tables of a PDF in page order. Table detection is slower than text, hence smaller tasks."""
+    for batch in _iter_page_ranges(extract_tables_range, paper_path, parallel, pages_per_task):
+        yield from batch
@@ -0,0 +1,164 @@
+import copy
+import json
+import os
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Plans of named runs live in PLANS_DIR/<run_id>/plan.json
+PLANS_DIR = Path("plans")
+PLAN_FILE = "plan.json"
+
+# The folder holding the plan of the current run. Context variables are
+# copied into asyncio tasks and LangGraph tool threads, so concurrent runs
+# in one process each see their own plan.
+_plan_dir: ContextVar[Optional[Path]] = ContextVar("plan_dir", default=None)
+
+_cache: Dict[str, Tuple[Tuple[int, int, int], dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def run_plan_dir(run_id: str) -> Path:
+    return PLANS_DIR / run_id
+
+
+def current_plan_path() -> Path:
+    """Path of the plan for the current run.
+
+    Resolved from the active plan_scope, then the SIM_RUN_ID environment
+    variable, and falls back to plan.json in the working directory.
+    """
+    plan_dir = _plan_dir.get()
+    if plan_dir is None and os.environ.get("SIM_RUN_ID"):
+        plan_dir = run_plan_dir(os.environ["SIM_RUN_ID"])
+    if plan_dir is None:
+        return Path(PLAN_FILE)
+    return Path(plan_dir) / PLAN_FILE
+
+
+def set_plan_dir(plan_dir) -> None:
+    """Set the plan folder for the current context (None for the default plan.json)."""
+    _plan_dir.set(Path(plan_dir) if plan_dir is not None else None)
+
+
+@contextmanager
+def plan_scope(run_id: Optional[str] = None, plan_dir=None):
+    """Use the plan of a given run (PLANS_DIR/<run_id>) or plan folder within the block."""
+    if plan_dir is None and run_id is not None:
+        plan_dir = run_plan_dir(run_id)
+    token = _plan_dir.set(Path(plan_dir) if plan_dir is not None else None)
+    try:
+        yield current_plan_path()
+    finally:
+        _plan_dir.reset(token)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive inter-process lock on a sidecar .lock file."""
+    lock_path = path.with_name(path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a+") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s, keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    # the inode changes on every atomic replace, even within one mtime tick
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _read(path: Path) -> Optional[dict]:
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+    key = str(path.resolve())
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(path, "r") as file:
+        plan = json.load(file)
+    with _cache_lock:
+        _cache[key] = (stamp, plan)
+    return plan
+
+
+def _write(path: Path, plan: dict) -> None:
+    """Write the plan to a temporary file in the same folder and rename it into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            json.dump(plan, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    with _cache_lock:
+        _cache[str(path.resolve())] = (_stamp(path), copy.deepcopy(plan))
+
+
+def load_plan(path=None) -> Optional[dict]:
+    """Return a copy of the current plan, or None if no plan exists."""
+    plan = _read(Path(path) if path is not None else current_plan_path())
+    return copy.deepcopy(plan) if plan is not None else None
+
+
+def save_plan(plan: dict, path=None) -> None:
+    """Replace the current plan."""
+    path = Path(path) if path is not None else current_plan_path()
+    with _file_lock(path):
+        _write(path, plan)
+
+
+def update_plan(update: Callable[[dict], None], path=None) -> dict:
+    """Apply `update` to the current plan in place and store the result.
+
+    The read-modify-write cycle holds the plan lock, so concurrent updates
+    from several agents or runs are not lost.
+    """
+    path = Path(path) if path is not None else current_plan_path()
+    with _file_lock(path):
+        plan = load_plan(path)
+        if plan is None:
+            raise FileNotFoundError(f"No plan found at {path}.")
+        update(plan)
+        _write(path, plan)
+    return plan
@@ -0,0 +1,341 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+from tools.blob_store import atomic_write_text
+
+
+FORCE_FIELD_FILE = "force_field.def"
+MIXING_RULES_FILE = "force_field_mixing_rules.def"
+PSEUDO_ATOMS_FILE = "pseudo_atoms.def"
+FF_FILES = [FORCE_FIELD_FILE, MIXING_RULES_FILE, PSEUDO_ATOMS_FILE]
+
+PSEUDO_ATOM_HEADER = ("#type      print   as    chem  oxidation   mass        charge   polarization B-factor radii  "
+                      "connectivity anisotropic anisotropic-type   tinker-type")
+
+
+def format_number(x: float) -> str:
+    return format(x, ".10g")
+
+
+def _data_lines(text: str) -> List[str]:
+    """Lines RASPA reads: everything except blank lines and comments."""
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+
+def _parse_params(values: Iterable[str]) -> List[float]:
+    return [float(v) for v in values]
+
+
+def pair_key(type1: str, type2: str) -> Tuple[str, str]:
+    return (type1, type2) if type1 <= type2 else (type2, type1)
+
+
+@dataclass
+class SelfInteraction:
+    type: str
+    potential: str
+    params: List[float] = field(default_factory=list)
+
+    def to_line(self) -> str:
+        return "\t".join([f"{self.type:<14}", self.potential] + [format_number(p) for p in self.params])
+
+
+@dataclass
+class PairInteraction:
+    type1: str
+    type2: str
+    potential: str
+    params: List[float] = field(default_factory=list)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return pair_key(self.type1, self.type2)
+
+    def to_line(self) -> str:
+        return "\t".join([f"{self.type1:<11}", f"{self.type2:<11}", self.potential] + [format_number(p) for p in self.params])
+
+
+@dataclass
+class MixingRules:
+    """force_field_mixing_rules.def: self interactions of each type and the rule to mix them."""
+    interactions: Dict[str, SelfInteraction] = field(default_factory=dict)
+    mixing_rule: str = "Lorentz-Berthelot"
+    cutoff_rule: str = "shifted"
+    tail_corrections: bool = False
+
+    @classmethod
+    def parse(cls, text: str) -> "MixingRules":
+        lines = _data_lines(text)
+        n = int(lines[2])
+        interactions = {}
+        for line in lines[3:3 + n]:
+            parts = line.split()
+            interactions[parts[0]] = SelfInteraction(parts[0], parts[1], _parse_params(parts[2:]))
+        mixing_rule = lines[3 + n] if len(lines) > 3 + n else "Lorentz-Berthelot"
+        return cls(interactions, mixing_rule, lines[0], lines[1].lower() == "yes")
+
+    def to_text(self) -> str:
+        lines = ["# general rule for shifted vs truncated", self.cutoff_rule,
+                 "# general rule tailcorrections", "yes" if self.tail_corrections else "no",
+                 "# number of defined interactions", str(len(self.interactions)),
+                 "# type interaction"]
+        lines += [interaction.to_line() for interaction in self.interactions.values()]
+        lines += ["# general mixing rule for Lennard-Jones", self.mixing_rule]
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class ForceFieldOverrides:
+    """force_field.def: explicit pair interactions that replace the mixed ones."""
+    interactions: Dict[Tuple[str, str], PairInteraction] = field(default_factory=dict)
+    rules: List[str] = field(default_factory=list)
+    mixing_overrides: List[str] = field(default_factory=list)
+
+    @classmethod
+    def parse(cls, text: str) -> "ForceFieldOverrides":
+        lines = _data_lines(text)
+        i = 0
+
+        def block() -> List[str]:
+            nonlocal i
+            if i >= len(lines):
+                return []
+            n = int(lines[i])
+            i += 1 + n
+            return lines[i - n:i]
+
+        rules = block()
+        interactions = {}
+        for line in block():
+            parts = line.split()
+            interaction = PairInteraction(parts[0], parts[1], parts[2], _parse_params(parts[3:]))
+            interactions[interaction.key] = interaction
+        return cls(interactions, rules, block())
+
+    def to_text(self) -> str:
+        lines = ["# rules to overwrite", str(len(self.rules))] + self.rules
+        lines += ["# number of defined interactions", str(len(self.interactions)), "# type      type2       interaction"]
+        lines += [interaction.to_line() for interaction in self.interactions.values()]
+        lines += ["# mixing rules to overwrite", str(len(self.mixing_overrides))] + self.mixing_overrides
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class PseudoAtom:
+    name: str
+    chem: str
+    mass: float
+    charge: float
+    as_type: str = ""
+    printed: str = "yes"
+    oxidation: str = "0"
+    # polarization, B-factor, radii, connectivity, anisotropic, anisotropic-type, tinker-type
+    rest: List[str] = field(default_factory=lambda: ["0.0", "1.0", "1.00", "0", "0", "absolute", "0"])
+
+    @classmethod
+    def parse(cls, line: str) -> "PseudoAtom":
+        parts = line.split()
+        return cls(parts[0], parts[3], float(parts[5]), float(parts[6]), parts[2], parts[1], parts[4], parts[7:])
+
+    def to_line(self) -> str:
+        columns = [f"{self.name:<10}", f"{self.printed:<7}", f"{self.as_type or self.chem:<5}", f"{self.chem:<5}",
+                   f"{self.oxidation:<11}", f"{format_number(self.mass):<11}", f"{format_number(self.charge):<8}"]
+        return " ".join(columns + self.rest)
+
+
+@dataclass
+class PseudoAtoms:
+    """pseudo_atoms.def: mass and charge of every atom type."""
+    atoms: Dict[str, PseudoAtom] = field(default_factory=dict)
+
+    @classmethod
+    def parse(cls, text: str) -> "PseudoAtoms":
+        lines = _data_lines(text)
+        n = int(lines[0])
+        atoms = [PseudoAtom.parse(line) for line in lines[1:1 + n]]
+        return cls({atom.name: atom for atom in atoms})
+
+    def to_text(self) -> str:
+        lines = ["#number of pseudo atoms", str(len(self.atoms)), PSEUDO_ATOM_HEADER]
+        lines += [atom.to_line() for atom in self.atoms.values()]
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class MoleculeGroup:
+    label: str
+    rigid: bool
+    # (index, type, coordinates) as written in the file
+    atoms: List[Tuple[str, str, List[str]]] = field(default_factory=list)
+    # the number of atoms the file declares for the group
+    declared_atoms: int = 0
+
+
+def _is_position(line: str) -> bool:
+    parts = line.split()
+    return len(parts) >= 2 and parts[0].isdigit() and not parts[1].lstrip("-").replace(".", "", 1).isdigit()
+
+
+@dataclass
+class Molecule:
+    """An adsorbate or cation .def file.
+
+    Critical constants and atom groups are parsed; the bonded terms and config moves that
+    follow the atomic positions are kept verbatim in `tail`. Written files always carry the
+    actual atom counts; the declared ones are kept for checking.
+    """
+    critical_temperature: float
+    critical_pressure: float
+    acentric_factor: float
+    groups: List[MoleculeGroup] = field(default_factory=list)
+    tail: List[str] = field(default_factory=list)
+    declared_atoms: int = 0
+
+    @property
+    def atom_types(self) -> List[str]:
+        return list(dict.fromkeys(atom[1] for group in self.groups for atom in group.atoms))
+
+    @property
+    def n_atoms(self) -> int:
+        return sum(len(group.atoms) for group in self.groups)
+
+    @classmethod
+    def parse(cls, text: str) -> "Molecule":
+        raw = text.splitlines()
+        data = [(i, line.strip()) for i, line in enumerate(raw) if line.strip() and not line.lstrip().startswith("#")]
+        tc, pc, w = (float(line) for _, line in data[:3])
+        declared, n_groups = int(data[3][1]), int(data[4][1])
+        k, end, groups = 5, data[4][0] + 1, []
+        for _ in range(n_groups):
+            i, kind = data[k]
+            comments = [line.strip().lstrip("#").strip() for line in raw[end:i] if line.lstrip().startswith("#")]
+            group = MoleculeGroup(comments[-1] if comments else "group", kind.lower() == "rigid",
+                                  declared_atoms=int(data[k + 1][1]))
+            end, k = data[k + 1][0] + 1, k + 2
+            # stop early if fewer positions are listed than declared
+            while len(group.atoms) < group.declared_atoms and k < len(data) and _is_position(data[k][1]):
+                i, line = data[k]
+                parts = line.split()
+                group.atoms.append((parts[0], parts[1], parts[2:]))
+                end, k = i + 1, k + 1
+            groups.append(group)
+        return cls(tc, pc, w, groups, raw[end:], declared)
+
+    def to_text(self) -> str:
+        lines = ["# critical constants: Temperature [T], Pressure [Pa], and Acentric factor [-]",
+                 format_number(self.critical_temperature), format_number(self.critical_pressure),
+                 format_number(self.acentric_factor),
+                 "# Number Of Atoms", str(self.n_atoms), "# Number Of Groups", str(len(self.groups))]
+        for group in self.groups:
+            lines += [f"# {group.label}", "rigid" if group.rigid else "flexible",
+                      "# number of atoms", str(len(group.atoms)), "# atomic positions"]
+            lines += [" ".join([index, f"{atom_type:<6}"] + coords).rstrip() for index, atom_type, coords in group.atoms]
+        return "\n".join(lines + self.tail) + "\n"
+
+
+@dataclass
+class RaspaForceField:
+    """The force field files of a folder: mixing rules, explicit pair interactions, pseudo atoms and molecules."""
+    mixing: MixingRules = field(default_factory=MixingRules)
+    overrides: ForceFieldOverrides = field(default_factory=ForceFieldOverrides)
+    pseudo_atoms: PseudoAtoms = field(default_factory=PseudoAtoms)
+    molecules: Dict[str, Molecule] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, folder) -> "RaspaForceField":
+        folder = Path(folder)
+        ff = cls()
+        if (folder / MIXING_RULES_FILE).exists():
+            ff.mixing = MixingRules.parse((folder / MIXING_RULES_FILE).read_text())
+        if (folder / FORCE_FIELD_FILE).exists():
+            ff.overrides = ForceFieldOverrides.parse((folder / FORCE_FIELD_FILE).read_text())
+        if (folder / PSEUDO_ATOMS_FILE).exists():
+            ff.pseudo_atoms = PseudoAtoms.parse((folder / PSEUDO_ATOMS_FILE).read_text())
+        for path in sorted(folder.glob("*.def")):
+            if path.name not in FF_FILES:
+                ff.molecules[path.stem] = Molecule.parse(path.read_text())
+        return ff
+
+    def write(self, folder, molecules: bool = True) -> List[str]:
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        files = {MIXING_RULES_FILE: self.mixing.to_text(), FORCE_FIELD_FILE: self.overrides.to_text(),
+                 PSEUDO_ATOMS_FILE: self.pseudo_atoms.to_text()}
+        if molecules:
+            files.update({f"{name}.def": molecule.to_text() for name, molecule in self.molecules.items()})
+        for name, text in files.items():
+            atomic_write_text(folder / name, text)
+        return list(files)
+
+    @property
+    def atom_types(self) -> Set[str]:
+        types = set(self.pseudo_atoms.atoms) | set(self.mixing.interactions)
+        for type1, type2 in self.overrides.interactions:
+            types.update((type1, type2))
+        return types
+
+    def subset(self, types: Iterable[str]) -> "RaspaForceField":
+        """Only the parameters of the given atom types (molecules are kept)."""
+        types = set(types)
+        return RaspaForceField(
+            MixingRules({t: i for t, i in self.mixing.interactions.items() if t in types}, self.mixing.mixing_rule,
+                        self.mixing.cutoff_rule, self.mixing.tail_corrections),
+            ForceFieldOverrides({k: i for k, i in self.overrides.interactions.items() if set(k) <= types},
+                                list(self.overrides.rules), list(self.overrides.mixing_overrides)),
+            PseudoAtoms({t: a for t, a in self.pseudo_atoms.atoms.items() if t in types}),
+            dict(self.molecules),
+        )
+
+
+def merge(force_fields: List[RaspaForceField]) -> Tuple[RaspaForceField, List[str]]:
+    """Combine force fields; for anything defined more than once the first definition wins.
+
+    Returns the merged force field and a description of every conflicting definition.
+    """
+    merged = RaspaForceField()
+    conflicts = []
+    if not force_fields:
+        return merged, conflicts
+
+    first = force_fields[0].mixing
+    merged.mixing = MixingRules({}, first.mixing_rule, first.cutoff_rule, first.tail_corrections)
+    for n, ff in enumerate(force_fields):
+        for attr in ("mixing_rule", "cutoff_rule", "tail_corrections"):
+            if getattr(ff.mixing, attr) != getattr(merged.mixing, attr):
+                conflicts.append(f"{attr}: kept {getattr(merged.mixing, attr)!r}, force field {n} has {getattr(ff.mixing, attr)!r}")
+        _merge_dict(merged.mixing.interactions, ff.mixing.interactions, n, "self interaction", conflicts)
+        _merge_dict(merged.overrides.interactions, ff.overrides.interactions, n, "pair interaction", conflicts)
+        _merge_dict(merged.pseudo_atoms.atoms, ff.pseudo_atoms.atoms, n, "pseudo atom", conflicts)
+        _merge_dict(merged.molecules, ff.molecules, n, "molecule", conflicts)
+        merged.overrides.rules += [r for r in ff.overrides.rules if r not in merged.overrides.rules]
+        merged.overrides.mixing_overrides += [r for r in ff.overrides.mixing_overrides
+                                              if r not in merged.overrides.mixing_overrides]
+    return merged, conflicts
+
+
+def _merge_dict(target: dict, source: dict, n: int, kind: str, conflicts: List[str]):
+    for key, value in source.items():
+        if key not in target:
+            target[key] = value
+        elif target[key] != value:
+            name = "-".join(key) if isinstance(key, tuple) else key
+            conflicts.append(f"{kind} {name}: kept the first definition, force field {n} differs")
+
+
+def atom_types_in_file(path) -> List[str]:
+    """Atom types defined in force_field.def, force_field_mixing_rules.def or pseudo_atoms.def."""
+    path = Path(path)
+    text = path.read_text()
+    if path.name == FORCE_FIELD_FILE:
+        return sorted({t for key in ForceFieldOverrides.parse(text).interactions for t in key})
+    if path.name == MIXING_RULES_FILE:
+        return list(MixingRules.parse(text).interactions)
+    if path.name == PSEUDO_ATOMS_FILE:
+        return list(PseudoAtoms.parse(text).atoms)
+    raise ValueError(f"Unknown file name: {path.name}")
+
+
+def molecule_atom_types(path) -> List[str]:
+    return Molecule.parse(Path(path).read_text()).atom_types
+
@@ -0,0 +1,189 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from tools.search_cache import SearchCache
+
+
+API_URL = os.environ.get("SEMANTIC_SCHOLAR_API_URL", "https://api.semanticscholar.org/graph/v1")
+DEFAULT_FIELDS = "title,authors,url,abstract,year,externalIds"
+
+
+class SearchUnavailable(Exception):
+    """Raised when the API keeps failing after all retries."""
+
+
+class TokenBucket:
+    """Asyncio token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._not_before = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._not_before:
+                    await asyncio.sleep(self._not_before - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def defer(self, seconds: float):
+        """Hold back all callers for `seconds`, e.g. after a 429 from the server."""
+        self._not_before = max(self._not_before, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class SemanticScholarClient:
+    """Async Semantic Scholar client with a pooled connection, a shared rate limit and
+    exponential backoff with jitter that honours Retry-After.
+
+    `base_url` can point at a local stub server for testing. Successful searches are
+    stored in `cache` (if given), so repeated queries do not hit the network.
+    """
+
+    def __init__(self, base_url: str = API_URL, api_key: Optional[str] = None, cache: Optional[SearchCache] = None,
+                 rate: float = float(os.environ.get("SEMANTIC_SCHOLAR_RPS", 1.0)), burst: float = 1.0,
+                 max_retries: int = 6, base_delay: float = 1.0, max_delay: float = 30.0, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.api_key = api_key or os.environ.get("SEMANTIC_SCHOLAR_API_KEY")
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.rate = rate
+        self.burst = burst
+        self._http: Optional[httpx.AsyncClient] = None
+        self._bucket: Optional[TokenBucket] = None
+
+    def _session(self) -> httpx.AsyncClient:
+        # created lazily, so both live on the loop that runs the requests
+        if self._http is None:
+            headers = {"x-api-key": self.api_key} if self.api_key else {}
+            self._http = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=self.timeout,
+                                           limits=httpx.Limits(max_connections=10, max_keepalive_connections=10))
+            self._bucket = TokenBucket(self.rate, self.burst)
+        return self._http
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform between 0 and the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        session = self._session()
+        last_error = None
+        for attempt in range(self.max_retries):
+            await self._bucket.acquire()
+            try:
+                response = await session.get(path, params=params)
+            except httpx.TransportError as e:
+                last_error = e
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code == 429 or response.status_code >= 500:
+                    last_error = f"HTTP {response.status_code}"
+                    retry_after = _retry_after(response)
+                    delay = min(retry_after, self.max_delay) if retry_after is not None else self._backoff(attempt)
+                    if response.status_code == 429:
+                        # throttling applies to every caller sharing this client
+                        self._bucket.defer(delay)
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            print(f"retrying in {delay:.1f} s due to: {last_error}")
+            await asyncio.sleep(delay)
+        raise SearchUnavailable(str(last_error))
+
+    async def search(self, query: str, limit: int = 5, fields: str = DEFAULT_FIELDS) -> List[Dict[str, Any]]:
+        if self.cache is not None:
+            cached = self.cache.get(query, limit, fields)
+            if cached is not None:
+                return cached
+        data = await self.get("/paper/search", {"query": query, "limit": limit, "fields": fields})
+        results = data.get("data", [])
+        if self.cache is not None:
+            self.cache.put(query, limit, fields, results)
+        return results
+
+    async def search_many(self, queries: List[str], limit: int = 5, fields: str = DEFAULT_FIELDS) -> Dict[str, Any]:
+        results = await asyncio.gather(*[self.search(q, limit, fields) for q in queries], return_exceptions=True)
+        return {q: (r if not isinstance(r, Exception) else repr(r)) for q, r in zip(queries, results)}
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# All requests run on one background event loop, so the connection pool and the
+# rate limit are shared between sync tool calls, async tool calls and concurrent runs.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_client: Optional[SemanticScholarClient] = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="semantic-scholar", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    """Run a client coroutine on the shared loop and wait for the result."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+async def run_async(coro):
+    """Await a client coroutine on the shared loop from any other event loop."""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _background_loop()))
+
+
+def get_client() -> SemanticScholarClient:
+    global _client
+    if _client is None:
+        _client = SemanticScholarClient(cache=SearchCache())
+    return _client
+
+
+def set_client(client: SemanticScholarClient):
+    """Replace the shared client, e.g. with one pointing at a stub server."""
+    global _client
+    _client = client
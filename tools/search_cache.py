@@ -0,0 +1,84 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+CACHE_PATH = Path(os.environ.get("SEMANTIC_SCHOLAR_CACHE", ".cache/semantic_scholar.sqlite"))
+
+
+def normalize_key(query: str, limit: int, fields: str) -> str:
+    """Cache key that ignores case, extra whitespace and the order of fields."""
+    query = " ".join(query.lower().split())
+    fields = ",".join(sorted(f.strip() for f in fields.split(",") if f.strip()))
+    return json.dumps([query, int(limit), fields])
+
+
+class SearchCache:
+    """SQLite cache of search results with a TTL and least-recently-used eviction."""
+
+    def __init__(self, path=CACHE_PATH, ttl: float = 30 * 24 * 3600, max_entries: int = 10_000):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS searches_last_used ON searches(last_used)")
+        self._conn.commit()
+
+    def get(self, query: str, limit: int, fields: str) -> Optional[Any]:
+        key = normalize_key(query, limit, fields)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT result, created FROM searches WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM searches WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE searches SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query: str, limit: int, fields: str, result: Any):
+        key = normalize_key(query, limit, fields)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches (key, result, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            n = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            if n > self.max_entries:
+                cur = self._conn.execute(
+                    "DELETE FROM searches WHERE key IN (SELECT key FROM searches ORDER BY last_used LIMIT ?)",
+                    (n - self.max_entries,),
+                )
+                self.evictions += cur.rowcount
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": entries}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM searches")
+            self._conn.commit()
@@ -0,0 +1,169 @@
+import hashlib
+import os
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from tools.cif_parser import atom_site_columns, iter_cif, make_atom_site, to_float
+
+
+# On-disk cache of parsed structures, so later runs start warm
+STRUCTURE_CACHE_DIR = Path(".structure_cache")
+
+CELL_KEYS = ("_cell_length_a", "_cell_length_b", "_cell_length_c",
+             "_cell_angle_alpha", "_cell_angle_beta", "_cell_angle_gamma")
+
+# bump when the parser output changes, so stale sidecars are rebuilt
+SIDECAR_VERSION = 3
+
+
+@dataclass(frozen=True)
+class StructureRecord:
+    """Columnar view of the atom sites and cell of a CIF file."""
+
+    labels: np.ndarray      # (N,) atom site labels, e.g. "Al1"
+    types: np.ndarray       # (N,) atom types, e.g. "Al"
+    frac: np.ndarray        # (N, 3) fractional coordinates
+    cell: np.ndarray        # (6,) a, b, c, alpha, beta, gamma
+    unique_types: frozenset
+
+    def count_type(self, atom_type: str) -> int:
+        """Count sites whose type (or full label) is exactly `atom_type`."""
+        return int(np.count_nonzero((self.types == atom_type) | (self.labels == atom_type)))
+
+
+_memory_cache: Dict[str, Tuple[Tuple[int, int], StructureRecord]] = {}
+
+
+def parse_cif(path: Path) -> StructureRecord:
+    """Parse the atom site loop and cell parameters of a CIF file in one streaming pass."""
+    # angles default to 90 degrees when a CIF leaves them out; lengths have no default
+    cell = [np.nan] * 3 + [90.0] * 3
+    labels, types, frac = [], [], []
+
+    columns, columns_for = None, None
+    with open(path, "r") as file:
+        for event in iter_cif(file):
+            if event[0] == "item" and event[1] in CELL_KEYS:
+                cell[CELL_KEYS.index(event[1])] = to_float(event[2])
+            elif event[0] == "loop":
+                tags, row = event[1], event[2]
+                if tags is not columns_for:
+                    columns, columns_for = atom_site_columns(tags), tags
+                if columns is None:
+                    continue
+                site = make_atom_site(columns, row)
+                labels.append(site.label)
+                types.append(site.type_symbol)
+                frac.append(site[2:])
+
+    return _make_record(labels, types, frac, cell)
+
+
+def _make_record(labels, types, frac, cell) -> StructureRecord:
+    types = np.asarray(types, dtype=str)
+    return StructureRecord(
+        labels=np.asarray(labels, dtype=str),
+        types=types,
+        frac=np.asarray(frac, dtype=np.float64).reshape(-1, 3),
+        cell=np.asarray(cell, dtype=np.float64),
+        unique_types=frozenset(types.tolist()),
+    )
+
+
+def _sidecar_path(path: Path) -> Path:
+    key = hashlib.sha1(str(path).encode()).hexdigest()
+    return STRUCTURE_CACHE_DIR / f"{path.stem}-{key[:16]}.npz"
+
+
+def _load_sidecar(path: Path, stamp: Tuple[int, int]):
+    sidecar = _sidecar_path(path)
+    if not sidecar.exists():
+        return None
+    try:
+        with np.load(sidecar, allow_pickle=False) as data:
+            if tuple(data["stamp"].tolist()) != (SIDECAR_VERSION, *stamp):
+                return None
+            return _make_record(data["labels"], data["types"], data["frac"], data["cell"])
+    except Exception:
+        # a corrupt or outdated sidecar is simply rebuilt
+        return None
+
+
+def _write_sidecar(path: Path, stamp: Tuple[int, int], record: StructureRecord):
+    sidecar = _sidecar_path(path)
+    try:
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        tmp = sidecar.with_name(f"{sidecar.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, stamp=np.asarray((SIDECAR_VERSION, *stamp), dtype=np.int64), labels=record.labels,
+                 types=record.types, frac=record.frac, cell=record.cell)
+        os.replace(tmp, sidecar)
+    except OSError:
+        # the cache is an optimisation only
+        pass
+
+
+def load_structure(path) -> StructureRecord:
+    """Return the structure record for a CIF file, parsing it only when it changed.
+
+    Records are cached in memory and in STRUCTURE_CACHE_DIR, keyed by
+    (path, mtime, size).
+    """
+    path = Path(path).resolve()
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    cached = _memory_cache.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    record = _load_sidecar(path, stamp)
+    if record is None:
+        record = parse_cif(path)
+        _write_sidecar(path, stamp, record)
+
+    _memory_cache[str(path)] = (stamp, record)
+    return record
+
+
+def perpendicular_widths(cells) -> np.ndarray:
+    """Perpendicular widths of one (6,) or many (N, 6) cells given as a, b, c, alpha, beta, gamma."""
+    cells = np.atleast_2d(np.asarray(cells, dtype=np.float64))
+    lengths = cells[:, :3]
+    cos = np.cos(np.radians(cells[:, 3:]))
+    sin = np.sin(np.radians(cells[:, 3:]))
+
+    # volume of the cell divided by abc (NaN for impossible angles)
+    with np.errstate(invalid="ignore"):
+        v = np.sqrt(1.0 - np.sum(cos ** 2, axis=1) + 2.0 * np.prod(cos, axis=1))
+    volume = np.prod(lengths, axis=1) * v
+
+    # w_a = V / |b x c| = V / (b c sin(alpha)), etc.
+    face_areas = np.stack([
+        lengths[:, 1] * lengths[:, 2] * sin[:, 0],
+        lengths[:, 0] * lengths[:, 2] * sin[:, 1],
+        lengths[:, 0] * lengths[:, 1] * sin[:, 2],
+    ], axis=1)
+    return volume[:, None] / face_areas
+
+
+def valid_cells(cells) -> np.ndarray:
+    """Mask of the cells whose perpendicular widths are all finite and positive."""
+    widths = perpendicular_widths(cells)
+    return np.all(np.isfinite(widths) & (widths > 0), axis=1)
+
+
+def unit_cells_for_cutoff(cells, cutoff: float) -> np.ndarray:
+    """Minimum number of unit cells in each direction so that every perpendicular
+    width of the simulation box is at least twice the cutoff.
+
+    Raises ValueError for cells with missing lengths or impossible angles."""
+    widths = perpendicular_widths(cells)
+    invalid = ~np.all(np.isfinite(widths) & (widths > 0), axis=1)
+    if invalid.any():
+        raise ValueError(f"Invalid cell (missing lengths or impossible angles) at index {np.flatnonzero(invalid).tolist()}")
+    # small tolerance so that e.g. 24.0 / 24.0 does not round up
+    return np.maximum(np.ceil(2.0 * cutoff / widths - 1e-9), 1).astype(int)
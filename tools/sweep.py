@@ -0,0 +1,148 @@
+import itertools
+import os
+import re
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tools.blob_store import atomic_write_text, get_blob_store
+from tools.raspa_ff import format_number
+
+
+# {name} or {{name}}, the form the agent prompts show
+PLACEHOLDER = re.compile(r"\{\{([A-Za-z_]\w*)\}\}|(?<!\{)\{([A-Za-z_]\w*)\}(?!\})")
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return format_number(value)
+    return str(value)
+
+
+def find_placeholders(text: str) -> List[str]:
+    return list(dict.fromkeys(double or single for double, single in PLACEHOLDER.findall(text)))
+
+
+def fill(text: str, values: Dict[str, Any]) -> str:
+    return PLACEHOLDER.sub(lambda m: format_value(values[m.group(1) or m.group(2)]), text)
+
+
+def expand_grid(parameters: Dict[str, List[Any]], mode: str = "product") -> List[Dict[str, Any]]:
+    """Points of a sweep: every combination of the values ("product"), or the i-th value of
+    every parameter together ("zip", all lists must have the same length)."""
+    names = list(parameters)
+    if mode == "product":
+        combinations = itertools.product(*parameters.values())
+    elif mode == "zip":
+        lengths = {name: len(values) for name, values in parameters.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"zip needs lists of the same length, got {lengths}")
+        combinations = zip(*parameters.values())
+    else:
+        raise ValueError(f"Unknown mode: {mode}, use 'product' or 'zip'")
+    return [dict(zip(names, values)) for values in combinations]
+
+
+def apply_lookups(point: Dict[str, Any], lookups: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Add values that depend on another parameter, e.g. {"structure": {"MFI": {"unit_cells": "2 2 2"}}}."""
+    values = dict(point)
+    for key, table in lookups.items():
+        values.update(table.get(format_value(point[key]), {}))
+    return values
+
+
+def load_template(folder) -> Dict[str, Optional[str]]:
+    """Files of a flat template folder: name -> text for files with placeholders, None for static files."""
+    files = {}
+    for path in sorted(Path(folder).iterdir()):
+        if not path.is_file():
+            continue
+        try:
+            text = path.read_text()
+        except UnicodeDecodeError:
+            text = None
+        files[path.name] = text if text is not None and find_placeholders(text) else None
+    return files
+
+
+def _materialize(folder: Path, values: Dict[str, Any], template: Path, files: Dict[str, Optional[str]],
+                 extra_files: Dict[str, str]) -> Dict[str, int]:
+    folder.mkdir(parents=True, exist_ok=True)
+    counts = {"written": 0, "linked": 0, "reflinked": 0, "copied": 0}
+    store = get_blob_store()
+    for name, text in files.items():
+        if text is None:
+            counts[store.link(template / name, folder / name)] += 1
+        else:
+            atomic_write_text(folder / name, fill(text, values))
+            counts["written"] += 1
+    for dst, src in extra_files.items():
+        counts[store.link(fill(src, values), folder / fill(dst, values))] += 1
+    return counts
+
+
+def replicate(template_folder, output_folder, parameters: Dict[str, List[Any]], mode: str = "product",
+              folder_pattern: Optional[str] = None, lookups: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+              extra_files: Optional[Dict[str, str]] = None, max_workers: int = MAX_WORKERS) -> Dict[str, Any]:
+    """Make one run folder per point of a sweep from a flat template folder.
+
+    Placeholders like {pressure} or {{pressure}} in the template files are filled with the values of each point;
+    files without placeholders are hard links to the blob store (copies across file systems).
+    `folder_pattern` names the run folders relative to output_folder (default: one folder per
+    parameter value joined with "_"), `extra_files` maps file names in the run folder to files
+    elsewhere, e.g. {"{structure}.cif": "cifs/{structure}.cif"}. Everything is checked before
+    anything is written.
+    """
+    template, output = Path(template_folder), Path(output_folder)
+    lookups, extra_files = lookups or {}, extra_files or {}
+    files = load_template(template)
+    points = [apply_lookups(point, lookups) for point in expand_grid(parameters, mode)]
+    content = set()
+    for name, text in files.items():
+        if text is not None:
+            content.update(find_placeholders(text))
+    for dst, src in extra_files.items():
+        content.update(find_placeholders(dst) + find_placeholders(src))
+    unknown_lookups = sorted(set(lookups) - set(parameters))
+    if unknown_lookups:
+        raise ValueError(f"Lookups keyed by unknown parameters: {', '.join(unknown_lookups)}")
+    # a parameter that fills nothing gives runs that differ only in their (default) folder name
+    used = content | set(find_placeholders(folder_pattern or "")) | set(lookups)
+    unused = [name for name in parameters if name not in used]
+    if unused:
+        raise ValueError(f"Parameters that fill no placeholder and are not in folder_pattern: {', '.join(unused)}. "
+                         f"Placeholders in the template: {', '.join(sorted(content)) or 'none'}")
+
+    if folder_pattern is None:
+        folder_pattern = "_".join(f"{{{name}}}" for name in parameters)
+    needed = content | set(find_placeholders(folder_pattern))
+    missing = sorted({name for point in points for name in needed if name not in point})
+    if missing:
+        raise ValueError(f"No value for placeholders: {', '.join(missing)}")
+
+    folders = [output / fill(folder_pattern, point) for point in points]
+    if len(set(folders)) < len(folders):
+        raise ValueError(f"folder_pattern {folder_pattern!r} gives the same folder to different points")
+    sources = {Path(fill(src, point)) for point in points for src in extra_files.values()}
+    absent = sorted(str(path) for path in sources if not path.is_file())
+    if absent:
+        raise ValueError(f"Missing files: {', '.join(absent[:10])}" + (" ..." if len(absent) > 10 else ""))
+
+    start = time.perf_counter()
+    totals = {"written": 0, "linked": 0, "reflinked": 0, "copied": 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for counts in pool.map(lambda args: _materialize(*args, template, files, extra_files), zip(folders, points)):
+            for key, n in counts.items():
+                totals[key] += n
+
+    return {
+        "folders": len(folders),
+        "output_folder": str(output),
+        "examples": [str(folder) for folder in folders[:3]],
+        "templated_files": sorted(name for name, text in files.items() if text is not None),
+        **totals,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,51 @@
+import os
+
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# the model whose tokenizer sizes chunks and budgets, the agents default to gpt-5-mini
+TOKEN_MODEL = os.environ.get("TOKEN_MODEL", "gpt-5-mini")
+FALLBACK_ENCODING = "o200k_base"
+# rough size of a token in English text, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = TOKEN_MODEL):
+    """tiktoken encoding for a model, or None if tiktoken or its vocabulary file is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        # the vocabulary is downloaded on first use
+        print(f"No tokenizer for {model}, estimating token counts: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        print(f"No tokenizer for {model}, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = TOKEN_MODEL) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = TOKEN_MODEL) -> str:
+    """The longest prefix of `text` with at most `max_tokens` tokens."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])